@@ -82,6 +82,15 @@ class CustomAuthTokenSerializer(serializers.Serializer):
 
 # custom jwt create
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        # signed claims StatelessJWTAuthentication trusts instead of
+        # loading the user and profile on every request
+        token = super().get_token(user)
+        token["profile_id"] = Profile.objects.get_cached(user.id).id
+        token["is_verified"] = user.is_verified
+        return token
+
     def validate(self, attrs):
         validated_data = super().validate(attrs)
         if not self.user.is_verified:
@@ -126,6 +135,8 @@ class ProfileSerializer(serializers.ModelSerializer):
             "last_name",
             "image",
             "description",
+            "latitude",
+            "longitude",
         )
         read_only_fields = ("email",)
 
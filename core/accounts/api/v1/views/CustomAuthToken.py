@@ -3,6 +3,7 @@ from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import IsAuthenticated
 
+from accounts.authentication import AuthenticationPolicyMixin
 from ..serializers import CustomAuthTokenSerializer
 from django.contrib.auth import get_user_model
 
@@ -10,8 +11,10 @@ User = get_user_model()
 
 
 # custom Auth Token
-class CustomAuthToken(ObtainAuthToken):
+class CustomAuthToken(AuthenticationPolicyMixin, ObtainAuthToken):
     serializer_class = CustomAuthTokenSerializer
+    # the one endpoint that still checks Basic passwords every time
+    authentication_policy = "login"
     permission_classes = [
         IsAuthenticated,
     ]
@@ -0,0 +1,286 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import (
+    BasicAuthentication,
+    TokenAuthentication,
+)
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+# claims CustomTokenObtainPairSerializer adds to every token pair
+TRUSTED_CLAIMS = ("profile_id", "is_verified")
+# user id of a drf token, keyed by a digest of the token
+TOKEN_CACHE_KEY = "auth:token:{}"
+
+
+class ClaimsUser(TokenUser):
+    """
+    request.user of a fresh access token, built from its signed claims
+    alone. It has no database row behind it: fine for the task endpoints,
+    which only need the ids and is_verified, not for anything that writes
+    the user.
+    """
+
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def profile_id(self):
+        return self.token["profile_id"]
+
+    @cached_property
+    def is_verified(self):
+        return self.token["is_verified"]
+
+
+def get_claims_user(validated_token):
+    """
+    ClaimsUser of a token carrying the trusted claims and issued less
+    than JWT_CLAIMS_MAX_AGE seconds ago, else None. The age bounds how
+    long a deactivated user keeps access without a user lookup.
+    """
+    max_age = getattr(settings, "JWT_CLAIMS_MAX_AGE", None)
+    if not max_age:
+        return None
+    if any(claim not in validated_token for claim in TRUSTED_CLAIMS):
+        return None
+    issued_at = validated_token.get("iat")
+    if issued_at is None or time.time() - issued_at > max_age:
+        return None
+    return ClaimsUser(validated_token)
+
+
+def get_user_id(validated_token):
+    try:
+        return validated_token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken(
+            _("Token contained no recognizable user identification")
+        )
+
+
+def check_user(user):
+    if user is None or not user.is_active:
+        raise AuthenticationFailed(
+            _("User not found or inactive"), code="user_not_found"
+        )
+    return user
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication without a user query per request: fresh tokens
+    are trusted on their claims (see get_claims_user), older ones and
+    tokens without the claims load the user through a short-lived cache
+    (User.objects.get_cached).
+    """
+
+    def get_user(self, validated_token):
+        user = get_claims_user(validated_token)
+        if user is not None:
+            return user
+        return check_user(
+            User.objects.get_cached(get_user_id(validated_token))
+        )
+
+    async def aget_user(self, validated_token):
+        # get_user() for the async views
+        user = get_claims_user(validated_token)
+        if user is not None:
+            return user
+        return check_user(
+            await User.objects.aget_cached(get_user_id(validated_token))
+        )
+
+
+def token_cache_key(key):
+    # the raw token never ends up in redis
+    return TOKEN_CACHE_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def invalidate_cached_token(key):
+    cache.delete(token_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication with the token -> user id mapping cached for
+    AUTH_TOKEN_CACHE_TIMEOUT seconds and the user read through
+    User.objects.get_cached. Deleting or rotating a token and saving its
+    user (password change or reset, deactivation) drop the entries, see
+    accounts.signals.
+    """
+
+    def authenticate_credentials(self, key):
+        timeout = getattr(settings, "AUTH_TOKEN_CACHE_TIMEOUT", None)
+        if not timeout:
+            return super().authenticate_credentials(key)
+        cache_key = token_cache_key(key)
+        user_id = cache.get(cache_key)
+        if user_id is None:
+            # one query for the token and its user
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, user.id, timeout)
+            User.objects.set_cached(user)
+            return user, token
+        user = User.objects.get_cached(user_id)
+        if user is None or not user.is_active:
+            invalidate_cached_token(key)
+            raise AuthenticationFailed(_("User inactive or deleted."))
+        return user, Token(key=key, user=user)
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend whose get_user() (the session user of every request)
+    reads through User.objects.get_cached.
+
+    ModelBackend stays listed after it for sessions logged in before it
+    was introduced, which name that backend. Wrong credentials stop here,
+    so the fallback never hashes a password a second time.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user = super().authenticate(request, username, password, **kwargs)
+        if user is None:
+            raise PermissionDenied
+        return user
+
+    def get_user(self, user_id):
+        user = User.objects.get_cached(user_id)
+        if user is None or not self.user_can_authenticate(user):
+            return None
+        return user
+
+
+class VerifiedCredentials:
+    """
+    Per-process LRU of Basic credentials that passed check_password, so a
+    legacy client pays PBKDF2 once per AUTH_BASIC_CACHE_TIMEOUT instead of
+    on every request. Entries are keyed on a salted HMAC of the
+    credentials (the password itself is never kept) and only hold while
+    the user's session auth hash (an HMAC of the password hash) is still
+    the one they were checked against.
+    """
+
+    key_salt = "accounts.authentication.VerifiedCredentials"
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def digest(self, userid, password):
+        return salted_hmac(
+            self.key_salt, f"{userid}\0{password}", algorithm="sha256"
+        ).hexdigest()
+
+    def get(self, key):
+        # returns (user id, session auth hash) or None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            user_id, auth_hash, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return user_id, auth_hash
+
+    def set(self, key, user, ttl):
+        if not ttl or not self.maxsize:
+            return
+        with self.lock:
+            self.entries[key] = (
+                user.id,
+                user.get_session_auth_hash(),
+                time.monotonic() + ttl,
+            )
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+verified_credentials = VerifiedCredentials(settings.AUTH_BASIC_CACHE_SIZE)
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """
+    BasicAuthentication for legacy clients that checks the password once
+    and then trusts verified_credentials. A password change or reset
+    replaces the hash of the cached user, which drops the entry everywhere;
+    deactivation is checked on every request.
+    """
+
+    def get_verified_user(self, key):
+        entry = verified_credentials.get(key)
+        if entry is None:
+            return None
+        user_id, auth_hash = entry
+        user = User.objects.get_cached(user_id)
+        if user is None or not user.is_active:
+            return None
+        # a changed password invalidates the entry
+        if user.get_session_auth_hash() != auth_hash:
+            return None
+        return user
+
+    def authenticate_credentials(self, userid, password, request=None):
+        key = verified_credentials.digest(userid, password)
+        user = self.get_verified_user(key)
+        if user is not None:
+            return user, None
+        user, auth = super().authenticate_credentials(
+            userid, password, request
+        )
+        verified_credentials.set(key, user, settings.AUTH_BASIC_CACHE_TIMEOUT)
+        User.objects.set_cached(user)
+        return user, auth
+
+
+class AuthenticationPolicyMixin:
+    """
+    Takes the authentication classes of an API view from
+    AUTHENTICATION_POLICIES instead of authentication_classes: the policy
+    AUTHENTICATION_ENDPOINT_POLICIES names for the url of the request,
+    else authentication_policy.
+    """
+
+    authentication_policy = "default"
+
+    def get_authentication_policy(self):
+        match = getattr(self.request, "resolver_match", None)
+        overrides = settings.AUTHENTICATION_ENDPOINT_POLICIES
+        if match is not None and match.view_name in overrides:
+            return overrides[match.view_name]
+        return self.authentication_policy
+
+    def get_authenticators(self):
+        policy = self.get_authentication_policy()
+        return [
+            import_string(path)()
+            for path in settings.AUTHENTICATION_POLICIES[policy]
+        ]
@@ -1,13 +1,57 @@
 from django.db import models
+from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.core.cache import cache
 from .users import User
 
 # Signals
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
 # Create your models here.
 
 
+class ProfileManager(models.Manager):
+    # redis key of the cached profile of a user
+    cache_key = "profile:user:{}"
+
+    def get_cached(self, user_id):
+        """
+        Return the profile of the given user with profile.user loaded,
+        served from the cache when PROFILE_CACHE_TIMEOUT is set. Entries
+        are dropped whenever the profile or its user is saved or deleted.
+        """
+        timeout = getattr(settings, "PROFILE_CACHE_TIMEOUT", None)
+        if not timeout:
+            return self.with_user().get(user=user_id)
+        key = self.cache_key.format(user_id)
+        profile = cache.get(key)
+        if profile is None:
+            profile = self.with_user().get(user=user_id)
+            cache.set(key, profile, timeout)
+        return profile
+
+    async def aget_cached(self, user_id):
+        # get_cached() for the async views
+        timeout = getattr(settings, "PROFILE_CACHE_TIMEOUT", None)
+        if not timeout:
+            return await self.with_user().aget(user=user_id)
+        key = self.cache_key.format(user_id)
+        profile = await cache.aget(key)
+        if profile is None:
+            profile = await self.with_user().aget(user=user_id)
+            await cache.aset(key, profile, timeout)
+        return profile
+
+    def with_user(self):
+        # the task payload shows profile.user.email, the password hash is
+        # left out of the cached row
+        return self.select_related("user").defer("user__password")
+
+    def invalidate_cached(self, user_id):
+        cache.delete(self.cache_key.format(user_id))
+
+
 class Profile(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     first_name = models.CharField(max_length=255)
@@ -19,10 +63,23 @@ class Profile(models.Model):
         default="profile/default.png",
     )
     description = models.TextField(blank=True)
+    # location of the weather widget, the default location when unset
+    latitude = models.FloatField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)],
+    )
+    longitude = models.FloatField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)],
+    )
 
     created_date = models.DateTimeField(auto_now_add=True)
     updated_date = models.DateTimeField(auto_now=True)
 
+    objects = ProfileManager()
+
     def __str__(self):
         return self.user.email
 
@@ -31,3 +88,16 @@ class Profile(models.Model):
 def save_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    Profile.objects.invalidate_cached(instance.user_id)
+
+
+# the cached profile holds its user
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_profile_user(sender, instance, **kwargs):
+    Profile.objects.invalidate_cached(instance.id)
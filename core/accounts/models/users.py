@@ -1,9 +1,13 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
 from django.contrib.auth.models import (
     BaseUserManager,
     AbstractBaseUser,
     PermissionsMixin,
 )
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
 # Create your models here.
@@ -42,6 +46,72 @@ class UserManager(BaseUserManager):
             raise ValueError(_("Superuser must have is_superuser=True."))
         return self.create_user(email, password, **extra_fields)
 
+    # redis key of the cached user row, for token authentication
+    cache_key = "auth:user:{}"
+
+    def get_cached(self, user_id):
+        """
+        Return the user with the given id (None if there is none), served
+        from the cache for AUTH_USER_CACHE_TIMEOUT seconds. Entries are
+        dropped whenever the user is saved or deleted.
+        """
+        timeout = getattr(settings, "AUTH_USER_CACHE_TIMEOUT", None)
+        if not timeout:
+            return self.filter(id=user_id).first()
+        key = self.cache_key.format(user_id)
+        data = cache.get(key)
+        if data is not None:
+            return self.from_cache(data)
+        user = self.filter(id=user_id).first()
+        if user is not None:
+            cache.set(key, self.to_cache(user), timeout)
+        return user
+
+    async def aget_cached(self, user_id):
+        # get_cached() for the async views
+        timeout = getattr(settings, "AUTH_USER_CACHE_TIMEOUT", None)
+        if not timeout:
+            return await self.filter(id=user_id).afirst()
+        key = self.cache_key.format(user_id)
+        data = await cache.aget(key)
+        if data is not None:
+            return self.from_cache(data)
+        user = await self.filter(id=user_id).afirst()
+        if user is not None:
+            await cache.aset(key, self.to_cache(user), timeout)
+        return user
+
+    def set_cached(self, user):
+        # a row another query already loaded (e.g. along with a token)
+        timeout = getattr(settings, "AUTH_USER_CACHE_TIMEOUT", None)
+        if timeout:
+            cache.set(
+                self.cache_key.format(user.id), self.to_cache(user), timeout
+            )
+
+    def invalidate_cached(self, user_id):
+        cache.delete(self.cache_key.format(user_id))
+
+    def to_cache(self, user):
+        """
+        Cached form of a user: its columns without the password hash, which
+        only goes to redis as the session auth hash (an HMAC of it) that
+        session and Basic authentication compare.
+        """
+        data = {
+            field.attname: getattr(user, field.attname)
+            for field in self.model._meta.concrete_fields
+            if field.attname != "password"
+        }
+        return data, user.get_session_auth_hash()
+
+    def from_cache(self, cached):
+        # password stays deferred: check_password() or save() load it first
+        data, session_auth_hash = cached
+        user = self.model.from_db(self.db, list(data), list(data.values()))
+        user.cached_session_auth_hash = session_auth_hash
+        return user
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     """
@@ -64,3 +134,17 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return self.email
+
+    def get_session_auth_hash(self):
+        # a user from UserManager.get_cached carries it instead of the hash
+        if "password" in self.get_deferred_fields():
+            cached = getattr(self, "cached_session_auth_hash", None)
+            if cached is not None:
+                return cached
+        return super().get_session_auth_hash()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    User.objects.invalidate_cached(instance.id)
@@ -0,0 +1,27 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_cached_token
+from .models import User
+
+
+# logout (CustomDiscardAuthToken) deletes the token, rotation saves it
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def token_changed(sender, instance, **kwargs):
+    invalidate_cached_token(instance.key)
+    # the cached user may hold the old token as user.auth_token
+    User.objects.invalidate_cached(instance.user_id)
+
+
+# password change or reset, deactivation: the token must be checked
+# against the new user row (the user cache itself is dropped in models)
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields == frozenset(["last_login"]):
+        return
+    for key in Token.objects.filter(user=instance).values_list(
+        "key", flat=True
+    ):
+        invalidate_cached_token(key)
@@ -0,0 +1,342 @@
+import base64
+import time
+from unittest import mock
+
+import pytest
+from django.contrib.auth import authenticate
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from accounts.api.v1.serializers import CustomTokenObtainPairSerializer
+from accounts.authentication import (
+    ClaimsUser,
+    StatelessJWTAuthentication,
+    VerifiedCredentials,
+    verified_credentials,
+)
+from accounts.models import User, Profile
+
+AUTH_TABLES = (
+    'FROM "accounts_user"',
+    'FROM "accounts_profile"',
+    'FROM "authtoken_token"',
+    'FROM "django_session"',
+)
+
+
+@pytest.fixture
+def common_user():
+    user = User.objects.create_user(
+        email="test333@test.com",
+        password="test/!1234",
+        is_verified=True,
+        is_active=True,
+    )
+    return user
+
+
+def client_for(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    return client
+
+
+def token_client(user):
+    token = Token.objects.create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+    return client
+
+
+def basic_client(email, password):
+    client = APIClient()
+    credentials = base64.b64encode(f"{email}:{password}".encode()).decode()
+    client.credentials(HTTP_AUTHORIZATION=f"Basic {credentials}")
+    return client
+
+
+def claims_token(user):
+    return CustomTokenObtainPairSerializer.get_token(user).access_token
+
+
+def auth_queries(queries):
+    return [
+        query["sql"]
+        for query in queries.captured_queries
+        if any(table in query["sql"] for table in AUTH_TABLES)
+    ]
+
+
+@pytest.mark.django_db
+class TestTokenClaims:
+    def test_jwt_create_adds_claims(self, common_user):
+        response = APIClient().post(
+            reverse("accounts:api-v1:jwt-create"),
+            {"email": "test333@test.com", "password": "test/!1234"},
+        )
+        assert response.status_code == 200
+        profile = Profile.objects.get(user=common_user)
+        for name in ("access", "refresh"):
+            token = response.data[name]
+            payload = (AccessToken if name == "access" else RefreshToken)(
+                token
+            )
+            assert payload["profile_id"] == profile.id
+            assert payload["is_verified"] is True
+
+    def test_refreshed_access_token_keeps_claims(self, common_user):
+        refresh = CustomTokenObtainPairSerializer.get_token(common_user)
+        response = APIClient().post(
+            reverse("accounts:api-v1:jwt-refresh"), {"refresh": str(refresh)}
+        )
+        assert AccessToken(response.data["access"])["profile_id"] == (
+            Profile.objects.get(user=common_user).id
+        )
+
+
+@pytest.mark.django_db
+class TestStatelessJWTAuthentication:
+    def test_fresh_token_needs_no_auth_queries(self, common_user):
+        client = client_for(claims_token(common_user))
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse("todo:api-v1:task-list"))
+        assert response.status_code == 200
+        assert auth_queries(queries) == []
+
+    def test_claims_user(self, common_user):
+        token = claims_token(common_user)
+        request = RequestFactory().get(
+            "/", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        user, _ = StatelessJWTAuthentication().authenticate(request)
+        assert isinstance(user, ClaimsUser)
+        assert user.id == common_user.id
+        assert user.is_verified is True
+        assert user.profile_id == Profile.objects.get(user=common_user).id
+
+    def test_old_token_uses_cached_user(self, common_user):
+        token = claims_token(common_user)
+        token["iat"] = int(time.time()) - 60 * 60
+        client = client_for(token)
+        url = reverse("todo:api-v1:task-list")
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get(url).status_code == 200
+        assert len(auth_queries(queries)) == 1
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get(url).status_code == 200
+        assert auth_queries(queries) == []
+
+    def test_token_without_claims_uses_cached_user(self, common_user):
+        client = client_for(RefreshToken.for_user(common_user).access_token)
+        url = reverse("todo:api-v1:task-list")
+        assert client.get(url).status_code == 200
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get(url).status_code == 200
+        assert auth_queries(queries) == []
+
+    def test_deactivation_invalidates_cached_user(self, common_user):
+        client = client_for(RefreshToken.for_user(common_user).access_token)
+        url = reverse("todo:api-v1:task-list")
+        assert client.get(url).status_code == 200
+        common_user.is_active = False
+        common_user.save()
+        assert client.get(url).status_code == 401
+
+    def test_claims_can_be_turned_off(self, common_user, settings):
+        settings.JWT_CLAIMS_MAX_AGE = 0
+        client = client_for(claims_token(common_user))
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get(reverse("todo:api-v1:task-list")).status_code
+        assert auth_queries(queries)
+
+    def test_async_views_trust_claims(self, common_user):
+        client = client_for(claims_token(common_user))
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse("todo:api-v1:async-task-list"))
+        assert response.status_code == 200
+        assert auth_queries(queries) == []
+
+
+@pytest.mark.django_db
+class TestCachedTokenAuthentication:
+    def test_second_request_needs_no_auth_queries(self, common_user):
+        client = token_client(common_user)
+        url = reverse("todo:api-v1:task-list")
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get(url).status_code == 200
+        assert auth_queries(queries)
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get(url).status_code == 200
+        assert auth_queries(queries) == []
+
+    def test_logout_invalidates_token(self, common_user):
+        client = token_client(common_user)
+        url = reverse("todo:api-v1:task-list")
+        assert client.get(url).status_code == 200
+        response = client.post(reverse("accounts:api-v1:token-logout"))
+        assert response.status_code == 204
+        assert not Token.objects.filter(user=common_user).exists()
+        assert client.get(url).status_code == 401
+
+    def test_password_change_invalidates_cache(self, common_user):
+        client = token_client(common_user)
+        url = reverse("todo:api-v1:task-list")
+        assert client.get(url).status_code == 200
+        response = client.put(
+            reverse("accounts:api-v1:change-password"),
+            {
+                "old_password": "test/!1234",
+                "new_password": "new/!pass5678",
+                "new_password1": "new/!pass5678",
+            },
+        )
+        assert response.status_code == 200
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get(url).status_code == 200
+        # the token with its user, and the profile cached with that user
+        assert len(auth_queries(queries)) == 2
+
+    def test_deactivation_rejects_cached_token(self, common_user):
+        client = token_client(common_user)
+        url = reverse("todo:api-v1:task-list")
+        assert client.get(url).status_code == 200
+        common_user.is_active = False
+        common_user.save()
+        assert client.get(url).status_code == 401
+
+
+@pytest.mark.django_db
+class TestCachedSession:
+    def test_second_page_needs_no_auth_queries(self, client, common_user):
+        client.force_login(common_user)
+        assert client.get(reverse("todo:task_list")).status_code == 200
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get(reverse("todo:task_list")).status_code == 200
+        assert auth_queries(queries) == []
+
+    def test_session_of_model_backend_stays_logged_in(
+        self, client, common_user
+    ):
+        # sessions from before CachedModelBackend name ModelBackend
+        client.force_login(
+            common_user, backend="django.contrib.auth.backends.ModelBackend"
+        )
+        response = client.get(reverse("todo:task_list"))
+        assert response.status_code == 200
+
+    def test_wrong_password_is_hashed_once(self, common_user):
+        with mock.patch.object(
+            User, "check_password", autospec=True, return_value=False
+        ) as check_password:
+            assert authenticate(email=common_user.email, password="x") is None
+        assert check_password.call_count == 1
+
+    def test_cached_user_has_no_password_hash(self, common_user):
+        User.objects.get_cached(common_user.id)
+        cached = cache.get(User.objects.cache_key.format(common_user.id))
+        assert common_user.password not in repr(cached)
+        with CaptureQueriesContext(connection) as queries:
+            user = User.objects.get_cached(common_user.id)
+            assert user.get_session_auth_hash() == (
+                common_user.get_session_auth_hash()
+            )
+        assert len(queries) == 0
+        # the hash is loaded on demand, e.g. by a password change
+        assert user.check_password("test/!1234")
+
+
+@pytest.mark.django_db
+class TestCachedBasicAuthentication:
+    @pytest.fixture(autouse=True)
+    def clear_credentials(self):
+        verified_credentials.clear()
+        yield
+        verified_credentials.clear()
+
+    def test_second_request_skips_password_check(self, common_user):
+        client = basic_client("test333@test.com", "test/!1234")
+        url = reverse("todo:api-v1:task-list")
+        assert client.get(url).status_code == 200
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get(url).status_code == 200
+        assert auth_queries(queries) == []
+
+    def test_wrong_password_is_not_cached(self, common_user):
+        client = basic_client("test333@test.com", "wrong")
+        url = reverse("todo:api-v1:task-list")
+        assert client.get(url).status_code == 401
+        assert verified_credentials.entries == {}
+
+    def test_password_change_drops_credentials(self, common_user):
+        client = basic_client("test333@test.com", "test/!1234")
+        url = reverse("todo:api-v1:task-list")
+        assert client.get(url).status_code == 200
+        common_user.set_password("new/!pass5678")
+        common_user.save()
+        assert client.get(url).status_code == 401
+
+    def test_cache_can_be_turned_off(self, common_user, settings):
+        settings.AUTH_BASIC_CACHE_TIMEOUT = 0
+        client = basic_client("test333@test.com", "test/!1234")
+        url = reverse("todo:api-v1:task-list")
+        assert client.get(url).status_code == 200
+        assert verified_credentials.entries == {}
+
+
+@pytest.mark.django_db
+class TestAuthenticationPolicies:
+    def test_default_policy_rejects_basic(self, common_user):
+        client = basic_client("test333@test.com", "test/!1234")
+        response = client.get(reverse("accounts:api-v1:profile"))
+        assert response.status_code == 401
+
+    def test_endpoint_policy_override(self, common_user, settings):
+        settings.AUTHENTICATION_ENDPOINT_POLICIES = {
+            "accounts:api-v1:token-login": "default"
+        }
+        client = basic_client("test333@test.com", "test/!1234")
+        response = client.post(
+            reverse("accounts:api-v1:token-login"),
+            {"email": "test333@test.com", "password": "test/!1234"},
+        )
+        assert response.status_code == 401
+
+    def test_login_accepts_basic(self, common_user):
+        client = basic_client("test333@test.com", "test/!1234")
+        response = client.post(
+            reverse("accounts:api-v1:token-login"),
+            {"email": "test333@test.com", "password": "test/!1234"},
+        )
+        assert response.status_code == 200
+        assert response.data["token"]
+
+
+class TestVerifiedCredentials:
+    def test_least_recently_used_is_evicted(self):
+        credentials = VerifiedCredentials(maxsize=2)
+        for user_id in (1, 2):
+            credentials.set(user_id, User(id=user_id, password="x"), 60)
+        credentials.get(1)
+        credentials.set(3, User(id=3, password="x"), 60)
+        assert list(credentials.entries) == [1, 3]
+
+    def test_entries_expire(self):
+        credentials = VerifiedCredentials(maxsize=2)
+        user = User(id=1, password="x")
+        credentials.set(1, user, 60)
+        assert credentials.get(1) == (1, user.get_session_auth_hash())
+        credentials.entries[1] = (1, "x", time.monotonic() - 1)
+        assert credentials.get(1) is None
+
+    def test_digest_is_salted(self, settings):
+        digest = VerifiedCredentials(maxsize=1).digest("a@a.com", "secret")
+        assert "secret" not in digest
+        settings.SECRET_KEY = "another secret key"
+        other = VerifiedCredentials(maxsize=1).digest("a@a.com", "secret")
+        assert other != digest
@@ -0,0 +1,68 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import RequestFactory
+
+from accounts.models import User, Profile
+from accounts.utils import get_request_profile
+
+
+@pytest.fixture
+def common_user():
+    user = User.objects.create_user(
+        email="testprofile@test.com", password="test/!1234", is_verified=True
+    )
+    return user
+
+
+@pytest.fixture
+def request_obj(common_user):
+    request = RequestFactory().get("/")
+    request.user = common_user
+    return request
+
+
+@pytest.mark.django_db
+class TestProfileResolver:
+    def test_profile_resolved_once_per_request(self, request_obj):
+        # the second lookup in the same request is free
+        with CaptureQueriesContext(connection) as queries:
+            first = get_request_profile(request_obj)
+            second = get_request_profile(request_obj)
+        assert first is second
+        assert len(queries) == 1
+
+    def test_profile_served_from_cache(self, common_user, request_obj):
+        # a new request for the same user does not hit the database
+        get_request_profile(request_obj)
+        request = RequestFactory().get("/")
+        request.user = common_user
+        with CaptureQueriesContext(connection) as queries:
+            profile = get_request_profile(request)
+        assert len(queries) == 0
+        assert profile.user_id == common_user.id
+
+    def test_profile_cache_invalidated_on_save(self, common_user):
+        Profile.objects.get_cached(common_user.id)
+        profile = Profile.objects.get(user=common_user)
+        profile.first_name = "changed"
+        profile.save()
+        assert (
+            Profile.objects.get_cached(common_user.id).first_name == "changed"
+        )
+
+    def test_profile_cached_with_its_user(self, common_user, request_obj):
+        # creating a task shows profile.user.email without another query
+        get_request_profile(request_obj)
+        profile = Profile.objects.get_cached(common_user.id)
+        with CaptureQueriesContext(connection) as queries:
+            assert str(profile) == common_user.email
+        assert len(queries) == 0
+        assert "password" in profile.user.get_deferred_fields()
+
+    def test_profile_cache_invalidated_on_user_save(self, common_user):
+        Profile.objects.get_cached(common_user.id)
+        common_user.email = "changed@test.com"
+        common_user.save()
+        profile = Profile.objects.get_cached(common_user.id)
+        assert profile.user.email == "changed@test.com"
@@ -0,0 +1,42 @@
+from .models import Profile
+
+
+def get_request_profile(request):
+    """
+    Owner profile of request.user, resolved once per request.
+    Every task view and the task serializer share the same request object,
+    so only the first call reaches the cache or the database.
+    """
+    profile = getattr(request, "_owner_profile", None)
+    if profile is None:
+        profile = Profile.objects.get_cached(request.user.id)
+        request._owner_profile = profile
+    return profile
+
+
+async def aget_request_profile(request):
+    # get_request_profile() for the async views
+    profile = getattr(request, "_owner_profile", None)
+    if profile is None:
+        profile = await Profile.objects.aget_cached(request.user.id)
+        request._owner_profile = profile
+    return profile
+
+
+def get_request_profile_id(request):
+    """
+    Id of the owner profile of request.user: the profile_id claim of a
+    StatelessJWTAuthentication user, else get_request_profile().id.
+    """
+    profile_id = getattr(request.user, "profile_id", None)
+    if profile_id is not None:
+        return profile_id
+    return get_request_profile(request).id
+
+
+async def aget_request_profile_id(request):
+    # get_request_profile_id() for the async views
+    profile_id = getattr(request.user, "profile_id", None)
+    if profile_id is not None:
+        return profile_id
+    return (await aget_request_profile(request)).id
@@ -0,0 +1,192 @@
+import io
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+import django
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import Profile
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+# seeded once per session, a skewed set like production
+SEED = {"users": 20, "tasks": 20000, "skew": 1.0}
+SEED_PASSWORD = "fake@1234"
+# latency, cpu and memory may grow by the tolerance, queries may not grow
+LATENCY_METRICS = ("median_ms", "p95_ms", "cpu_ms")
+MEMORY_METRICS = ("peak_kib",)
+# numbers of a baseline only mean something on the stack they came from,
+# the committed one is recorded on the docker-compose-stage postgres and
+# redis (the repo settings), inside the backend container:
+# pytest -m benchmark benchmarks --bench-update-baseline
+STACK = ("database", "cache")
+
+
+@pytest.fixture(scope="session")
+def django_db_setup(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        call_command(
+            "insert_data", workers=1, seed=1, stdout=io.StringIO(), **SEED
+        )
+
+
+@pytest.fixture
+def bench_profile():
+    # the biggest list of the seed
+    return (
+        Profile.objects.select_related("user")
+        .annotate(tasks=Count("task"))
+        .order_by("-tasks")
+        .first()
+    )
+
+
+@pytest.fixture(scope="session")
+def bench_results(request):
+    results = {}
+    yield results
+    if request.config.getoption("--bench-update-baseline") and results:
+        baseline = load_baseline()
+        if stack_changes(baseline["meta"]):
+            # numbers of another stack are not kept next to these
+            baseline["endpoints"] = {}
+        baseline["meta"] = environment()
+        baseline["endpoints"].update(results)
+        BASELINE_PATH.write_text(
+            json.dumps(baseline, indent=2, sort_keys=True) + "\n"
+        )
+    path = request.config.getoption("--bench-json")
+    if path:
+        report = {"meta": environment(), "endpoints": results}
+        text = json.dumps(report, indent=2, sort_keys=True)
+        Path(path).write_text(text + "\n")
+
+
+@pytest.fixture(scope="session")
+def bench_baseline():
+    return load_baseline()
+
+
+@pytest.fixture
+def bench(request, bench_results, bench_baseline):
+    """
+    bench(name, call, rounds=50, setup=None) times `call` over `rounds`
+    runs after a warm-up (wall clock and cpu time of this process), then runs it once under CaptureQueriesContext
+    and once under tracemalloc. `setup` builds the arguments of each call
+    outside of the measurement. The numbers are compared to the baseline
+    and recorded for --bench-update-baseline/--bench-json. A baseline of
+    another stack skips the test, a missing one fails it.
+    """
+    tolerance = request.config.getoption("--bench-tolerance")
+    updating = request.config.getoption("--bench-update-baseline")
+
+    def run(name, call, rounds=50, setup=None):
+        setup = setup or (lambda: ())
+        call(*setup())
+        timings = []
+        cpu_timings = []
+        for _ in range(rounds):
+            args = setup()
+            start = time.perf_counter()
+            cpu_start = time.process_time()
+            call(*args)
+            cpu_timings.append((time.process_time() - cpu_start) * 1000)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        args = setup()
+        with CaptureQueriesContext(connection) as captured:
+            call(*args)
+        # captured slices connection.queries, which the next request resets
+        queries = len(captured)
+
+        args = setup()
+        tracemalloc.start()
+        call(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        timings.sort()
+        result = {
+            "median_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(timings[max(int(rounds * 0.95) - 1, 0)], 3),
+            "cpu_ms": round(statistics.median(cpu_timings), 3),
+            "queries": queries,
+            "peak_kib": round(peak / 1024, 1),
+            "rounds": rounds,
+        }
+        bench_results[name] = result
+        if not updating:
+            check_baseline(bench_baseline, name, result, tolerance)
+        return result
+
+    return run
+
+
+def check_baseline(baseline, name, result, tolerance):
+    if not baseline["meta"]:
+        pytest.fail(
+            f"{name} has no benchmarks/baseline.json to compare to, record "
+            f"it with --bench-update-baseline"
+        )
+    changes = stack_changes(baseline["meta"])
+    if changes:
+        pytest.skip(
+            f"{name} not compared, benchmarks/baseline.json was recorded "
+            f"on another stack ({', '.join(changes)})"
+        )
+    expected = baseline["endpoints"].get(name)
+    if expected is None:
+        pytest.fail(
+            f"{name} has no baseline on this stack, record it with "
+            f"--bench-update-baseline"
+        )
+    regressions = []
+    if result["queries"] > expected["queries"]:
+        regressions.append(
+            f"queries {result['queries']} > {expected['queries']}"
+        )
+    for metric in LATENCY_METRICS + MEMORY_METRICS:
+        if metric not in expected:
+            continue
+        limit = expected[metric] * (1 + tolerance)
+        if result[metric] > limit:
+            regressions.append(
+                f"{metric} {result[metric]} > {expected[metric]} "
+                f"(+{tolerance:.0%} = {limit:.1f})"
+            )
+    if regressions:
+        pytest.fail(f"{name} regressed: " + ", ".join(regressions))
+
+
+def load_baseline():
+    if not BASELINE_PATH.exists():
+        return {"meta": {}, "endpoints": {}}
+    return json.loads(BASELINE_PATH.read_text())
+
+
+def stack_changes(meta):
+    current = environment()
+    return [
+        f"{key} {meta.get(key)} != {current[key]}"
+        for key in STACK
+        if meta.get(key) != current[key]
+    ]
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "cache": settings.CACHES["default"]["BACKEND"],
+        "machine": platform.machine(),
+        "seed": SEED,
+    }
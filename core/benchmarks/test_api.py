@@ -0,0 +1,169 @@
+import base64
+
+import pytest
+from django.test import Client
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from accounts.api.v1.serializers import CustomTokenObtainPairSerializer
+from accounts.authentication import verified_credentials
+from todo.models import Task
+from .conftest import SEED_PASSWORD
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+
+@pytest.fixture
+def api_client(bench_profile):
+    client = APIClient()
+    client.force_authenticate(bench_profile.user)
+    return client
+
+
+@pytest.fixture(autouse=True)
+def no_response_cache(settings):
+    # measure the views, not the per-user response cache
+    settings.TASK_RESPONSE_CACHE_TIMEOUT = 0
+
+
+def basic_header(profile):
+    credentials = f"{profile.user.email}:{SEED_PASSWORD}"
+    return "Basic " + base64.b64encode(credentials.encode()).decode()
+
+
+def expect(status):
+    def check(response):
+        assert response.status_code == status, response.content[:200]
+        return response
+
+    return check
+
+
+class TestTaskApiBenchmarks:
+    def test_task_list(self, bench, api_client):
+        url = reverse("todo:api-v1:task-list")
+        ok = expect(200)
+        bench("task-list", lambda: ok(api_client.get(url)))
+
+    def test_task_list_jwt(self, bench, bench_profile):
+        # real authentication: fresh tokens are trusted on their claims
+        client = APIClient()
+        token = CustomTokenObtainPairSerializer.get_token(
+            bench_profile.user
+        ).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        url = reverse("todo:api-v1:task-list")
+        ok = expect(200)
+        bench("task-list-jwt", lambda: ok(client.get(url)))
+
+    def test_task_list_token(self, bench, bench_profile):
+        # token and user come from the cache after the warm-up
+        client = APIClient()
+        token = Token.objects.create(user=bench_profile.user)
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        url = reverse("todo:api-v1:task-list")
+        ok = expect(200)
+        bench("task-list-token", lambda: ok(client.get(url)))
+
+    def test_task_list_basic(self, bench, bench_profile):
+        # a legacy Basic client: one password check, then cached
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=basic_header(bench_profile))
+        url = reverse("todo:api-v1:task-list")
+        ok = expect(200)
+        bench("task-list-basic", lambda: ok(client.get(url)))
+
+    def test_task_list_basic_uncached(self, bench, bench_profile, settings):
+        # what every Basic request cost before: a PBKDF2 run each
+        settings.AUTH_BASIC_CACHE_TIMEOUT = 0
+        verified_credentials.clear()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=basic_header(bench_profile))
+        url = reverse("todo:api-v1:task-list")
+        ok = expect(200)
+        bench(
+            "task-list-basic-uncached", lambda: ok(client.get(url)), rounds=5
+        )
+
+    def test_task_list_cursor(self, bench, api_client):
+        url = reverse("todo:api-v1:task-list")
+        ok = expect(200)
+        bench(
+            "task-list-cursor",
+            lambda: ok(api_client.get(url, {"pagination": "cursor"})),
+        )
+
+    def test_task_list_cached(self, bench, api_client, settings):
+        settings.TASK_RESPONSE_CACHE_TIMEOUT = 60
+        url = reverse("todo:api-v1:task-list")
+        ok = expect(200)
+        bench("task-list-cached", lambda: ok(api_client.get(url)))
+
+    def test_task_detail(self, bench, api_client, bench_profile):
+        task = Task.objects.filter(user=bench_profile).last()
+        url = reverse("todo:api-v1:task-detail", kwargs={"pk": task.pk})
+        ok = expect(200)
+        bench("task-detail", lambda: ok(api_client.get(url)))
+
+    def test_task_create(self, bench, api_client):
+        url = reverse("todo:api-v1:task-list")
+        ok = expect(201)
+        bench(
+            "task-create",
+            lambda: ok(
+                api_client.post(url, {"title": "benchmark"}, format="json")
+            ),
+        )
+
+    def test_task_update(self, bench, api_client, bench_profile):
+        task = Task.objects.filter(user=bench_profile).first()
+        url = reverse("todo:api-v1:task-detail", kwargs={"pk": task.pk})
+        ok = expect(200)
+        bench(
+            "task-update",
+            lambda: ok(
+                api_client.patch(url, {"complete": True}, format="json")
+            ),
+        )
+
+    def test_task_delete(self, bench, api_client, bench_profile):
+        def setup():
+            task = Task.objects.create(user=bench_profile, title="doomed")
+            return (
+                reverse("todo:api-v1:task-detail", kwargs={"pk": task.pk}),
+            )
+
+        ok = expect(204)
+        bench(
+            "task-delete", lambda url: ok(api_client.delete(url)), setup=setup
+        )
+
+    def test_task_export(self, bench, api_client):
+        url = reverse("todo:api-v1:task-export")
+
+        def export():
+            response = expect(200)(api_client.get(url))
+            for _ in response.streaming_content:
+                pass
+
+        bench("task-export", export, rounds=10)
+
+
+class TestAccountBenchmarks:
+    def test_jwt_create(self, bench, bench_profile):
+        # dominated by PBKDF2, few rounds
+        client = APIClient()
+        url = reverse("accounts:api-v1:jwt-create")
+        data = {"email": bench_profile.user.email, "password": SEED_PASSWORD}
+        ok = expect(200)
+        bench("jwt-create", lambda: ok(client.post(url, data)), rounds=5)
+
+
+class TestHtmlBenchmarks:
+    def test_task_list_page(self, bench, bench_profile):
+        client = Client()
+        client.force_login(bench_profile.user)
+        url = reverse("todo:task_list")
+        ok = expect(200)
+        bench("html-task-list", lambda: ok(client.get(url)), rounds=10)
@@ -0,0 +1,48 @@
+import pytest
+from django.core.cache import cache
+
+
+def pytest_addoption(parser):
+    # options of the benchmark suite (benchmarks/), run with -m benchmark
+    group = parser.getgroup("benchmark")
+    group.addoption(
+        "--bench-update-baseline",
+        action="store_true",
+        help="write the measured numbers to benchmarks/baseline.json",
+    )
+    group.addoption(
+        "--bench-tolerance",
+        type=float,
+        default=0.5,
+        help="allowed latency/memory growth over the baseline (0.5 = 50%%)",
+    )
+    group.addoption(
+        "--bench-json",
+        default=None,
+        help="also write the measured numbers to this file",
+    )
+
+
+@pytest.fixture(autouse=True, scope="session")
+def celery_eager():
+    # queued tasks run inline, tests never talk to the broker
+    from core.celery import app
+
+    app.conf.task_always_eager = True
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # cached profiles/responses must not leak between tests
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def weather_stub(settings):
+    # tests never call the real weather api
+    from todo.weather import hot_buckets
+
+    settings.WEATHER_PROVIDER = "todo.weather.StubWeatherProvider"
+    hot_buckets.clear()
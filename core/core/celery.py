@@ -1,7 +1,6 @@
 import os
 from celery import Celery
 from celery.schedules import crontab
-from todo.tasks import delete_completed_tasks
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
@@ -21,6 +20,13 @@ app.autodiscover_tasks()
 
 @app.on_after_configure.connect
 def setup_periodic_tasks(sender, **kwargs):
+    # imported here, todo.tasks imports from the core package
+    from todo.tasks import (
+        delete_completed_tasks,
+        rebalance_task_positions,
+        refresh_popular_weather,
+    )
+
     # Calls test('hello') every 10 minutes.
     sender.add_periodic_task(
         crontab(
@@ -29,3 +35,20 @@ def setup_periodic_tasks(sender, **kwargs):
         delete_completed_tasks.s(),
         name="delete completed tasks",
     )
+    # renumbers task lists whose ordering gaps ran out, once a night
+    sender.add_periodic_task(
+        crontab(
+            minute=0,
+            hour=3,
+        ),
+        rebalance_task_positions.s(),
+        name="rebalance task positions",
+    )
+    # keeps the popular weather buckets fresh so requests never wait on them
+    sender.add_periodic_task(
+        crontab(
+            minute="*/10",
+        ),
+        refresh_popular_weather.s(),
+        name="refresh weather",
+    )
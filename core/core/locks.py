@@ -0,0 +1,135 @@
+import functools
+import logging
+import time
+import uuid
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = "singleflight:{}:lock"
+LAST_RUN_KEY = "singleflight:{}:last_run"
+COUNTER_KEY = "singleflight:{}:{}"
+COUNTERS = ("runs", "skipped", "overlapping", "failed")
+# deletes the lock only while it still holds our token, in one step
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def single_flight(name, timeout=60 * 10):
+    """
+    Run the wrapped periodic job at most once at a time across every web
+    worker, celery worker and beat replica. A call that finds the job
+    already running is skipped (not queued) and returns None.
+
+    The guard is a cache lock (redis SET NX with a timeout) or, with
+    SINGLE_FLIGHT_BACKEND = "postgres", a session advisory lock. Runs,
+    skips, failures and runs that outlived their lock ("overlapping") are
+    counted, and the last run is recorded; see get_single_flight_stats().
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            release = acquire(name, timeout)
+            if release is None:
+                _incr(name, "skipped")
+                logger.info("%s skipped: already running", name)
+                return None
+
+            started = time.time()
+            status = "failed"
+            try:
+                result = func(*args, **kwargs)
+                status = "ok"
+                return result
+            finally:
+                if not release():
+                    # the lock expired under us, another run may have started
+                    _incr(name, "overlapping")
+                    logger.warning("%s outlived its %ss lock", name, timeout)
+                _incr(name, "runs" if status == "ok" else "failed")
+                cache.set(
+                    LAST_RUN_KEY.format(name),
+                    {
+                        "started": started,
+                        "finished": time.time(),
+                        "duration": round(time.time() - started, 3),
+                        "status": status,
+                    },
+                    None,
+                )
+
+        return wrapper
+
+    return decorator
+
+
+def acquire(name, timeout):
+    # returns a release() callable (True if we still owned the lock), or None
+    if getattr(settings, "SINGLE_FLIGHT_BACKEND", "cache") == "postgres":
+        return _acquire_advisory(name)
+    return _acquire_cache(name, timeout)
+
+
+def _acquire_cache(name, timeout):
+    key = LOCK_KEY.format(name)
+    # an int: django_redis stores it as is, so the script can compare it
+    token = uuid.uuid4().int >> 65
+    if not cache.add(key, token, timeout):
+        return None
+    return functools.partial(_release_cache, key, token)
+
+
+def _release_cache(key, token):
+    try:
+        redis = get_redis_connection()
+    except NotImplementedError:
+        # not redis (locmem in tests): the lock is per process anyway
+        if cache.get(key) != token:
+            return False
+        cache.delete(key)
+        return True
+    # a get then a delete could remove the lock of a run that took it
+    # over after ours expired in between
+    return bool(redis.eval(RELEASE_SCRIPT, 1, cache.make_key(key), token))
+
+
+def _acquire_advisory(name):
+    # held by this database session, released on unlock or disconnect
+    lock_id = zlib.crc32(name.encode())
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [lock_id])
+        if not cursor.fetchone()[0]:
+            return None
+
+    def release():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [lock_id])
+            return cursor.fetchone()[0]
+
+    return release
+
+
+def _incr(name, counter):
+    key = COUNTER_KEY.format(name, counter)
+    cache.add(key, 0, None)
+    cache.incr(key)
+
+
+def get_single_flight_stats(name):
+    stats = {
+        counter: cache.get(COUNTER_KEY.format(name, counter), 0)
+        for counter in COUNTERS
+    }
+    stats["running"] = cache.get(LOCK_KEY.format(name)) is not None
+    stats["last_run"] = cache.get(LAST_RUN_KEY.format(name))
+    return stats
@@ -43,11 +43,13 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # taggit
     "taggit",
     # applications
     "accounts.apps.AccountsConfig",
     "todo.apps.TodoConfig",
+    "monitoring.apps.MonitoringConfig",
     # rest framework
     "rest_framework",
     "django_filters",
@@ -80,6 +82,8 @@ ROBOTS_USE_SITEMAP = False
 
 
 MIDDLEWARE = [
+    # first, so it times the whole request (monitoring/middleware.py)
+    "monitoring.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     # access for api from outside (next line)
@@ -89,6 +93,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # after the auth middleware, it checks the user is staff
+    "monitoring.middleware.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "core.urls"
@@ -186,17 +192,45 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 AUTH_USER_MODEL = "accounts.User"
 
 # REST framework configuration
-REST_FRAMEWORK = {
-    # 'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema',
-    "DEFAULT_PERMISSION_CLASSES": [
-        "rest_framework.permissions.AllowAny",
+# authentication classes per policy, cheapest first; API views using
+# accounts.authentication.AuthenticationPolicyMixin pick one with
+# authentication_policy, AUTHENTICATION_ENDPOINT_POLICIES overrides it
+# per url name (e.g. {"todo:api-v1:task-list": "default"}).
+# Only "login" runs a full password check on every request.
+AUTHENTICATION_POLICIES = {
+    "default": [
+        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # TokenAuthentication with the token and user lookups cached
+        "accounts.authentication.CachedTokenAuthentication",
+        "rest_framework.authentication.SessionAuthentication",
+    ],
+    # task api: JWTs trusted on their claims, Basic kept for legacy
+    # clients with the verified credentials cached
+    "tasks": [
+        "accounts.authentication.StatelessJWTAuthentication",
+        "accounts.authentication.CachedTokenAuthentication",
+        "rest_framework.authentication.SessionAuthentication",
+        "accounts.authentication.CachedBasicAuthentication",
     ],
-    "DEFAULT_AUTHENTICATION_CLASSES": [
+    "login": [
         "rest_framework.authentication.BasicAuthentication",
         "rest_framework.authentication.SessionAuthentication",
-        "rest_framework.authentication.TokenAuthentication",
+        "accounts.authentication.CachedTokenAuthentication",
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ],
+}
+AUTHENTICATION_ENDPOINT_POLICIES = {}
+# verified Basic credentials kept per process (0 = check every request)
+AUTH_BASIC_CACHE_TIMEOUT = config("AUTH_BASIC_CACHE_TIMEOUT", cast=int, default=60)
+AUTH_BASIC_CACHE_SIZE = config("AUTH_BASIC_CACHE_SIZE", cast=int, default=1024)
+
+REST_FRAMEWORK = {
+    # 'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema',
+    "DEFAULT_PERMISSION_CLASSES": [
+        "rest_framework.permissions.AllowAny",
+    ],
+    # no BasicAuthentication: a PBKDF2 run on every request
+    "DEFAULT_AUTHENTICATION_CLASSES": AUTHENTICATION_POLICIES["default"],
     # 'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'] ---we do it manually---
     # 'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination', ---we do it manually---
     # 'PAGE_SIZE': 8     ---we do it manually---
@@ -206,6 +240,24 @@ REST_FRAMEWORK = {
 # Some of Simple JWT’s behavior can be customized
 from datetime import timedelta
 
+# task api (accounts.authentication.StatelessJWTAuthentication): access
+# tokens younger than JWT_CLAIMS_MAX_AGE seconds are trusted on their
+# claims, others load the user row through a cache kept for
+# AUTH_USER_CACHE_TIMEOUT seconds (0 = off for both)
+JWT_CLAIMS_MAX_AGE = config("JWT_CLAIMS_MAX_AGE", cast=int, default=60 * 15)
+AUTH_USER_CACHE_TIMEOUT = config("AUTH_USER_CACHE_TIMEOUT", cast=int, default=60)
+# drf token -> user id, dropped on logout and user changes (0 = off)
+AUTH_TOKEN_CACHE_TIMEOUT = config("AUTH_TOKEN_CACHE_TIMEOUT", cast=int, default=60 * 5)
+
+# the session user is read through the user cache, sessions from redis
+# with the database as fallback. ModelBackend only serves sessions that
+# were logged in through it, dropping it would log those users out.
+AUTHENTICATION_BACKENDS = [
+    "accounts.authentication.CachedModelBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=7),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=8),
@@ -259,10 +311,69 @@ CORS_ALLOW_ALL_ORIGINS = True
 # celery configs
 CELERY_BROKER_URL = "redis://redis:6379/1"
 
+# delete_completed_tasks: rows per chunk/transaction and per-run budget
+TODO_CLEANUP_BATCH_SIZE = config("TODO_CLEANUP_BATCH_SIZE", cast=int, default=1000)
+TODO_CLEANUP_MAX_BATCHES = config("TODO_CLEANUP_MAX_BATCHES", cast=int, default=100)
+TODO_CLEANUP_TIME_BUDGET = config("TODO_CLEANUP_TIME_BUDGET", cast=int, default=30)
+
+# periodic jobs run single-flight, guarded by a "cache" (redis) lock or a
+# "postgres" advisory lock
+SINGLE_FLIGHT_BACKEND = config("SINGLE_FLIGHT_BACKEND", default="cache")
+
+# shared weather widget data, served stale-while-revalidate (seconds) per
+# location bucket; the default location is used for users without one
+WEATHER_PROVIDER = config(
+    "WEATHER_PROVIDER", default="todo.weather.OpenWeatherProvider"
+)
+OPENWEATHER_API_KEY = config(
+    "openweather_apikey", default="18f933ce846bc85b1007e70e217290fe"
+)
+WEATHER_LATITUDE = config("WEATHER_LATITUDE", cast=float, default=37.474806)
+WEATHER_LONGITUDE = config("WEATHER_LONGITUDE", cast=float, default=57.315210)
+WEATHER_FRESH_TTL = config("WEATHER_FRESH_TTL", cast=int, default=60 * 20)
+WEATHER_STALE_TTL = config("WEATHER_STALE_TTL", cast=int, default=60 * 60 * 6)
+WEATHER_LOCK_TIMEOUT = 30
+WEATHER_COLD_WAIT = 3
+WEATHER_CONNECT_TIMEOUT = config("WEATHER_CONNECT_TIMEOUT", cast=float, default=2)
+WEATHER_READ_TIMEOUT = config("WEATHER_READ_TIMEOUT", cast=float, default=5)
+WEATHER_POOL_SIZE = 10
+WEATHER_BUCKET_PRECISION = config("WEATHER_BUCKET_PRECISION", cast=int, default=1)
+WEATHER_HOT_BUCKETS = config("WEATHER_HOT_BUCKETS", cast=int, default=256)
+WEATHER_LOCAL_TTL = config("WEATHER_LOCAL_TTL", cast=int, default=60)
+WEATHER_REFRESH_BUCKETS = config("WEATHER_REFRESH_BUCKETS", cast=int, default=50)
+
+# per-request metrics: Server-Timing header and the Prometheus /metrics
+# endpoint; gunicorn workers share their samples through the
+# PROMETHEUS_MULTIPROC_DIR environment variable
+MONITORING_SERVER_TIMING = config(
+    "MONITORING_SERVER_TIMING", cast=bool, default=True
+)
+# /metrics is only served to staff users, to a bearer token (if set) and
+# to the listed addresses/networks (e.g. "10.0.0.0/8,127.0.0.1")
+MONITORING_METRICS_TOKEN = config("MONITORING_METRICS_TOKEN", default="")
+MONITORING_METRICS_ALLOWED_IPS = config(
+    "MONITORING_METRICS_ALLOWED_IPS",
+    cast=lambda v: [s.strip() for s in v.split(",") if s.strip()],
+    default="",
+)
+
+# staff-only cProfile of single requests, asked for with the header or the
+# query flag; the latest MONITORING_PROFILE_KEEP are listed in the admin
+MONITORING_PROFILE_HEADER = "X-Profile"
+MONITORING_PROFILE_PARAM = "_profile"
+MONITORING_PROFILE_KEEP = config("MONITORING_PROFILE_KEEP", cast=int, default=200)
+MONITORING_PROFILE_TOP = 60
+
+# queries slower than this (ms, 0 = off) are logged and aggregated in
+# monitoring.SlowQuery with an EXPLAIN plan, by a background thread
+MONITORING_SLOW_QUERY_MS = config("MONITORING_SLOW_QUERY_MS", cast=float, default=200)
+MONITORING_SLOW_QUERY_BACKGROUND = True
+
 # caching configs
 CACHES = {
     "default": {
-        "BACKEND": "django_redis.cache.RedisCache",
+        # django_redis, counting hits and misses for the metrics
+        "BACKEND": "monitoring.cache.RedisCache",
         "LOCATION": "redis://redis:6379/2",
         # "TIMEOUT": 300, BY DEFAULT IS 5 MINUTES
         "OPTIONS": {
@@ -270,3 +381,20 @@ CACHES = {
         },
     }
 }
+
+# owner profile of a user is cached for the task views (seconds, 0 = off)
+PROFILE_CACHE_TIMEOUT = config("PROFILE_CACHE_TIMEOUT", cast=int, default=60 * 15)
+
+# rows fetched per round trip (and per streamed write) of a task export
+TASK_EXPORT_CHUNK_SIZE = config("TASK_EXPORT_CHUNK_SIZE", cast=int, default=2000)
+
+# task imports: rows validated and written per transaction, row errors
+# kept for the report, and PostgreSQL COPY instead of bulk_create
+TASK_IMPORT_BATCH_SIZE = config("TASK_IMPORT_BATCH_SIZE", cast=int, default=1000)
+TASK_IMPORT_MAX_ERRORS = config("TASK_IMPORT_MAX_ERRORS", cast=int, default=100)
+TASK_IMPORT_USE_COPY = config("TASK_IMPORT_USE_COPY", cast=bool, default=True)
+
+# per-user task api response cache (seconds, 0 = off)
+TASK_RESPONSE_CACHE_TIMEOUT = config(
+    "TASK_RESPONSE_CACHE_TIMEOUT", cast=int, default=60 * 5
+)
@@ -24,6 +24,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from monitoring.views import metrics
+
 schema_view = get_schema_view(
     openapi.Info(
         title="Todo API",
@@ -43,6 +45,8 @@ urlpatterns = [
     path("accounts/", include("accounts.urls")),
     path("", include("todo.urls")),
     path("api-auth/", include("rest_framework.urls")),
+    # prometheus scrape endpoint
+    path("metrics", metrics, name="metrics"),
     # Api Documentation
     path(
         "swagger/output.json",
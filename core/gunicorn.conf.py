@@ -0,0 +1,18 @@
+# loaded by gunicorn from the working directory (/app in the containers)
+import os
+import shutil
+
+
+def on_starting(server):
+    # samples of a previous run must not leak into the new one
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
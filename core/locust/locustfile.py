@@ -1,21 +1,369 @@
-from locust import HttpUser, task  # ,between
+"""
+Multi-user workload of the todo app.
 
+Every simulated user takes its own account from a pool of pre-seeded
+users, so the load is spread over real per-user data and writes:
+
+    python manage.py insert_data --users 200 --tasks 200000 --skew 1
+    python manage.py export_load_users --count 200 --output locust/users.csv
+    locust -f locust/locustfile.py -H http://localhost:8000 --headless \
+        -u 200 -r 20 -t 10m --csv locust/report --report-json locust/report.json
+
+--csv writes locust's own stats/failures/history files, --report-json a
+summary with the SLO verdict of every endpoint. The run exits with code 1
+when an SLO is broken, so two releases can be compared on the same seed.
+"""
+
+import csv
+import itertools
+import json
+import os
+import random
+import re
+import time
+
+from locust import HttpUser, between, events, task
+from locust.runners import WorkerRunner
+
+USERS_FILE = os.environ.get(
+    "LOCUST_USERS_FILE",
+    os.path.join(os.path.dirname(__file__), "users.csv"),
+)
+# without a users file everybody shares the admin of the dev database
+FALLBACK_USERS = [{"email": "admin@admin.com", "password": "1234"}]
+
+# words of the faker sentences insert_data writes as titles
+SEARCH_TERMS = ["data", "report", "plan", "team", "review", "meeting", "test"]
+
+# p95 latency (ms) and share of failed requests, per request name
+DEFAULT_SLO = {"p95_ms": 500, "failure_rate": 0.01}
+SLOS = {
+    "api: task list": {"p95_ms": 300, "failure_rate": 0.01},
+    "api: task list [next page]": {"p95_ms": 300, "failure_rate": 0.01},
+    "api: task list [filter]": {"p95_ms": 300, "failure_rate": 0.01},
+    "api: task list [search]": {"p95_ms": 500, "failure_rate": 0.01},
+    "api: task detail": {"p95_ms": 200, "failure_rate": 0.01},
+    "api: task create": {"p95_ms": 400, "failure_rate": 0.01},
+    "api: task complete": {"p95_ms": 400, "failure_rate": 0.01},
+    "api: task delete": {"p95_ms": 400, "failure_rate": 0.01},
+    "api: weather": {"p95_ms": 300, "failure_rate": 0.02},
+    # PBKDF2 makes every login slow on purpose
+    "auth: jwt create": {"p95_ms": 1500, "failure_rate": 0.01},
+    "auth: jwt refresh": {"p95_ms": 200, "failure_rate": 0.01},
+    "auth: jwt verify": {"p95_ms": 200, "failure_rate": 0.01},
+    "html: login": {"p95_ms": 1500, "failure_rate": 0.01},
+    "html: task list": {"p95_ms": 800, "failure_rate": 0.01},
+    "html: weather": {"p95_ms": 800, "failure_rate": 0.02},
+}
+TOTAL_SLO = {"p95_ms": 600, "failure_rate": 0.01}
+
+JWT_CREATE_URL = "/accounts/api/v1/jwt/create/"
+TASK_URL = "/api/v1/task/"
+TASK_PK_PATTERN = re.compile(r"/complete-task/(\d+)/")
+
+
+def load_users(path):
+    if not os.path.exists(path):
+        return FALLBACK_USERS
+    with open(path, newline="") as stream:
+        return list(csv.DictReader(stream)) or FALLBACK_USERS
+
+
+# each simulated user takes the next account; on distributed runs every
+# worker walks the same pool, give them different files for no overlap
+accounts = itertools.cycle(load_users(USERS_FILE))
+
+
+@events.init_command_line_parser.add_listener
+def add_arguments(parser):
+    parser.add_argument(
+        "--report-json",
+        default="",
+        help="write a json summary of the run with the SLO verdicts",
+    )
+
+
+class ApiUser(HttpUser):
+    """A client of the REST API: mostly reads of its own list, some writes."""
+
+    weight = 4
+    wait_time = between(1, 3)
 
-class QuickstartUser(HttpUser):
     def on_start(self):
-        # login user
+        self.account = next(accounts)
+        self.refresh = self.account.get("refresh") or None
+        self.task_ids = []
+        self.created = []
+        self.next_page = None
+        if self.account.get("access"):
+            self.authorize(self.account["access"])
+        else:
+            self.login()
+
+    def authorize(self, access):
+        self.access = access
+        self.client.headers["Authorization"] = f"Bearer {access}"
+
+    def login(self):
+        with self.client.post(
+            JWT_CREATE_URL,
+            data={
+                "email": self.account["email"],
+                "password": self.account["password"],
+            },
+            name="auth: jwt create",
+            catch_response=True,
+        ) as response:
+            if response.status_code != 200:
+                response.failure(f"login failed: {response.status_code}")
+                return
+            tokens = response.json()
+            self.refresh = tokens.get("refresh")
+            self.authorize(tokens["access"])
+
+    def read_page(self, response, cursor=False):
+        # the json of a list response, None (and a failure) when unusable
+        if response.status_code != 200:
+            response.failure(f"status {response.status_code}")
+            return None
+        page = response.json()
+        # cursor pages link the next one as {"links": {"next": ...}}
+        if cursor and "next" not in page.get("links", {}):
+            response.failure("cursor page without links.next")
+            return None
+        return page
+
+    def list_tasks(self, params, name):
+        with self.client.get(
+            TASK_URL, params=params, name=name, catch_response=True
+        ) as response:
+            return self.read_page(response, "pagination" in params)
+
+    @task(30)
+    def task_list(self):
+        page = self.list_tasks({"pagination": "cursor"}, "api: task list")
+        if page is not None:
+            self.task_ids = [item["id"] for item in page["results"]]
+            self.next_page = page["links"]["next"]
+
+    @task(8)
+    def task_list_next_page(self):
+        # a walk that reached the last page starts over
+        if not self.next_page:
+            return self.task_list()
+        with self.client.get(
+            self.next_page,
+            name="api: task list [next page]",
+            catch_response=True,
+        ) as response:
+            page = self.read_page(response, cursor=True)
+        self.next_page = page and page["links"]["next"]
+
+    @task(10)
+    def task_list_filter(self):
+        self.list_tasks(
+            {
+                "pagination": "cursor",
+                "complete": random.choice(["true", "false"]),
+            },
+            "api: task list [filter]",
+        )
+
+    @task(8)
+    def task_list_search(self):
+        self.list_tasks(
+            {"search": random.choice(SEARCH_TERMS)}, "api: task list [search]"
+        )
+
+    @task(10)
+    def task_detail(self):
+        if not self.task_ids:
+            return self.task_list()
+        self.client.get(
+            f"{TASK_URL}{random.choice(self.task_ids)}/",
+            name="api: task detail",
+        )
+
+    @task(8)
+    def task_create(self):
         response = self.client.post(
-            "/accounts/api/v1/jwt/create/",
-            data={"email": "admin@admin.com", "password": "1234"},
-        ).json()
-        self.client.headers = {
-            "Authorization": f'Bearer {response.get("access", None)}'
-        }
+            TASK_URL,
+            json={"title": f"load test {time.time():.0f}"},
+            name="api: task create",
+        )
+        if response.status_code == 201:
+            self.created.append(response.json()["id"])
+
+    @task(6)
+    def task_complete(self):
+        if not self.task_ids:
+            return self.task_list()
+        self.client.patch(
+            f"{TASK_URL}{random.choice(self.task_ids)}/",
+            json={"complete": True},
+            name="api: task complete",
+        )
 
-    @task
-    def api_task_list(self):
-        self.client.get("/api/v1/task/")
+    @task(4)
+    def task_delete(self):
+        # only tasks this run created, the seed stays the same size
+        if not self.created:
+            return self.task_create()
+        self.client.delete(
+            f"{TASK_URL}{self.created.pop()}/", name="api: task delete"
+        )
 
-    @task
-    def api_task_detail(self):
-        self.client.get("/api/v1/task/1/")
+    @task(6)
+    def weather(self):
+        self.client.get("/api/v1/weather/", name="api: weather")
+
+    @task(2)
+    def jwt_verify(self):
+        self.client.post(
+            "/accounts/api/v1/jwt/verify/",
+            json={"token": self.access},
+            name="auth: jwt verify",
+        )
+
+    @task(1)
+    def jwt_refresh(self):
+        if not self.refresh:
+            return self.login()
+        response = self.client.post(
+            "/accounts/api/v1/jwt/refresh/",
+            json={"refresh": self.refresh},
+            name="auth: jwt refresh",
+        )
+        if response.status_code == 200:
+            self.authorize(response.json()["access"])
+
+    @task(1)
+    def jwt_create(self):
+        self.login()
+
+
+class BrowserUser(HttpUser):
+    """A user of the html pages, logged in with a session."""
+
+    weight = 1
+    wait_time = between(2, 5)
+
+    def on_start(self):
+        self.account = next(accounts)
+        self.task_ids = []
+        self.client.get("/accounts/login/", name="html: login page")
+        self.client.post(
+            "/accounts/login/",
+            data={
+                "username": self.account["email"],
+                "password": self.account["password"],
+                "csrfmiddlewaretoken": self.csrf_token(),
+            },
+            headers={"Referer": f"{self.host}/accounts/login/"},
+            allow_redirects=False,
+            name="html: login",
+        )
+
+    def csrf_token(self):
+        return self.client.cookies.get("csrftoken", "")
+
+    @task(10)
+    def task_list(self):
+        response = self.client.get("/", name="html: task list")
+        if response.status_code == 200:
+            self.task_ids = TASK_PK_PATTERN.findall(response.text)
+
+    @task(3)
+    def task_create(self):
+        self.client.post(
+            "/create-task/",
+            data={
+                "title": f"load test {time.time():.0f}",
+                "csrfmiddlewaretoken": self.csrf_token(),
+            },
+            headers={"Referer": f"{self.host}/"},
+            name="html: task create",
+        )
+
+    @task(2)
+    def task_complete(self):
+        if not self.task_ids:
+            return self.task_list()
+        self.client.get(
+            f"/complete-task/{random.choice(self.task_ids)}/",
+            name="html: task complete",
+        )
+
+    @task(2)
+    def weather(self):
+        self.client.get("/weather/", name="html: weather")
+
+
+def check_slo(entry, slo):
+    p95 = entry.get_response_time_percentile(0.95) or 0
+    failure_rate = entry.fail_ratio
+    breaches = []
+    if p95 > slo["p95_ms"]:
+        breaches.append(f"p95 {p95:.0f}ms > {slo['p95_ms']}ms")
+    if failure_rate > slo["failure_rate"]:
+        breaches.append(
+            f"failures {failure_rate:.2%} > {slo['failure_rate']:.2%}"
+        )
+    return {
+        "requests": entry.num_requests,
+        "failures": entry.num_failures,
+        "rps": round(entry.total_rps, 2),
+        "median_ms": entry.median_response_time,
+        "p95_ms": p95,
+        "p99_ms": entry.get_response_time_percentile(0.99) or 0,
+        "max_ms": round(entry.max_response_time or 0),
+        "failure_rate": round(failure_rate, 4),
+        "slo": slo,
+        "passed": not breaches,
+        "breaches": breaches,
+    }
+
+
+@events.quitting.add_listener
+def report(environment, **kwargs):
+    # the master (or a local run) holds the aggregated stats
+    if isinstance(environment.runner, WorkerRunner):
+        return
+    stats = environment.stats
+    endpoints = {
+        entry.name: check_slo(entry, SLOS.get(entry.name, DEFAULT_SLO))
+        for entry in stats.entries.values()
+        if entry.num_requests
+    }
+    total = check_slo(stats.total, TOTAL_SLO)
+    failed = [
+        name for name, result in endpoints.items() if not result["passed"]
+    ]
+    if not total["passed"]:
+        failed.append("total")
+
+    for name in failed:
+        result = total if name == "total" else endpoints[name]
+        print(f"SLO broken: {name}: {', '.join(result['breaches'])}")
+    if failed:
+        environment.process_exit_code = 1
+
+    path = (
+        environment.parsed_options and environment.parsed_options.report_json
+    )
+    if path:
+        summary = {
+            "host": environment.host,
+            "started": stats.start_time,
+            "duration_s": (
+                round(stats.last_request_timestamp - stats.start_time)
+                if stats.last_request_timestamp
+                else 0
+            ),
+            "users": environment.parsed_options.num_users,
+            "passed": not failed,
+            "total": total,
+            "endpoints": endpoints,
+        }
+        with open(path, "w") as stream:
+            json.dump(summary, stream, indent=2, sort_keys=True)
@@ -0,0 +1,126 @@
+from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import RequestProfile, SlowQuery
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    date_hierarchy = "created_date"
+    list_display = (
+        "created_date",
+        "method",
+        "path",
+        "status_code",
+        "duration_ms",
+        "queries",
+        "user",
+        "download",
+    )
+    list_filter = ("method", "status_code", "route")
+    list_select_related = ("user",)
+    search_fields = ("path", "route")
+    # the pstats dump is only downloaded, never loaded for the list
+    exclude = ("stats",)
+    readonly_fields = (
+        "user",
+        "method",
+        "path",
+        "route",
+        "status_code",
+        "duration_ms",
+        "queries",
+        "created_date",
+        "download",
+        "summary_text",
+    )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("stats", "summary")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:pk>/download/",
+                self.admin_site.admin_view(self.download_view),
+                name="monitoring_requestprofile_download",
+            )
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        response = HttpResponse(
+            bytes(profile.stats), content_type="application/octet-stream"
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="request-{profile.pk}.prof"'
+        )
+        return response
+
+    @admin.display(description="pstats")
+    def download(self, obj):
+        url = reverse(
+            "admin:monitoring_requestprofile_download", args=[obj.pk]
+        )
+        return format_html('<a href="{}">request-{}.prof</a>', url, obj.pk)
+
+    @admin.display(description="summary")
+    def summary_text(self, obj):
+        return format_html("<pre>{}</pre>", obj.summary)
+
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = (
+        "statement_text",
+        "view",
+        "calls",
+        "total_ms",
+        "mean_ms",
+        "max_ms",
+        "last_seen",
+    )
+    list_filter = ("view",)
+    search_fields = ("statement", "view")
+    readonly_fields = (
+        "fingerprint",
+        "statement",
+        "example",
+        "view",
+        "calls",
+        "total_ms",
+        "max_ms",
+        "first_seen",
+        "last_seen",
+        "plan_text",
+    )
+    exclude = ("plan",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="statement")
+    def statement_text(self, obj):
+        return obj.statement[:120]
+
+    @admin.display(description="plan")
+    def plan_text(self, obj):
+        return format_html("<pre>{}</pre>", obj.plan)
+
+
+admin.site.register(SlowQuery, SlowQueryAdmin)
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "monitoring"
+
+    def ready(self):
+        # time the queries of every connection, see collector.record_query
+        from django.db.backends.signals import connection_created
+
+        from .collector import install_query_wrapper
+
+        connection_created.connect(install_query_wrapper)
@@ -0,0 +1,39 @@
+"""
+Cache backends that count their hits and misses, e.g.
+CACHES["default"]["BACKEND"] = "monitoring.cache.RedisCache".
+"""
+
+from django.core.cache.backends.locmem import LocMemCache as BaseLocMemCache
+from django_redis.cache import RedisCache as BaseRedisCache
+
+from .collector import record_cache
+from .metrics import CACHE_REQUESTS
+
+MISSING = object()
+
+
+class InstrumentedCacheMixin:
+    def get(self, key, default=None, version=None, **kwargs):
+        value = super().get(key, MISSING, version, **kwargs)
+        self.record(int(value is not MISSING), int(value is MISSING))
+        return default if value is MISSING else value
+
+    def record(self, hits, misses):
+        if hits:
+            CACHE_REQUESTS.labels("hit").inc(hits)
+        if misses:
+            CACHE_REQUESTS.labels("miss").inc(misses)
+        record_cache(hits, misses)
+
+
+class RedisCache(InstrumentedCacheMixin, BaseRedisCache):
+    def get_many(self, keys, version=None, **kwargs):
+        # one MGET; the base class of LocMemCache loops over get() instead
+        keys = list(keys)
+        values = super().get_many(keys, version, **kwargs)
+        self.record(len(values), len(keys) - len(values))
+        return values
+
+
+class LocMemCache(InstrumentedCacheMixin, BaseLocMemCache):
+    pass
@@ -0,0 +1,70 @@
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .slow_queries import recorder, recording
+
+# stats of the request being served; sync_to_async copies the context, so
+# the ORM calls of async views report to the same object
+current = ContextVar("monitoring_request_stats", default=None)
+
+
+class RequestStats:
+    __slots__ = (
+        "request",
+        "started",
+        "queries",
+        "db_time",
+        "cache_hits",
+        "cache_misses",
+    )
+
+    def __init__(self, request=None):
+        self.request = request
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def view(self):
+        match = getattr(self.request, "resolver_match", None)
+        return match.view_name if match is not None else "-"
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current.get()
+    start = time.perf_counter()
+    try:
+        result = execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        if stats is not None:
+            stats.db_time += duration
+            stats.queries += 1
+    threshold = settings.MONITORING_SLOW_QUERY_MS
+    if threshold and duration * 1000 >= threshold and not recording.get():
+        recorder.capture(
+            context["connection"].alias,
+            sql,
+            params,
+            many,
+            duration,
+            stats.view if stats is not None else "-",
+        )
+    return result
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    # connection_created fires on every reconnect of the same wrapper
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_cache(hits, misses):
+    stats = current.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import ExpressionWrapper, F, FloatField
+from django.utils import timezone
+
+from ...models import SlowQuery
+
+ORDERINGS = {
+    "total": "-total_ms",
+    "max": "-max_ms",
+    "mean": "-mean",
+    "calls": "-calls",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "top slow statements captured by the monitoring app "
+        "(MONITORING_SLOW_QUERY_MS), aggregated by normalized sql"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=20)
+        parser.add_argument(
+            "--order", choices=ORDERINGS, default="total", help="sort key"
+        )
+        parser.add_argument(
+            "--since",
+            type=float,
+            default=None,
+            help="only statements seen in the last N hours",
+        )
+        parser.add_argument("--view", help="only statements of this url name")
+        parser.add_argument(
+            "--plans", action="store_true", help="print the EXPLAIN plans"
+        )
+        parser.add_argument(
+            "--reset", action="store_true", help="forget every statement"
+        )
+
+    def handle(self, *args, **options):
+        if options["reset"]:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(f"{deleted} statements deleted")
+            return
+        queries = SlowQuery.objects.annotate(
+            mean=ExpressionWrapper(
+                F("total_ms") / F("calls"), output_field=FloatField()
+            )
+        )
+        if options["since"] is not None:
+            since = timezone.now() - timedelta(hours=options["since"])
+            queries = queries.filter(last_seen__gte=since)
+        if options["view"]:
+            queries = queries.filter(view=options["view"])
+        queries = queries.order_by(ORDERINGS[options["order"]])
+
+        self.stdout.write(
+            f"{'calls':>7} {'total ms':>10} {'mean ms':>9} {'max ms':>9}  "
+            "view / statement"
+        )
+        for query in queries[: options["top"]]:
+            self.stdout.write(
+                f"{query.calls:>7} {query.total_ms:>10.1f} "
+                f"{query.mean:>9.1f} {query.max_ms:>9.1f}  {query.view}"
+            )
+            self.stdout.write(f"{'':>39}{query.statement}")
+            if options["plans"] and query.plan:
+                for line in query.plan.splitlines():
+                    self.stdout.write(f"{'':>41}{line}")
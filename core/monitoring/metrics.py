@@ -0,0 +1,53 @@
+"""
+Prometheus metrics of the app. With PROMETHEUS_MULTIPROC_DIR set (it must
+be set before the first import of prometheus_client), every gunicorn
+worker writes its samples there and /metrics aggregates all of them.
+"""
+
+from prometheus_client import Counter, Histogram
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+REQUEST_LATENCY = Histogram(
+    "django_http_request_duration_seconds",
+    "Latency of the requests, by route",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "django_http_request_db_queries",
+    "Database queries per request",
+    ["route"],
+    buckets=QUERY_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "django_http_request_db_duration_seconds",
+    "Time spent in database queries per request",
+    ["route"],
+    buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "django_http_response_size_bytes",
+    "Size of the (non-streaming) response bodies",
+    ["route"],
+    buckets=SIZE_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "django_cache_requests_total",
+    "Cache reads of the instrumented backends, by result",
+    ["result"],
+)
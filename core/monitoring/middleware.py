@@ -0,0 +1,134 @@
+import time
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+
+from .collector import RequestStats, current
+from .metrics import (
+    REQUEST_DB_TIME,
+    REQUEST_LATENCY,
+    REQUEST_QUERIES,
+    RESPONSE_SIZE,
+)
+from .profiling import RequestProfiler, get_staff_user, wants_profile
+
+# not worth a histogram of their own
+SKIPPED_PATHS = ("/metrics",)
+
+
+class MetricsMiddleware:
+    """
+    Records latency, query count and time, and response size of every
+    request in Prometheus histograms labelled by route pattern (bounded
+    cardinality, unlike paths), and reports the same numbers plus the
+    cache hits in a Server-Timing header. Works for sync and async views.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = settings.MONITORING_SERVER_TIMING
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path in SKIPPED_PATHS:
+            return self.get_response(request)
+        stats = RequestStats(request)
+        token = current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        self.record(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        if request.path in SKIPPED_PATHS:
+            return await self.get_response(request)
+        stats = RequestStats(request)
+        token = current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        self.record(request, response, stats)
+        return response
+
+    def record(self, request, response, stats):
+        elapsed = time.perf_counter() - stats.started
+        match = request.resolver_match
+        route = match.route if match is not None else "<unmatched>"
+        REQUEST_LATENCY.labels(
+            request.method, route, response.status_code
+        ).observe(elapsed)
+        REQUEST_QUERIES.labels(route).observe(stats.queries)
+        REQUEST_DB_TIME.labels(route).observe(stats.db_time)
+        if not response.streaming:
+            RESPONSE_SIZE.labels(route).observe(len(response.content))
+        if self.server_timing:
+            response["Server-Timing"] = server_timing(elapsed, stats)
+
+
+def server_timing(elapsed, stats):
+    return ", ".join(
+        [
+            f"app;dur={elapsed * 1000:.1f}",
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+            f'cache;desc="{stats.cache_hits} hits, '
+            f'{stats.cache_misses} misses"',
+        ]
+    )
+
+
+class ProfilingMiddleware:
+    """
+    Runs cProfile around a single request when a staff user asks for it
+    with the MONITORING_PROFILE_HEADER header or MONITORING_PROFILE_PARAM
+    query flag, stores it as a RequestProfile (see the admin) and returns
+    its id in X-Profile-Id. Other requests only pay for the flag lookup.
+    On async views only the event loop thread is profiled, not the
+    sync_to_async calls.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not wants_profile(request):
+            return self.get_response(request)
+        user = get_staff_user(request)
+        if user is None:
+            return self.get_response(request)
+        with RequestProfiler() as profiler:
+            response = self.get_response(request)
+        profile = profiler.save(request, response, user)
+        response["X-Profile-Id"] = str(profile.id)
+        return response
+
+    async def __acall__(self, request):
+        if not wants_profile(request):
+            return await self.get_response(request)
+        user = await sync_to_async(get_staff_user)(request)
+        if user is None:
+            return await self.get_response(request)
+        with RequestProfiler() as profiler:
+            response = await self.get_response(request)
+        profile = await sync_to_async(profiler.save)(request, response, user)
+        response["X-Profile-Id"] = str(profile.id)
+        return response
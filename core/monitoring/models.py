@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class RequestProfile(models.Model):
+    """cProfile run of one request, asked for by a staff user."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True
+    )
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2048)
+    route = models.CharField(max_length=255, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    queries = models.PositiveIntegerField(default=0)
+    # the heaviest functions by cumulative time, as pstats prints them
+    summary = models.TextField()
+    # pstats dump, the format of Stats.dump_stats (snakeviz, pstats)
+    stats = models.BinaryField()
+    created_date = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ("-created_date",)
+
+    def __str__(self):
+        return f"{self.method} {self.path}"
+
+
+class SlowQuery(models.Model):
+    """Queries over MONITORING_SLOW_QUERY_MS, aggregated by statement."""
+
+    fingerprint = models.CharField(max_length=40, unique=True)
+    # literals and parameters replaced by ?
+    statement = models.TextField()
+    # the first one seen, with its %s placeholders
+    example = models.TextField()
+    # url name of the last view that ran it, - outside requests
+    view = models.CharField(max_length=255)
+    calls = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    plan = models.TextField(blank=True)
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ("-total_ms",)
+        verbose_name_plural = "slow queries"
+
+    def __str__(self):
+        return self.statement[:100]
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.calls if self.calls else 0
@@ -0,0 +1,83 @@
+import cProfile
+import io
+import marshal
+import pstats
+import time
+
+from django.conf import settings
+from rest_framework.exceptions import APIException
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .collector import current
+from .models import RequestProfile
+
+
+def wants_profile(request):
+    # header first: no query string parsing for the common case
+    if settings.MONITORING_PROFILE_HEADER in request.headers:
+        return True
+    if not request.META.get("QUERY_STRING"):
+        return False
+    return settings.MONITORING_PROFILE_PARAM in request.GET
+
+
+def get_staff_user(request):
+    """
+    Staff user behind the request: the session one, else the JWT one
+    (DRF authenticates API requests only inside the view).
+    """
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user if user.is_staff else None
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except APIException:
+        return None
+    if result is None or not result[0].is_staff:
+        return None
+    return result[0]
+
+
+class RequestProfiler:
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.started = None
+        self.duration = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        self.duration = time.perf_counter() - self.started
+
+    def save(self, request, response, user):
+        summary = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=summary)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(
+            settings.MONITORING_PROFILE_TOP
+        )
+        match = request.resolver_match
+        request_stats = current.get()
+        profile = RequestProfile.objects.create(
+            user=user,
+            method=request.method,
+            path=request.get_full_path()[:2048],
+            route=match.route[:255] if match is not None else "",
+            status_code=response.status_code,
+            duration_ms=round(self.duration * 1000, 3),
+            queries=request_stats.queries if request_stats else 0,
+            summary=summary.getvalue(),
+            stats=marshal.dumps(stats.stats),
+        )
+        prune_profiles()
+        return profile
+
+
+def prune_profiles():
+    # keep the latest MONITORING_PROFILE_KEEP
+    keep = settings.MONITORING_PROFILE_KEEP
+    stale = RequestProfile.objects.values_list("id", flat=True)[keep:]
+    RequestProfile.objects.filter(id__in=list(stale)).delete()
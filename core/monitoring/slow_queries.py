@@ -0,0 +1,150 @@
+"""
+Capture of the queries slower than MONITORING_SLOW_QUERY_MS. The request
+thread only queues them; a background thread aggregates them by
+normalized statement in SlowQuery and takes an EXPLAIN plan of each new
+statement on its own connection.
+"""
+
+import hashlib
+import logging
+import queue
+import re
+import threading
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# set while the recorder runs its own queries, they are never captured
+recording = ContextVar("monitoring_slow_query_recording", default=False)
+
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+IN_LIST = re.compile(r"\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)", re.IGNORECASE)
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+WHITESPACE = re.compile(r"\s+")
+QUEUE_SIZE = 1000
+# the recorder's own table, read by the slow_queries command
+OWN_TABLE = '"monitoring_slowquery"'
+
+
+def normalize(sql):
+    """The statement with every literal and parameter replaced by ?."""
+    sql = STRING.sub("?", sql)
+    sql = NUMBER.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = IN_LIST.sub("IN (...)", sql)
+    return WHITESPACE.sub(" ", sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(sql.encode()).hexdigest()
+
+
+def explain(alias, sql, params):
+    connection = connections[alias]
+    if connection.vendor == "postgresql":
+        prefix = "EXPLAIN (ANALYZE off, FORMAT TEXT) "
+    elif connection.vendor == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        prefix = "EXPLAIN "
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        return "\n".join(
+            " ".join(str(column) for column in row)
+            for row in cursor.fetchall()
+        )
+
+
+class SlowQueryRecorder:
+    def __init__(self):
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def capture(self, alias, sql, params, many, duration, view):
+        if OWN_TABLE in sql:
+            return
+        logger.warning(
+            "slow query (%.1f ms) in %s: %s", duration * 1000, view, sql
+        )
+        item = (alias, sql, None if many else params, duration, view)
+        if not settings.MONITORING_SLOW_QUERY_BACKGROUND:
+            self.record(*item)
+            return
+        self.start()
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # never slow the request down, the statement shows up again
+            pass
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name="slow-queries", daemon=True
+                )
+                self.thread.start()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                self.record(*item)
+            except Exception:
+                logger.exception("could not record a slow query")
+            finally:
+                self.queue.task_done()
+
+    def record(self, alias, sql, params, duration, view):
+        from .models import SlowQuery
+
+        token = recording.set(True)
+        try:
+            statement = normalize(sql)
+            key = fingerprint(statement)
+            duration_ms = duration * 1000
+            updated = SlowQuery.objects.filter(fingerprint=key).update(
+                calls=F("calls") + 1,
+                total_ms=F("total_ms") + duration_ms,
+                max_ms=Greatest("max_ms", duration_ms),
+                view=view,
+                last_seen=timezone.now(),
+            )
+            if updated:
+                return
+            plan = ""
+            if params is not None and statement.upper().startswith(
+                EXPLAINABLE
+            ):
+                try:
+                    with transaction.atomic(using=alias):
+                        plan = explain(alias, sql, params)
+                except Exception as exc:
+                    plan = f"EXPLAIN failed: {exc}"
+            SlowQuery.objects.get_or_create(
+                fingerprint=key,
+                defaults={
+                    "statement": statement,
+                    "example": sql,
+                    "view": view,
+                    "calls": 1,
+                    "total_ms": duration_ms,
+                    "max_ms": duration_ms,
+                    "plan": plan,
+                },
+            )
+        finally:
+            recording.reset(token)
+
+
+recorder = SlowQueryRecorder()
@@ -0,0 +1,152 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User, Profile
+from monitoring.collector import RequestStats, current
+from monitoring.middleware import server_timing
+from todo.models import Task
+
+TASK_ROUTE = "api/v1/task/$"
+
+
+@pytest.fixture
+def common_user():
+    user = User.objects.create_user(
+        email="test333@test.com",
+        password="test/!1234",
+        is_verified=True,
+        is_active=True,
+    )
+    return user
+
+
+@pytest.fixture
+def api_client(common_user):
+    client = APIClient()
+    client.force_authenticate(common_user)
+    return client
+
+
+@pytest.fixture
+def instrumented_cache(settings):
+    settings.CACHES = {"default": {"BACKEND": "monitoring.cache.LocMemCache"}}
+    yield cache
+    cache.clear()
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.mark.django_db
+class TestMetricsMiddleware:
+    def test_server_timing_header(self, api_client, common_user):
+        Task.objects.create(
+            user=Profile.objects.get(user=common_user), title="task"
+        )
+        response = api_client.get(reverse("todo:api-v1:task-list"))
+        assert response.status_code == 200
+        header = response["Server-Timing"]
+        assert header.startswith("app;dur=")
+        assert "queries" in header
+        assert "db;dur=" in header
+
+    def test_records_route_histograms(self, api_client):
+        labels = {"method": "GET", "route": TASK_ROUTE, "status": "200"}
+        before = sample("django_http_request_duration_seconds_count", **labels)
+        queries = sample(
+            "django_http_request_db_queries_sum", route=TASK_ROUTE
+        )
+        api_client.get(reverse("todo:api-v1:task-list"))
+        api_client.get(reverse("todo:api-v1:task-list"))
+        after = sample("django_http_request_duration_seconds_count", **labels)
+        assert after == before + 2
+        total = sample("django_http_request_db_queries_sum", route=TASK_ROUTE)
+        assert total > queries
+        assert sample(
+            "django_http_response_size_bytes_count", route=TASK_ROUTE
+        )
+
+    def test_server_timing_can_be_disabled(self, client, settings):
+        settings.MONITORING_SERVER_TIMING = False
+        response = client.get(reverse("accounts:login"))
+        assert "Server-Timing" not in response
+
+    def test_async_view_queries_are_counted(self, common_user):
+        # the ORM calls of async views run in sync_to_async threads
+        client = APIClient()
+        token = RefreshToken.for_user(common_user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        response = client.get(reverse("todo:api-v1:async-task-list"))
+        assert response.status_code == 200
+        queries = response["Server-Timing"].split('desc="')[1].split()[0]
+        assert int(queries) > 0
+
+
+@pytest.mark.django_db
+class TestInstrumentedCache:
+    def test_counts_hits_and_misses(self, instrumented_cache):
+        hits = sample("django_cache_requests_total", result="hit")
+        misses = sample("django_cache_requests_total", result="miss")
+        instrumented_cache.set("a", None)
+        assert instrumented_cache.get("a", "default") is None
+        assert instrumented_cache.get("b", "default") == "default"
+        assert instrumented_cache.get_many(["a", "b", "c"]) == {"a": None}
+        assert sample("django_cache_requests_total", result="hit") == hits + 2
+        assert (
+            sample("django_cache_requests_total", result="miss") == misses + 3
+        )
+
+    def test_reports_to_the_current_request(self, instrumented_cache):
+        stats = RequestStats()
+        token = current.set(stats)
+        try:
+            instrumented_cache.get("missing")
+        finally:
+            current.reset(token)
+        assert (stats.cache_hits, stats.cache_misses) == (0, 1)
+        assert 'cache;desc="0 hits, 1 misses"' in server_timing(0.01, stats)
+
+
+@pytest.mark.django_db
+class TestMetricsEndpoint:
+    def test_exposes_prometheus_text(self, client, settings):
+        settings.MONITORING_METRICS_ALLOWED_IPS = ["127.0.0.1"]
+        client.get(reverse("accounts:login"))
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response["Content-Type"].startswith("text/plain")
+        assert (
+            b"django_http_request_duration_seconds_bucket" in response.content
+        )
+
+    def test_denied_by_default(self, client):
+        assert client.get("/metrics").status_code == 403
+
+    def test_token(self, client, settings):
+        settings.MONITORING_METRICS_TOKEN = "secret"
+        assert client.get("/metrics").status_code == 403
+        response = client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong")
+        assert response.status_code == 403
+        response = client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        assert response.status_code == 200
+
+    def test_allowed_network(self, client, settings):
+        settings.MONITORING_METRICS_ALLOWED_IPS = ["10.0.0.0/8"]
+        assert client.get("/metrics").status_code == 403
+        response = client.get("/metrics", REMOTE_ADDR="10.1.2.3")
+        assert response.status_code == 200
+
+    def test_staff_only(self, client):
+        user = User.objects.create_user(
+            email="staff@test.com", password="test/!1234", is_active=True
+        )
+        client.force_login(user)
+        assert client.get("/metrics").status_code == 403
+        user.is_staff = True
+        user.save()
+        assert client.get("/metrics").status_code == 200
@@ -0,0 +1,109 @@
+import marshal
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from monitoring.models import RequestProfile
+
+
+@pytest.fixture
+def staff_user():
+    return User.objects.create_superuser(
+        email="staff@test.com", password="a/@1234567", is_verified=True
+    )
+
+
+@pytest.fixture
+def common_user():
+    return User.objects.create_user(
+        email="test333@test.com",
+        password="test/!1234",
+        is_verified=True,
+        is_active=True,
+    )
+
+
+def jwt_client(user):
+    client = APIClient()
+    token = RefreshToken.for_user(user).access_token
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    return client
+
+
+@pytest.mark.django_db
+class TestProfilingMiddleware:
+    def test_unflagged_request_is_not_profiled(self, staff_user):
+        response = jwt_client(staff_user).get(reverse("todo:api-v1:task-list"))
+        assert response.status_code == 200
+        assert "X-Profile-Id" not in response
+        assert not RequestProfile.objects.exists()
+
+    def test_staff_jwt_header(self, staff_user):
+        response = jwt_client(staff_user).get(
+            reverse("todo:api-v1:task-list"), HTTP_X_PROFILE="1"
+        )
+        assert response.status_code == 200
+        profile = RequestProfile.objects.get(id=response["X-Profile-Id"])
+        assert profile.user == staff_user
+        assert profile.path == "/api/v1/task/"
+        assert profile.route == "api/v1/task/$"
+        assert profile.status_code == 200
+        assert profile.duration_ms > 0
+        assert "cumulative" in profile.summary
+        assert isinstance(marshal.loads(bytes(profile.stats)), dict)
+
+    def test_staff_session_query_flag(self, client, staff_user):
+        client.force_login(staff_user)
+        response = client.get(reverse("todo:task_list"), {"_profile": 1})
+        assert response.status_code == 200
+        assert RequestProfile.objects.filter(
+            id=response["X-Profile-Id"], path="/?_profile=1"
+        ).exists()
+
+    def test_ignored_for_non_staff(self, common_user):
+        response = jwt_client(common_user).get(
+            reverse("todo:api-v1:task-list"), {"_profile": 1}
+        )
+        assert response.status_code == 200
+        assert "X-Profile-Id" not in response
+        assert not RequestProfile.objects.exists()
+
+    def test_ignored_for_anonymous(self, client):
+        client.get(reverse("accounts:login"), HTTP_X_PROFILE="1")
+        assert not RequestProfile.objects.exists()
+
+    def test_keeps_the_latest(self, staff_user, settings):
+        settings.MONITORING_PROFILE_KEEP = 2
+        client = jwt_client(staff_user)
+        ids = [
+            client.get(reverse("todo:api-v1:task-list"), HTTP_X_PROFILE="1")[
+                "X-Profile-Id"
+            ]
+            for _ in range(3)
+        ]
+        assert sorted(
+            RequestProfile.objects.values_list("id", flat=True)
+        ) == sorted(map(int, ids[1:]))
+
+
+@pytest.mark.django_db
+class TestRequestProfileAdmin:
+    def test_list_and_download(self, client, staff_user):
+        client.force_login(staff_user)
+        client.get(reverse("todo:task_list"), HTTP_X_PROFILE="1")
+        profile = RequestProfile.objects.get()
+        response = client.get(
+            reverse("admin:monitoring_requestprofile_changelist")
+        )
+        assert response.status_code == 200
+        assert f"request-{profile.pk}.prof" in response.content.decode()
+        response = client.get(
+            reverse(
+                "admin:monitoring_requestprofile_download", args=[profile.pk]
+            )
+        )
+        assert response.status_code == 200
+        assert response.content == bytes(profile.stats)
@@ -0,0 +1,98 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from monitoring.models import SlowQuery
+from monitoring.slow_queries import normalize, recorder
+
+
+@pytest.fixture
+def api_client():
+    user = User.objects.create_user(
+        email="test333@test.com",
+        password="test/!1234",
+        is_verified=True,
+        is_active=True,
+    )
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def capture_all(settings):
+    # every query is "slow", recorded in the request thread
+    settings.MONITORING_SLOW_QUERY_MS = 0.000001
+    settings.MONITORING_SLOW_QUERY_BACKGROUND = False
+    settings.TASK_RESPONSE_CACHE_TIMEOUT = 0
+
+
+def test_normalize():
+    normalized = normalize(
+        "SELECT * FROM t WHERE a = %s AND b IN (%s, %s, %s)\n"
+        "  AND c = 'x''y' LIMIT 21"
+    )
+    assert normalized == (
+        "SELECT * FROM t WHERE a = ? AND b IN (...) AND c = ? LIMIT ?"
+    )
+
+
+@pytest.mark.django_db
+class TestSlowQueryCapture:
+    def test_aggregates_with_view_and_plan(self, api_client, capture_all):
+        url = reverse("todo:api-v1:task-list")
+        api_client.get(url)
+        api_client.get(url)
+        queries = SlowQuery.objects.filter(view="todo:api-v1:task-list")
+        assert queries.exists()
+        query = queries.get(statement__contains='FROM "todo_task"')
+        assert query.calls == 2
+        assert query.max_ms <= query.total_ms
+        assert "?" in query.statement and "%s" not in query.statement
+        assert query.plan and not query.plan.startswith("EXPLAIN failed")
+
+    def test_own_queries_are_not_captured(self, api_client, capture_all):
+        api_client.get(reverse("todo:api-v1:task-list"))
+        assert not SlowQuery.objects.filter(
+            statement__contains="monitoring_slowquery"
+        ).exists()
+
+    def test_off_by_threshold(self, api_client, settings):
+        settings.MONITORING_SLOW_QUERY_MS = 0
+        settings.MONITORING_SLOW_QUERY_BACKGROUND = False
+        api_client.get(reverse("todo:api-v1:task-list"))
+        assert not SlowQuery.objects.exists()
+
+    def test_background_thread(self, monkeypatch, settings):
+        recorded = []
+        monkeypatch.setattr(
+            recorder, "record", lambda *item: recorded.append(item)
+        )
+        settings.MONITORING_SLOW_QUERY_BACKGROUND = True
+        recorder.capture("default", "SELECT %s", [1], False, 0.5, "-")
+        recorder.queue.join()
+        assert recorded == [("default", "SELECT %s", [1], 0.5, "-")]
+
+
+@pytest.mark.django_db
+class TestSlowQueriesCommand:
+    def test_top_and_reset(self, api_client, capture_all):
+        api_client.get(reverse("todo:api-v1:task-list"))
+        out = io.StringIO()
+        call_command(
+            "slow_queries", top=5, order="max", plans=True, stdout=out
+        )
+        lines = out.getvalue().splitlines()
+        assert lines[0].split()[:2] == ["calls", "total"]
+        assert "todo:api-v1:task-list" in out.getvalue()
+
+        out = io.StringIO()
+        call_command("slow_queries", view="nope", stdout=out)
+        assert len(out.getvalue().splitlines()) == 1
+
+        call_command("slow_queries", reset=True, stdout=io.StringIO())
+        assert not SlowQuery.objects.exists()
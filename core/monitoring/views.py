@@ -0,0 +1,57 @@
+import hmac
+import ipaddress
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+
+def get_registry():
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    # samples of every worker process, collected on each scrape
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def ip_allowed(address):
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in settings.MONITORING_METRICS_ALLOWED_IPS
+    )
+
+
+def can_scrape(request):
+    # per-view latency and traffic are not for everybody
+    token = settings.MONITORING_METRICS_TOKEN
+    if token:
+        given = request.headers.get("Authorization", "")
+        if hmac.compare_digest(given, f"Bearer {token}"):
+            return True
+    if ip_allowed(request.META.get("REMOTE_ADDR", "")):
+        return True
+    return request.user.is_active and request.user.is_staff
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint, for staff users, MONITORING_METRICS_TOKEN
+    and MONITORING_METRICS_ALLOWED_IPS only.
+    """
+    if not can_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST
+    )
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from .cache import bump_tasks_version_on_commit
 from .models import Task
 
 # Register your models here.
@@ -14,11 +15,22 @@ class TaskAdmin(admin.ModelAdmin):
         "created_date",
     )
     list_filter = ("complete",)
+    # "user" column prints profile.user.email
+    list_select_related = ("user__user",)
     # ordering = ('-created_date',)
-    search_fields = (
-        "title",
-        "user",
-    )
+    search_fields = ("title",)
+
+    # same indexed search as the api (?search=)
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.search(search_term), False
+
+    # the delete action: one version bump per owner, see todo.signals
+    def delete_queryset(self, request, queryset):
+        profile_ids = set(queryset.values_list("user", flat=True))
+        super().delete_queryset(request, queryset)
+        bump_tasks_version_on_commit(*profile_ids)
 
 
 admin.site.register(Task, TaskAdmin)
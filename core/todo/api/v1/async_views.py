@@ -0,0 +1,137 @@
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    NotAuthenticated,
+    NotFound,
+    ValidationError,
+)
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+
+from accounts.authentication import StatelessJWTAuthentication
+from accounts.utils import aget_request_profile, aget_request_profile_id
+from ...models import Task
+from ...weather import aget_weather
+from .paginations import TaskCursorPagination
+from .serializers import TaskSerializer
+
+jwt_authentication = StatelessJWTAuthentication()
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncAPIView(View):
+    """
+    Base of the async task and weather endpoints, served by core.asgi
+    without holding a worker while they wait on the database, the cache
+    or the weather api. Only JWT bearer tokens are accepted here: the
+    other DRF authentication classes are synchronous.
+    """
+
+    authentication_required = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user = await self.authenticate(request)
+            if request.user is None and self.authentication_required:
+                raise NotAuthenticated()
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            data = exc.detail
+            if not isinstance(data, (dict, list)):
+                data = {"detail": data}
+            return JsonResponse(data, status=exc.status_code, safe=False)
+
+    async def authenticate(self, request):
+        header = jwt_authentication.get_header(request)
+        if header is None:
+            return None
+        raw_token = jwt_authentication.get_raw_token(header)
+        if raw_token is None:
+            return None
+        # signature and expiry checks, no database access
+        token = jwt_authentication.get_validated_token(raw_token)
+        # claims of fresh tokens, else the cached user row
+        return await jwt_authentication.aget_user(token)
+
+    def get_drf_request(self, request, **kwargs):
+        # TaskSerializer reads the view kwargs from the parser context
+        return Request(
+            request, parsers=[JSONParser()], parser_context={"kwargs": kwargs}
+        )
+
+    async def get_queryset(self, request):
+        if not request.user.is_verified:
+            raise ValidationError({"detail": "User is not verified."})
+        profile_id = await aget_request_profile_id(request)
+        return Task.objects.filter(user=profile_id).select_related(
+            "user__user"
+        )
+
+
+class AsyncTaskListView(AsyncAPIView):
+    # keyset pages only: a COUNT(*) per page is what async should avoid
+    async def get(self, request):
+        queryset = await self.get_queryset(request)
+        complete = request.GET.get("complete")
+        if complete in ("true", "True", "1"):
+            queryset = queryset.filter(complete=True)
+        elif complete in ("false", "False", "0"):
+            queryset = queryset.filter(complete=False)
+
+        drf_request = self.get_drf_request(request)
+        paginator = TaskCursorPagination()
+        queryset = paginator.get_page_queryset(queryset, drf_request)
+        page = paginator.set_page([task async for task in queryset])
+        data = TaskSerializer(
+            page, many=True, context={"request": drf_request}
+        ).data
+        return JsonResponse(paginator.get_paginated_response(data).data)
+
+    async def post(self, request):
+        queryset = await self.get_queryset(request)
+        drf_request = self.get_drf_request(request)
+        serializer = TaskSerializer(
+            data=drf_request.data, context={"request": drf_request}
+        )
+        serializer.is_valid(raise_exception=True)
+        task = await Task.objects.acreate(
+            user=await aget_request_profile(request),
+            **serializer.validated_data,
+        )
+        # read it back with the joins the serializer needs
+        task = await queryset.aget(pk=task.pk)
+        data = TaskSerializer(task, context={"request": drf_request}).data
+        return JsonResponse(data, status=status.HTTP_201_CREATED)
+
+
+class AsyncTaskDetailView(AsyncAPIView):
+    async def get(self, request, pk):
+        queryset = await self.get_queryset(request)
+        task = await queryset.filter(pk=pk).afirst()
+        if task is None:
+            raise NotFound()
+        drf_request = self.get_drf_request(request, pk=pk)
+        data = TaskSerializer(task, context={"request": drf_request}).data
+        return JsonResponse(data)
+
+
+class AsyncWeatherView(AsyncAPIView):
+    # shared entries per location bucket, anonymous users get the default
+    authentication_required = False
+
+    async def get(self, request):
+        latitude = longitude = None
+        if request.user is not None:
+            profile = await aget_request_profile(request)
+            latitude, longitude = profile.latitude, profile.longitude
+        data = await aget_weather(latitude, longitude)
+        if data is None:
+            return JsonResponse(
+                {"detail": "weather is not available right now"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        return JsonResponse({"weather": data})
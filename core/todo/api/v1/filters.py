@@ -0,0 +1,15 @@
+from rest_framework.filters import SearchFilter
+
+
+class TaskSearchFilter(SearchFilter):
+    """
+    ?search= backed by TaskQuerySet.search(): indexed full-text and
+    trigram matching on PostgreSQL, icontains elsewhere. Results come back
+    by relevance unless the client asks for an explicit ?ordering=.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, "").strip()
+        if not term:
+            return queryset
+        return queryset.search(term)
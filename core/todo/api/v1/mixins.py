@@ -0,0 +1,83 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from rest_framework.response import Response
+
+from accounts.utils import get_request_profile_id
+from ...cache import get_tasks_version
+
+# rendered data of a task list/detail response, keyed by its ETag
+TASKS_RESPONSE_KEY = "todo:tasks:response:{}"
+
+
+class ConditionalTaskMixin:
+    """
+    Strong ETag for task list and detail responses, derived from the
+    per-user task version instead of from the payload. A matching
+    If-None-Match is answered with 304 before the queryset is evaluated or
+    the serializer runs. There is no Last-Modified: two writes within one
+    second would share it, so If-Modified-Since alone never gives a 304.
+
+    Other requests are served from a per-user response cache. The ETag
+    already holds the user's version, so a task write moves the user to
+    new keys and old entries simply expire: nothing stale is served and
+    invalidation is a single version bump.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        # lazy queryset, but it refuses unverified users before any 304
+        self.get_queryset()
+        version = get_tasks_version(get_request_profile_id(request))
+        etag = self.get_task_etag(request, version)
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = self.cached_response(
+                etag, handler, request, *args, **kwargs
+            )
+            if response.status_code != 200:
+                return response
+        response["ETag"] = etag
+        # per-user payload: browsers may keep it but must revalidate
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def cached_response(self, etag, handler, request, *args, **kwargs):
+        timeout = getattr(settings, "TASK_RESPONSE_CACHE_TIMEOUT", None)
+        if not timeout:
+            return handler(request, *args, **kwargs)
+        key = TASKS_RESPONSE_KEY.format(etag.strip('"'))
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout)
+        response["X-Cache"] = "MISS"
+        return response
+
+    def get_task_etag(self, request, version):
+        # absolute uri: the payload holds absolute links
+        raw = "{}:{}:{}:{}".format(
+            get_request_profile_id(request),
+            version,
+            request.build_absolute_uri(),
+            request.accepted_media_type,
+        )
+        return quote_etag(hashlib.sha1(raw.encode()).hexdigest())
@@ -1,5 +1,11 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class DefaultPagination(PageNumberPagination):
@@ -19,6 +25,127 @@ class DefaultPagination(PageNumberPagination):
         )
 
 
+class TaskCursorPagination(BasePagination):
+    """
+    Keyset pagination on (created_date, id).
+    No COUNT(*) and no OFFSET: every page is an index range scan that
+    starts right after the last row of the previous page, so page 10,000
+    costs the same as page 1. Cursors are opaque and stay valid while
+    tasks are inserted or deleted.
+    """
+
+    page_size = 10
+    cursor_query_param = "cursor"
+    ordering_query_param = "ordering"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        return self.set_page(list(queryset))
+
+    def get_page_queryset(self, queryset, request):
+        # the sliced, unevaluated page; async views iterate it themselves
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        # newest first unless the client asks for ?ordering=created_date
+        ordering = request.query_params.get(self.ordering_query_param)
+        self.descending = ordering != "created_date"
+        self.cursor = cursor = self.decode_cursor(request)
+        self.reverse = cursor is not None and cursor[2]
+
+        # walking backwards (previous link) flips the keyset order
+        descending = self.descending != self.reverse
+        if descending:
+            queryset = queryset.order_by("-created_date", "-id")
+        else:
+            queryset = queryset.order_by("created_date", "id")
+
+        if cursor is not None:
+            created_date, pk = cursor[0], cursor[1]
+            # (created_date, id) < (x, y) written so the leading column
+            # stays a plain range condition on the index
+            if descending:
+                queryset = queryset.filter(
+                    created_date__lte=created_date
+                ).filter(Q(created_date__lt=created_date) | Q(id__lt=pk))
+            else:
+                queryset = queryset.filter(
+                    created_date__gte=created_date
+                ).filter(Q(created_date__gt=created_date) | Q(id__gt=pk))
+
+        # fetch one extra row to know if there is another page
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "links": {
+                    "next": self.get_next_link(),
+                    "previous": self.get_previous_link(),
+                },
+                "results": data,
+            }
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, task, reverse):
+        return replace_query_param(
+            self.base_url,
+            self.cursor_query_param,
+            self.make_cursor(task, reverse),
+        )
+
+    @staticmethod
+    def make_cursor(task, reverse=False):
+        raw = "{}|{}|{}".format(
+            task.created_date.isoformat(), task.pk, int(reverse)
+        )
+        return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode("ascii")).decode(
+                "ascii"
+            )
+            created_date, pk, reverse = raw.split("|")
+            return (
+                datetime.fromisoformat(created_date),
+                int(pk),
+                bool(int(reverse)),
+            )
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+
 # class StandardResultsSetPagination(PageNumberPagination):
 #     page_size = 100
 #     page_size_query_param = 'page_size'
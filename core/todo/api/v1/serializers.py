@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from ...models import Task
-from accounts.models import Profile
+from accounts.utils import get_request_profile
 
 
 class TaskSerializer(serializers.ModelSerializer):
@@ -47,8 +47,8 @@ class TaskSerializer(serializers.ModelSerializer):
         or do it another way:  """
 
     def create(self, validated_data):
-        validated_data["user"] = Profile.objects.get(
-            user__id=self.context.get("request").user.id
+        validated_data["user"] = get_request_profile(
+            self.context.get("request")
         )
         return super().create(validated_data)
 
@@ -65,3 +65,59 @@ class TaskSerializer(serializers.ModelSerializer):
             "created_date",
         )
         read_only_fields = ("user", "user_image")
+
+
+# --- bulk operations ---
+# biggest batch a single bulk request may carry
+BULK_MAX_ITEMS = 1000
+
+
+class TaskBulkItemSerializer(serializers.ModelSerializer):
+    # one task of a bulk-create batch
+    class Meta:
+        model = Task
+        fields = ("title", "complete")
+
+
+class TaskBulkUpdateItemSerializer(serializers.Serializer):
+    # one task of a bulk-update batch, only the given fields change
+    id = serializers.IntegerField()
+    title = serializers.CharField(max_length=255, required=False)
+    complete = serializers.BooleanField(required=False)
+
+
+class TaskBulkSerializer(serializers.Serializer):
+    # items are validated one by one so errors can be reported per item
+    tasks = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=BULK_MAX_ITEMS,
+    )
+
+
+class TaskBulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=BULK_MAX_ITEMS,
+    )
+    complete = serializers.BooleanField(required=False, default=True)
+
+
+class TaskMoveSerializer(serializers.Serializer):
+    # give one of them, after=null moves the task to the top. before=null
+    # would read as "to the bottom", so it is rejected instead of being
+    # taken as the top too
+    after = serializers.IntegerField(required=False, allow_null=True)
+    before = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if "after" in attrs and "before" in attrs:
+            raise serializers.ValidationError(
+                {"detail": "Give either after or before, not both."}
+            )
+        if "after" not in attrs and "before" not in attrs:
+            raise serializers.ValidationError(
+                {"detail": "Give after or before."}
+            )
+        return super().validate(attrs)
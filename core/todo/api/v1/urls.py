@@ -1,6 +1,6 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path
-from . import views
+from . import views, async_views
 
 app_name = "api-v1"
 
@@ -9,6 +9,22 @@ router.register("task", views.TaskModelViewSet, basename="task")
 urlpatterns = router.urls
 urlpatterns += [
     path("weather/", views.WeatherView.as_view(), name="weather"),
+    # async variants, served by the ASGI deployment
+    path(
+        "async/task/",
+        async_views.AsyncTaskListView.as_view(),
+        name="async-task-list",
+    ),
+    path(
+        "async/task/<int:pk>/",
+        async_views.AsyncTaskDetailView.as_view(),
+        name="async-task-detail",
+    ),
+    path(
+        "async/weather/",
+        async_views.AsyncWeatherView.as_view(),
+        name="async-weather",
+    ),
 ]
 
 """
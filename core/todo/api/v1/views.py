@@ -1,9 +1,29 @@
 from rest_framework.response import Response
-from .serializers import TaskSerializer
-from ...models import Task
+from rest_framework import status
+from django.db import transaction
+from django.utils import timezone
+from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from rest_framework.exceptions import NotFound
+from .serializers import (
+    TaskSerializer,
+    TaskBulkItemSerializer,
+    TaskBulkUpdateItemSerializer,
+    TaskBulkSerializer,
+    TaskBulkIdsSerializer,
+    TaskMoveSerializer,
+)
+from ...models import Task, POSITION_GAP
+from ...cache import bump_tasks_version, bump_tasks_version_on_commit
+from ...exports import EXPORT_CONTENT_TYPES, astream_export, stream_export
+from ...importers import IMPORT_TYPES, TaskImporter, read_rows
 
 # or instead of ...models you can point models.py like this: todo.models
-from accounts.models import Profile
+from accounts.authentication import AuthenticationPolicyMixin
+from accounts.utils import get_request_profile, get_request_profile_id
 
 # class-based views for api
 from rest_framework import viewsets
@@ -14,22 +34,25 @@ from rest_framework import serializers
 
 # from .permissions import IsOwnerOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
-from .paginations import DefaultPagination
+from rest_framework.filters import OrderingFilter
+from .filters import TaskSearchFilter
+from .paginations import DefaultPagination, TaskCursorPagination
+from .mixins import ConditionalTaskMixin
+from ...weather import get_weather
 
-# caching
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from django.views.decorators.vary import vary_on_headers  # vary_on_cookie,
-import requests
-from decouple import config
+# progress of the running/last import of a profile, for polling clients
+IMPORT_PROGRESS_KEY = "todo:import:progress:{}"
 
 
-class TaskModelViewSet(viewsets.ModelViewSet):
+class TaskModelViewSet(
+    AuthenticationPolicyMixin, ConditionalTaskMixin, viewsets.ModelViewSet
+):
     permission_classes = [IsAuthenticated]
+    # JWTs authenticated without a user query, cached Basic credentials
+    authentication_policy = "tasks"
     serializer_class = TaskSerializer
     # filters
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, TaskSearchFilter, OrderingFilter]
     filterset_fields = [
         "complete",
     ]
@@ -39,6 +62,7 @@ class TaskModelViewSet(viewsets.ModelViewSet):
     ordering_fields = ["created_date"]
     # pagination
     pagination_class = DefaultPagination
+    cursor_pagination_class = TaskCursorPagination
 
     """ --- we used another method for user providing ---
     def perform_create(self, serializer):
@@ -49,14 +73,31 @@ class TaskModelViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         # define the queryset wanted
         if self.request.user.is_verified:
-            profile = Profile.objects.get(user=self.request.user.id)
-            queryset = Task.objects.filter(user=profile.id)
+            profile_id = get_request_profile_id(self.request)
+            # serializer reads task.user.user.email and task.user.image,
+            # join them in so a page costs the same whatever its size
+            queryset = Task.objects.filter(user=profile_id).select_related(
+                "user__user"
+            )
         else:
             raise serializers.ValidationError(
                 {"detail": "User is not verified."}
             )
         return queryset
 
+    @property
+    def paginator(self):
+        # opt-in keyset pagination: ?pagination=cursor (next/previous
+        # links keep the flag, so clients just follow them)
+        if not hasattr(self, "_paginator"):
+            params = getattr(self.request, "query_params", {})
+            cursor_param = self.cursor_pagination_class.cursor_query_param
+            if params.get("pagination") == "cursor" or cursor_param in params:
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     # extra actions
     @action(
         methods=[
@@ -67,29 +108,273 @@ class TaskModelViewSet(viewsets.ModelViewSet):
     def get_ok(self, request):
         return Response({"detail": "extra actions -OK-"})
 
+    # reorder: put the task right after/before another one of the list
+    @action(
+        methods=["POST"],
+        detail=True,
+        serializer_class=TaskMoveSerializer,
+    )
+    def move(self, request, pk=None):
+        task = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        neighbours = {}
+        for key in ("after", "before"):
+            neighbour_id = serializer.validated_data.get(key)
+            if neighbour_id is not None:
+                if neighbour_id == task.id:
+                    raise serializers.ValidationError(
+                        {key: "A task can not be moved next to itself."}
+                    )
+                neighbours[key] = get_object_or_404(
+                    self.get_queryset(), pk=neighbour_id
+                )
+        with transaction.atomic():
+            task.move(**neighbours)
+        return Response(
+            TaskSerializer(task, context=self.get_serializer_context()).data
+        )
 
-class WeatherView(APIView):
-    # With auth: cache requested url for each user for 20 minutes
-    @method_decorator(cache_page(60 * 20))
-    @method_decorator(
-        vary_on_headers(
-            "Authorization",
+    # --- bulk operations ---
+    # each one is a single transaction with set-based writes and returns
+    # a result per item, in request order
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="bulk-create",
+        serializer_class=TaskBulkSerializer,
+    )
+    def bulk_create(self, request):
+        items = self.get_bulk_data(request)["tasks"]
+        # also makes sure the user is verified
+        self.get_queryset()
+        profile = get_request_profile(request)
+        results, tasks = [], []
+        for index, item in enumerate(items):
+            serializer = TaskBulkItemSerializer(data=item)
+            if serializer.is_valid():
+                tasks.append(Task(user=profile, **serializer.validated_data))
+                results.append({"index": index, "status": "created"})
+            else:
+                results.append(
+                    {
+                        "index": index,
+                        "status": "invalid",
+                        "errors": serializer.errors,
+                    }
+                )
+        with transaction.atomic():
+            # one lookup of the list end for the whole batch
+            position = Task.objects.next_position(profile.id)
+            for offset, task in enumerate(tasks):
+                task.position = position + offset * POSITION_GAP
+            Task.objects.bulk_create(tasks)
+            bump_tasks_version(profile.id)
+        created = iter(tasks)
+        for result in results:
+            if result["status"] == "created":
+                result["id"] = next(created).id
+        return self.get_bulk_response(
+            results, "created", status.HTTP_201_CREATED
         )
+
+    @action(
+        methods=["PATCH"],
+        detail=False,
+        url_path="bulk-update",
+        serializer_class=TaskBulkSerializer,
     )
-    def get(self, request, format=None):
-        api_key = config(
-            "openweather_apikey", default="18f933ce846bc85b1007e70e217290fe"
+    def bulk_update(self, request):
+        items = self.get_bulk_data(request)["tasks"]
+        results, changes = [], []
+        for index, item in enumerate(items):
+            serializer = TaskBulkUpdateItemSerializer(data=item)
+            if serializer.is_valid():
+                changes.append((index, serializer.validated_data))
+                results.append({"index": index, "status": "updated"})
+            else:
+                results.append(
+                    {
+                        "index": index,
+                        "status": "invalid",
+                        "errors": serializer.errors,
+                    }
+                )
+        now = timezone.now()
+        with transaction.atomic():
+            owned = self.get_queryset().in_bulk(
+                [data["id"] for index, data in changes]
+            )
+            tasks, fields = [], {"updated_date"}
+            for index, data in changes:
+                pk = data.pop("id")
+                results[index]["id"] = pk
+                task = owned.get(pk)
+                if task is None:
+                    results[index]["status"] = "not_found"
+                    continue
+                for field, value in data.items():
+                    setattr(task, field, value)
+                    fields.add(field)
+                # bulk_update skips auto_now
+                task.updated_date = now
+                tasks.append(task)
+            Task.objects.bulk_update(tasks, sorted(fields))
+            bump_tasks_version(get_request_profile(request).id)
+        return self.get_bulk_response(results, "updated")
+
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="bulk-complete",
+        serializer_class=TaskBulkIdsSerializer,
+    )
+    def bulk_complete(self, request):
+        data = self.get_bulk_data(request)
+        with transaction.atomic():
+            queryset = self.get_queryset().filter(id__in=data["ids"])
+            owned = set(queryset.values_list("id", flat=True))
+            queryset.update(
+                complete=data["complete"], updated_date=timezone.now()
+            )
+            bump_tasks_version(get_request_profile(request).id)
+        results = [
+            {"id": pk, "status": "updated" if pk in owned else "not_found"}
+            for pk in data["ids"]
+        ]
+        return self.get_bulk_response(results, "updated")
+
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="bulk-delete",
+        serializer_class=TaskBulkIdsSerializer,
+    )
+    def bulk_delete(self, request):
+        data = self.get_bulk_data(request)
+        with transaction.atomic():
+            queryset = self.get_queryset().filter(id__in=data["ids"])
+            owned = set(queryset.values_list("id", flat=True))
+            # one set-based delete, one version bump after the commit
+            queryset.delete()
+            if owned:
+                bump_tasks_version_on_commit(get_request_profile_id(request))
+        results = [
+            {"id": pk, "status": "deleted" if pk in owned else "not_found"}
+            for pk in data["ids"]
+        ]
+        return self.get_bulk_response(results, "deleted")
+
+    # streamed export of the whole (filtered) list: ?type=ndjson|csv,
+    # "format" is taken by drf's renderer selection
+    @action(methods=["GET"], detail=False)
+    def export(self, request):
+        export_type = request.query_params.get("type", "ndjson")
+        if export_type not in EXPORT_CONTENT_TYPES:
+            raise serializers.ValidationError(
+                {"type": f"Choose one of {', '.join(EXPORT_CONTENT_TYPES)}."}
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        # under ASGI only an async iterator is sent as it is produced
+        if isinstance(request._request, ASGIRequest):
+            content = astream_export(queryset, export_type)
+        else:
+            content = stream_export(queryset, export_type)
+        response = StreamingHttpResponse(
+            content,
+            content_type=EXPORT_CONTENT_TYPES[export_type],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="tasks.{export_type}"'
+        )
+        response["Cache-Control"] = "no-store"
+        return response
+
+    # import ndjson/csv sent as the raw body (read as it arrives) or as a
+    # "file" upload; GET reports the progress of the running/last import
+    @action(
+        methods=["POST", "GET"],
+        detail=False,
+        url_path="import",
+        url_name="import",
+    )
+    def import_tasks(self, request):
+        # also makes sure the user is verified
+        self.get_queryset()
+        profile = get_request_profile(request)
+        progress_key = IMPORT_PROGRESS_KEY.format(profile.id)
+        if request.method == "GET":
+            progress = cache.get(progress_key)
+            if progress is None:
+                raise NotFound()
+            return Response(progress)
+
+        import_type = request.query_params.get("type")
+        if import_type is None:
+            is_csv = request.content_type.startswith("text/csv")
+            import_type = "csv" if is_csv else "ndjson"
+        if import_type not in IMPORT_TYPES:
+            raise serializers.ValidationError(
+                {"type": f"Choose one of {', '.join(IMPORT_TYPES)}."}
+            )
+        if request.content_type.startswith("multipart/form-data"):
+            stream = request.FILES.get("file")
+        else:
+            stream = request.stream
+        if stream is None:
+            raise serializers.ValidationError(
+                {"file": "Send the tasks as the body or as a file upload."}
+            )
+
+        def progress(stats, finished=False):
+            data = {key: stats[key] for key in stats if key != "errors"}
+            data["finished"] = finished
+            cache.set(progress_key, data, 60 * 60)
+
+        importer = TaskImporter(
+            profile, use_copy=settings.TASK_IMPORT_USE_COPY
         )
-        response = requests.get(
-            f"https://api.openweathermap.org/data/2.5/weather?lat=37.474806&lon=57.315210&appid={api_key}"
+        stats = importer.run(read_rows(stream, import_type), progress)
+        progress(stats, finished=True)
+        return Response(
+            stats,
+            status=(
+                status.HTTP_207_MULTI_STATUS
+                if stats["failed"]
+                else status.HTTP_201_CREATED
+            ),
         )
-        data = response.json()
-        # convert from kelvin to celsius with 0.01 rounding
-        data["main"]["temp"] = round(data["main"]["temp"] - 273.15, 2)
-        data["main"]["feels_like"] = round(
-            data["main"]["feels_like"] - 273.15, 2
+
+    def get_bulk_data(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def get_bulk_response(self, results, done, done_status=status.HTTP_200_OK):
+        # 207 when only part of the batch went through
+        failed = sum(1 for result in results if result["status"] != done)
+        return Response(
+            {
+                done: len(results) - failed,
+                "failed": failed,
+                "results": results,
+            },
+            status=status.HTTP_207_MULTI_STATUS if failed else done_status,
         )
-        data["main"]["temp_min"] = round(data["main"]["temp_min"] - 273.15, 2)
-        data["main"]["temp_max"] = round(data["main"]["temp_max"] - 273.15, 2)
+
+
+class WeatherView(APIView):
+    # shared entries per location bucket, refreshed in the background
+    def get(self, request, format=None):
+        latitude = longitude = None
+        if request.user.is_authenticated:
+            profile = get_request_profile(request)
+            latitude, longitude = profile.latitude, profile.longitude
+        data = get_weather(latitude, longitude)
+        if data is None:
+            return Response(
+                {"detail": "weather is not available right now"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
         content = {"weather": data}
         return Response(content)
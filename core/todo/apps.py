@@ -4,6 +4,11 @@ from django.apps import AppConfig
 class TodoConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "todo"
+
+    def ready(self):
+        # keeps the per-user task version (ETags, response cache) current
+        from . import signals  # noqa: F401
+
     # def ready(self):
     #     from .tasks import delete_completed_tasks
     #     delete_completed_tasks.delay()
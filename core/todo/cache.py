@@ -0,0 +1,65 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+# per-user change version of the task list, a counter incremented on every
+# task write. Reading it is one cache hit, so ETags and cached responses
+# can be checked without touching the database.
+TASKS_VERSION_KEY = "todo:tasks:version:{}"
+
+
+def get_tasks_version(profile_id):
+    key = TASKS_VERSION_KEY.format(profile_id)
+    version = cache.get(key)
+    if version is None:
+        _start_version(key)
+        version = cache.get(key)
+    return version
+
+
+def bump_tasks_version(*profile_ids):
+    keys = _version_keys(profile_ids)
+    if not keys:
+        return
+    _set_versions(keys)
+    # a reader inside the commit window could still see the old rows under
+    # the new version, so bump once more when the transaction commits
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _set_versions(keys))
+
+
+def bump_tasks_version_on_commit(*profile_ids):
+    """
+    Bump once per profile after the surrounding transaction commits (right
+    away outside of one). The delete paths use it: a post_delete receiver
+    on Task would turn every queryset delete into a row-by-row one.
+    """
+    keys = _version_keys(profile_ids)
+    if keys:
+        transaction.on_commit(lambda: _set_versions(keys))
+
+
+def _version_keys(profile_ids):
+    return [
+        TASKS_VERSION_KEY.format(profile_id)
+        for profile_id in set(profile_ids)
+        if profile_id is not None
+    ]
+
+
+def _set_versions(keys):
+    # an atomic increment: every write gives a new version, whatever the
+    # clock of the process that bumps it
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not _start_version(key):
+                cache.incr(key)
+
+
+def _start_version(key):
+    # first use or evicted: counting restarts from the clock, above any
+    # version handed out before, so clients miss once and never match
+    return cache.add(key, time.time_ns(), None)
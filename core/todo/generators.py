@@ -0,0 +1,60 @@
+"""
+Fake data for the insert_data command. Kept free of Django imports so
+the generation can run in worker processes that never touch the
+database.
+"""
+
+import random
+
+from faker import Faker
+
+# must match todo.models.POSITION_GAP
+POSITION_GAP = 1024
+TITLE_MAX_LENGTH = 255
+
+# one Faker per worker process, reseeded for every job
+fake = Faker()
+
+
+def task_counts(total, users, skew=0.0):
+    """
+    Split `total` tasks over `users` with a Zipf-like distribution: user
+    n gets a share proportional to 1 / n ** skew. skew 0 is uniform, 1
+    gives the first user of 1,000 about 13% of all tasks.
+    """
+    if users < 1:
+        return []
+    weights = [1 / (rank**skew) for rank in range(1, users + 1)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    # hand the rounding leftovers to the biggest lists
+    for index in range(total - sum(counts)):
+        counts[index % users] += 1
+    return counts
+
+
+def task_jobs(profile_ids, counts, batch_size, seed=0):
+    # (profile_id, first index, count, seed) slices of at most batch_size
+    for profile_id, count in zip(profile_ids, counts):
+        for start in range(0, count, batch_size):
+            size = min(batch_size, count - start)
+            yield profile_id, start, size, seed + profile_id * 1_000_003 + start
+
+
+def generate_tasks(job, completed=0.5):
+    """
+    (user_id, title, complete, position) rows of one job, deterministic
+    for a given job whatever process runs it.
+    """
+    profile_id, start, count, seed = job
+    fake.seed_instance(seed)
+    rng = random.Random(seed)
+    return [
+        (
+            profile_id,
+            fake.sentence(nb_words=6)[:TITLE_MAX_LENGTH],
+            rng.random() < completed,
+            (start + offset + 1) * POSITION_GAP,
+        )
+        for offset in range(count)
+    ]
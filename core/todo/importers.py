@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .api.v1.serializers import TaskBulkItemSerializer
+from .cache import bump_tasks_version_on_commit
+from .models import Task, POSITION_GAP
+
+IMPORT_TYPES = ("ndjson", "csv")
+COPY_COLUMNS = (
+    "user_id",
+    "title",
+    "complete",
+    "position",
+    "created_date",
+    "updated_date",
+)
+
+
+def read_rows(stream, import_type):
+    """
+    Rows of an upload as dicts, read line by line from anything that
+    iterates over lines of bytes or text (request, uploaded file, stdin).
+    A line that can't be parsed is yielded as an exception, so it ends up
+    in the row errors instead of aborting the import.
+    """
+    lines = (
+        line.decode("utf-8-sig") if isinstance(line, bytes) else line
+        for line in stream
+    )
+    if import_type == "csv":
+        for row in csv.DictReader(lines):
+            # empty cells mean "not given", like a missing ndjson key
+            yield {
+                key: value
+                for key, value in row.items()
+                if key is not None and value != ""
+            }
+        return
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = ValidationError({"non_field_errors": ["Invalid JSON."]})
+        if not isinstance(row, (dict, Exception)):
+            row = ValidationError({"non_field_errors": ["Expected object."]})
+        yield row
+
+
+def copy_tasks(rows):
+    """
+    Write (user_id, title, complete, position) rows with PostgreSQL COPY,
+    which skips the per-statement parsing and planning of the inserts.
+    """
+    now = timezone.now().isoformat()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row + (now, now))
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+                Task._meta.db_table, ", ".join(COPY_COLUMNS)
+            ),
+            buffer,
+        )
+
+
+class TaskImporter:
+    """
+    Validates and writes the rows of an import batch by batch: memory
+    holds one batch and at most IMPORT_MAX_ERRORS row errors, whatever
+    the size of the upload. Each batch is its own transaction, written
+    with bulk_create or, on PostgreSQL with use_copy, with COPY.
+    Tasks are appended to the end of the profile's list in file order.
+    """
+
+    def __init__(self, profile, batch_size=None, use_copy=False):
+        self.profile = profile
+        self.batch_size = batch_size or settings.TASK_IMPORT_BATCH_SIZE
+        self.use_copy = use_copy and connection.vendor == "postgresql"
+        # one serializer validates every row
+        self.serializer = TaskBulkItemSerializer()
+        self.stats = {
+            "rows": 0,
+            "imported": 0,
+            "failed": 0,
+            "batches": 0,
+            "errors": [],
+        }
+
+    def run(self, rows, progress=None):
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.import_batch(batch)
+            if progress is not None:
+                progress(self.stats)
+        return self.stats
+
+    def import_batch(self, batch):
+        tasks = []
+        for row in batch:
+            self.stats["rows"] += 1
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                data = self.serializer.run_validation(row)
+            except ValidationError as exc:
+                self.add_error(exc.detail)
+                continue
+            tasks.append(Task(user=self.profile, **data))
+        with transaction.atomic():
+            # the list end of this transaction: tasks created while an
+            # import runs are not given the same positions
+            position = Task.objects.next_position(self.profile.id)
+            for offset, task in enumerate(tasks):
+                task.position = position + offset * POSITION_GAP
+            if self.use_copy:
+                copy_tasks(
+                    (task.user_id, task.title, task.complete, task.position)
+                    for task in tasks
+                )
+            else:
+                Task.objects.bulk_create(tasks)
+            # each committed batch shows up in the list right away, even
+            # when a later one fails
+            if tasks:
+                bump_tasks_version_on_commit(self.profile.id)
+        self.stats["imported"] += len(tasks)
+        self.stats["batches"] += 1
+
+    def add_error(self, detail):
+        self.stats["failed"] += 1
+        if len(self.stats["errors"]) < settings.TASK_IMPORT_MAX_ERRORS:
+            self.stats["errors"].append(
+                {"row": self.stats["rows"], "errors": detail}
+            )
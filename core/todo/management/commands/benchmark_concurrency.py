@@ -0,0 +1,149 @@
+import asyncio
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand
+
+# the same endpoints on both deployments: the sync DRF views under WSGI,
+# their async variants under ASGI
+ENDPOINTS = {
+    "wsgi": {
+        "list": "/api/v1/task/?pagination=cursor",
+        "detail": "/api/v1/task/{id}/",
+        "create": "/api/v1/task/",
+        "weather": "/api/v1/weather/",
+    },
+    "asgi": {
+        "list": "/api/v1/async/task/",
+        "detail": "/api/v1/async/task/{id}/",
+        "create": "/api/v1/async/task/",
+        "weather": "/api/v1/async/weather/",
+    },
+}
+JWT_URL = "/accounts/api/v1/jwt/create/"
+
+
+class Command(BaseCommand):
+    help = (
+        "compare concurrent-request throughput of the WSGI deployment "
+        "(gunicorn core.wsgi) and the ASGI one (uvicorn workers, async views)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--wsgi",
+            default="http://localhost:8001",
+            help="base url of the WSGI deployment, empty to skip it",
+        )
+        parser.add_argument(
+            "--asgi",
+            default="http://localhost:8000",
+            help="base url of the ASGI deployment, empty to skip it",
+        )
+        parser.add_argument("--email", default="admin@admin.com")
+        parser.add_argument("--password", default="1234")
+        parser.add_argument(
+            "--endpoints",
+            nargs="+",
+            choices=["list", "detail", "create", "weather"],
+            default=["list", "detail", "weather"],
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            nargs="+",
+            default=[1, 10, 50, 100],
+            help="in-flight requests to keep open",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="requests per endpoint and concurrency level",
+        )
+
+    def handle(self, *args, **options):
+        asyncio.run(self.benchmark(options))
+
+    async def benchmark(self, options):
+        self.stdout.write(
+            f"{'deployment':<10} {'endpoint':<8} {'conc':>5} {'req/s':>9} "
+            f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'errors':>7}"
+        )
+        for deployment in ("wsgi", "asgi"):
+            base_url = options[deployment]
+            if not base_url:
+                continue
+            limits = httpx.Limits(max_connections=max(options["concurrency"]))
+            async with httpx.AsyncClient(
+                base_url=base_url, limits=limits, timeout=30
+            ) as client:
+                await self.login(client, options)
+                paths = await self.get_paths(client, deployment)
+                for endpoint in options["endpoints"]:
+                    for concurrency in options["concurrency"]:
+                        stats = await self.run(
+                            client,
+                            endpoint,
+                            paths[endpoint],
+                            concurrency,
+                            options["requests"],
+                        )
+                        self.stdout.write(
+                            f"{deployment:<10} {endpoint:<8} "
+                            f"{concurrency:>5} {stats['rps']:>9.1f} "
+                            f"{stats['p50']:>9.1f} {stats['p95']:>9.1f} "
+                            f"{stats['errors']:>7}"
+                        )
+
+    async def login(self, client, options):
+        response = await client.post(
+            JWT_URL,
+            data={"email": options["email"], "password": options["password"]},
+        )
+        response.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {response.json()['access']}"
+
+    async def get_paths(self, client, deployment):
+        paths = dict(ENDPOINTS[deployment])
+        response = await client.get(paths["list"])
+        response.raise_for_status()
+        results = response.json()["results"]
+        if results:
+            paths["detail"] = paths["detail"].format(id=results[0]["id"])
+        return paths
+
+    async def run(self, client, endpoint, path, concurrency, total):
+        latencies = []
+        errors = 0
+        remaining = total
+
+        async def worker():
+            nonlocal errors, remaining
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                try:
+                    if endpoint == "create":
+                        response = await client.post(
+                            path, json={"title": "benchmark"}
+                        )
+                    else:
+                        response = await client.get(path)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors += failed
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            "rps": total / elapsed,
+            "p50": statistics.median(latencies),
+            "p95": latencies[int(len(latencies) * 0.95) - 1],
+            "errors": errors,
+        }
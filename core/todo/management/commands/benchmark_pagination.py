@@ -0,0 +1,102 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from accounts.models import Profile
+from ...api.v1.paginations import DefaultPagination, TaskCursorPagination
+from ...models import Task
+
+
+class Command(BaseCommand):
+    help = (
+        "compare page-number and cursor pagination latency at different "
+        "depths of the task list (seed a big database with insert_data first)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pages",
+            type=int,
+            nargs="+",
+            default=[1, 100, 1000, 10000],
+            help="page numbers to measure",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="runs per measurement, the best one is reported",
+        )
+        parser.add_argument(
+            "--profile",
+            type=int,
+            default=None,
+            help="profile id to page through (default: the biggest list)",
+        )
+
+    def handle(self, *args, **options):
+        profile = self.get_profile(options["profile"])
+        queryset = Task.objects.filter(user=profile)
+        total = queryset.count()
+        page_size = DefaultPagination.page_size
+        self.stdout.write(f"profile {profile.id}: {total} tasks")
+        self.stdout.write(
+            f"{'page':>8} {'page-number (ms)':>18} {'cursor (ms)':>14}"
+        )
+        factory = APIRequestFactory()
+
+        for page in options["pages"]:
+            if (page - 1) * page_size >= total:
+                self.stdout.write(f"{page:>8} {'-':>18} {'-':>14}")
+                continue
+
+            request = Request(
+                factory.get("/todo/api/v1/task/", {"page": page})
+            )
+            number_ms = self.measure(
+                DefaultPagination, queryset, request, options["repeat"]
+            )
+
+            params = {"pagination": "cursor"}
+            if page > 1:
+                # the row right before the page start is what a client
+                # would have received as the last row of the previous page
+                last = queryset.order_by("-created_date", "-id")[
+                    (page - 1) * page_size - 1
+                ]
+                params["cursor"] = TaskCursorPagination.make_cursor(last)
+            request = Request(factory.get("/todo/api/v1/task/", params))
+            cursor_ms = self.measure(
+                TaskCursorPagination, queryset, request, options["repeat"]
+            )
+
+            self.stdout.write(
+                f"{page:>8} {number_ms:>18.2f} {cursor_ms:>14.2f}"
+            )
+
+    def get_profile(self, profile_id):
+        if profile_id is not None:
+            return Profile.objects.get(id=profile_id)
+        return (
+            Profile.objects.annotate(tasks=Count("task"))
+            .order_by("-tasks")
+            .first()
+        )
+
+    def measure(self, pagination_class, queryset, request, repeat):
+        best = None
+        for _ in range(repeat):
+            paginator = pagination_class()
+            start = time.perf_counter()
+            page = paginator.paginate_queryset(
+                queryset.order_by("-created_date"), request
+            )
+            list(page)
+            if pagination_class is DefaultPagination:
+                paginator.get_paginated_response([])
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,62 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "write the user pool of the locust workload: email, password and "
+        "pre-issued jwt tokens of active users (seed them with insert_data)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default="locust/users.csv",
+            help="csv file to write, - for stdout",
+        )
+        parser.add_argument("--count", type=int, default=100)
+        parser.add_argument(
+            "--password",
+            default="fake@1234",
+            help="the password insert_data gave the users",
+        )
+        parser.add_argument(
+            "--no-tokens",
+            action="store_true",
+            help="leave the tokens out, every simulated user logs in",
+        )
+
+    def handle(self, *args, **options):
+        users = list(
+            User.objects.filter(is_active=True, is_verified=True)
+            .exclude(is_superuser=True)
+            .order_by("id")[: options["count"]]
+        )
+        if not users:
+            raise CommandError("no active users, run insert_data first")
+
+        if options["output"] == "-":
+            self.write(sys.stdout, users, options)
+        else:
+            with open(options["output"], "w", newline="") as stream:
+                self.write(stream, users, options)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{len(users)} users written to {options['output']}"
+                )
+            )
+
+    def write(self, stream, users, options):
+        writer = csv.writer(stream)
+        writer.writerow(["email", "password", "access", "refresh"])
+        for user in users:
+            access = refresh = ""
+            if not options["no_tokens"]:
+                token = RefreshToken.for_user(user)
+                access, refresh = str(token.access_token), str(token)
+            writer.writerow([user.email, options["password"], access, refresh])
@@ -0,0 +1,82 @@
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Profile
+from ...importers import IMPORT_TYPES, TaskImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "import tasks of a user from a ndjson or csv file (- for stdin), "
+        "appended to the end of their list"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="file to import, - for stdin")
+        parser.add_argument(
+            "--email", required=True, help="owner of the imported tasks"
+        )
+        parser.add_argument(
+            "--type",
+            choices=IMPORT_TYPES,
+            default=None,
+            help="file type (default: from the file extension, else ndjson)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="rows per transaction (default: TASK_IMPORT_BATCH_SIZE)",
+        )
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="write with bulk_create even on PostgreSQL",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            profile = Profile.objects.get(user__email=options["email"])
+        except Profile.DoesNotExist:
+            raise CommandError(f"no user with email {options['email']}")
+        import_type = options["type"]
+        if import_type is None:
+            is_csv = options["path"].endswith(".csv")
+            import_type = "csv" if is_csv else "ndjson"
+
+        importer = TaskImporter(
+            profile,
+            batch_size=options["batch_size"],
+            use_copy=settings.TASK_IMPORT_USE_COPY and not options["no_copy"],
+        )
+        started = time.monotonic()
+
+        def progress(stats):
+            elapsed = max(time.monotonic() - started, 0.001)
+            self.stdout.write(
+                f"{stats['rows']} rows, {stats['imported']} imported, "
+                f"{stats['failed']} failed "
+                f"({stats['rows'] / elapsed:.0f} rows/s)"
+            )
+
+        if options["path"] == "-":
+            stats = importer.run(read_rows(sys.stdin, import_type), progress)
+        else:
+            with open(options["path"], "rb") as stream:
+                stats = importer.run(read_rows(stream, import_type), progress)
+
+        for error in stats["errors"]:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        if len(stats["errors"]) < stats["failed"]:
+            self.stderr.write(
+                f"... {stats['failed'] - len(stats['errors'])} more errors"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"imported {stats['imported']} of {stats['rows']} rows "
+                f"in {time.monotonic() - started:.1f}s"
+            )
+        )
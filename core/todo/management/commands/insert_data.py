@@ -1,34 +1,171 @@
-from django.core.management.base import BaseCommand
+import multiprocessing
+import os
+import time
+import uuid
+from functools import partial
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 from faker import Faker
 
 from accounts.models import User, Profile
+from ...generators import generate_tasks, task_counts, task_jobs
+from ...importers import copy_tasks
 from ...models import Task
 
 
 class Command(BaseCommand):
-    help = "inserting dummy data into database"
+    help = (
+        "inserting dummy data into database: users with a (skewed) number "
+        "of tasks each, generated in parallel and written in bulk"
+    )
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fake = Faker()
+        self.reported = 0
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument(
+            "--tasks",
+            type=int,
+            default=100,
+            help="total number of tasks over all the new users",
+        )
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=0.0,
+            help="0 spreads tasks evenly, 1+ gives a few users most of them",
+        )
+        parser.add_argument(
+            "--completed",
+            type=float,
+            default=0.5,
+            help="share of completed tasks",
+        )
+        parser.add_argument(
+            "--password",
+            default="fake@1234",
+            help="password of every new user, hashed only once",
+        )
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="processes generating fake titles, 1 to stay in-process",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="write with bulk_create even on PostgreSQL",
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 1:
+            raise CommandError("--users must be at least 1")
+        if options["tasks"] < 0:
+            raise CommandError("--tasks must not be negative")
+        started = time.monotonic()
+        self.fake.seed_instance(options["seed"])
+        profiles = self.create_users(
+            options["users"], options["password"], options["batch_size"]
+        )
+        self.stdout.write(
+            f"{len(profiles)} users in {time.monotonic() - started:.1f}s"
+        )
+
+        counts = task_counts(options["tasks"], len(profiles), options["skew"])
+        jobs = task_jobs(
+            [profile.id for profile in profiles],
+            counts,
+            options["batch_size"],
+            options["seed"],
+        )
+        generate = partial(generate_tasks, completed=options["completed"])
+        use_copy = connection.vendor == "postgresql" and not options["no_copy"]
+
+        written = 0
+        if options["workers"] > 1:
+            # workers only run Faker, this process does all the writes
+            with multiprocessing.Pool(options["workers"]) as pool:
+                for rows in pool.imap_unordered(generate, jobs):
+                    written += self.write(rows, use_copy)
+                    self.progress(written, options["tasks"], started)
+        else:
+            for rows in map(generate, jobs):
+                written += self.write(rows, use_copy)
+                self.progress(written, options["tasks"], started)
 
-    def handle(self, *args, **kwargs):
-        # creating dummy data
-        for _ in range(10):
-            user = User.objects.create_user(
-                email=self.fake.email(),
-                password="fake@1234",
-                is_active=True,
-                is_verified=True,
+        if connection.vendor == "postgresql":
+            # fresh planner statistics for the benchmarks that follow
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {Task._meta.db_table}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{written} tasks for {len(profiles)} users in "
+                f"{time.monotonic() - started:.1f}s "
+                f"(biggest list: {max(counts, default=0)} tasks)"
             )
-            profile = Profile.objects.get(user=user)
-            profile.first_name = self.fake.first_name()
-            profile.last_name = self.fake.last_name()
-            profile.description = self.fake.paragraph(nb_sentences=5)
-            profile.save()
-            for _ in range(10):
-                Task.objects.create(
-                    user=profile,
-                    title=self.fake.paragraph(nb_sentences=1),
-                    complete=self.fake.boolean(),
+        )
+
+    def create_users(self, count, password, batch_size):
+        # one PBKDF2 run for everybody instead of one per user
+        password = make_password(password)
+        run = uuid.uuid4().hex[:8]
+        users = User.objects.bulk_create(
+            [
+                User(
+                    email=f"{self.fake.user_name()}.{run}{index}@example.com",
+                    password=password,
+                    is_active=True,
+                    is_verified=True,
+                )
+                for index in range(count)
+            ],
+            batch_size=batch_size,
+        )
+        # bulk_create skips the post_save signal that creates profiles
+        return Profile.objects.bulk_create(
+            [
+                Profile(
+                    user=user,
+                    first_name=self.fake.first_name(),
+                    last_name=self.fake.last_name(),
+                    description=self.fake.paragraph(nb_sentences=5),
                 )
+                for user in users
+            ],
+            batch_size=batch_size,
+        )
+
+    def write(self, rows, use_copy):
+        with transaction.atomic():
+            if use_copy:
+                copy_tasks(rows)
+            else:
+                Task.objects.bulk_create(
+                    Task(
+                        user_id=user_id,
+                        title=title,
+                        complete=complete,
+                        position=position,
+                    )
+                    for user_id, title, complete, position in rows
+                )
+        return len(rows)
+
+    def progress(self, written, total, started):
+        # about 20 lines per run, however small the jobs are
+        step = max(total // 20, 1)
+        if written // step == self.reported and written < total:
+            return
+        self.reported = written // step
+        elapsed = max(time.monotonic() - started, 0.001)
+        self.stdout.write(
+            f"{written}/{total} tasks ({written / elapsed:.0f} tasks/s)"
+        )
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.4 on 2026-10-18 19:18
+
+from django.db import migrations, models
+from django.db.models import F
+
+# keep in sync with todo.models.POSITION_GAP
+POSITION_GAP = 1024
+
+
+def order_to_position(apps, schema_editor):
+    # _order is already increasing per user, one UPDATE spreads it out
+    Task = apps.get_model("todo", "Task")
+    Task.objects.update(position=(F("_order") + 1) * POSITION_GAP)
+
+
+def position_to_order(apps, schema_editor):
+    Task = apps.get_model("todo", "Task")
+    tasks = Task.objects.order_by("user", "position", "id").only(
+        "id", "user", "_order"
+    )
+    changed, user, order = [], None, 0
+    for task in tasks.iterator(chunk_size=2000):
+        if task.user_id != user:
+            user, order = task.user_id, 0
+        task._order = order
+        order += 1
+        changed.append(task)
+    Task.objects.bulk_update(changed, ["_order"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("todo", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="task",
+            options={"ordering": ("position", "id")},
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="position",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(order_to_position, position_to_order),
+        migrations.AlterOrderWithRespectTo(
+            name="task",
+            order_with_respect_to=None,
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["user", "position"], name="todo_task_position_idx"
+            ),
+        ),
+    ]
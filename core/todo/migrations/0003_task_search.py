@@ -0,0 +1,46 @@
+from django.db import migrations
+
+# PostgreSQL only: other databases keep using the icontains fallback of
+# TaskQuerySet.search()
+SEARCH_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # word search: a generated tsvector column with a GIN index
+    """
+    ALTER TABLE todo_task ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector('english'::regconfig, coalesce(title, ''))
+    ) STORED
+    """,
+    "CREATE INDEX todo_task_search_idx ON todo_task USING GIN (search_vector)",
+    # substring (ILIKE) and fuzzy (%>) matching on the title
+    "CREATE INDEX todo_task_title_trgm_idx ON todo_task "
+    "USING GIN (title gin_trgm_ops)",
+]
+
+REVERSE_SQL = [
+    "DROP INDEX IF EXISTS todo_task_title_trgm_idx",
+    "DROP INDEX IF EXISTS todo_task_search_idx",
+    "ALTER TABLE todo_task DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def add_search_columns(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for sql in SEARCH_SQL:
+            schema_editor.execute(sql)
+
+
+def remove_search_columns(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for sql in REVERSE_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("todo", "0002_task_position"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_columns, remove_search_columns),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.4 on 2026-10-18 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("todo", "0003_task_search"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["user", "complete", "position"],
+                name="todo_task_complete_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["user", "created_date", "id"],
+                name="todo_task_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                condition=models.Q(("complete", True)),
+                fields=["id"],
+                name="todo_task_completed_id_idx",
+            ),
+        ),
+    ]
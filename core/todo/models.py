@@ -1,8 +1,21 @@
-from django.db import models
+import re
+
+from django.db import models, connection
+from django.db.models import F, Max, Min, Q, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lag
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVectorField,
+    TrigramWordSimilarity,
+)
 
 # from django.contrib.auth.models import User
 from django.urls import reverse
 
+from .cache import bump_tasks_version, bump_tasks_version_on_commit
+
 
 # from accounts.models import Profile
 # from django.contrib.auth import get_user_model
@@ -13,6 +26,83 @@ from django.urls import reverse
 # Create your models here.
 
 
+# distance between two neighbour tasks of a fresh list. A move lands in
+# the middle of a gap, so ~10 moves into the same spot fit before the
+# list has to be renumbered.
+POSITION_GAP = 1024
+
+
+# text search configuration of the generated todo_task.search_vector
+SEARCH_CONFIG = "english"
+
+
+class TaskQuerySet(models.QuerySet):
+    def search(self, term):
+        """
+        Tasks whose title matches `term`, best matches first.
+        On PostgreSQL words are matched against the generated, GIN indexed
+        search_vector column and substrings/typos against the pg_trgm index
+        on title. Other databases fall back to a plain icontains.
+        """
+        if connection.vendor != "postgresql":
+            return self.filter(title__icontains=term)
+        query = SearchQuery(
+            term, config=SEARCH_CONFIG, search_type="websearch"
+        )
+        # the column is maintained by PostgreSQL, not declared on the model
+        vector = RawSQL(
+            '"todo_task"."search_vector"', [], output_field=SearchVectorField()
+        )
+        rank = SearchRank(vector, query) + TrigramWordSimilarity(term, "title")
+        # ~* (not UPPER() LIKE) so the pg_trgm index is usable
+        similar = Q(title__iregex=re.escape(term))
+        similar |= Q(title__trigram_word_similar=term)
+        return (
+            self.alias(search_vector=vector)
+            .annotate(rank=rank)
+            .filter(Q(search_vector=query) | similar)
+            .order_by("-rank", "id")
+        )
+
+
+class TaskManager(models.Manager.from_queryset(TaskQuerySet)):
+    def next_position(self, profile_id):
+        # end of the user's list, an index-only lookup on (user, position)
+        last = self.filter(user=profile_id).aggregate(Max("position"))
+        return (last["position__max"] or 0) + POSITION_GAP
+
+    def rebalance(self, profile_id):
+        """
+        Renumber a user's list with POSITION_GAP between neighbours.
+        Only needed when moves have used up a gap.
+        """
+        tasks = list(
+            self.filter(user=profile_id)
+            .order_by("position", "id")
+            .only("id", "position")
+        )
+        for index, task in enumerate(tasks, start=1):
+            task.position = index * POSITION_GAP
+        self.bulk_update(tasks, ["position"], batch_size=1000)
+        bump_tasks_version(profile_id)
+        return len(tasks)
+
+    def crowded_profiles(self, min_gap=2):
+        # users with two neighbour tasks closer than min_gap
+        tasks = self.annotate(
+            previous=Window(
+                Lag("position"),
+                partition_by=[F("user")],
+                order_by=F("position").asc(),
+            )
+        )
+        return set(
+            tasks.filter(position__lt=F("previous") + min_gap).values_list(
+                "user", flat=True
+            )
+        )
+
+
 # user comes from accounts.Profile
 class Task(models.Model):
     user = models.ForeignKey(
@@ -20,15 +110,90 @@ class Task(models.Model):
     )
     title = models.CharField(max_length=255)
     complete = models.BooleanField(default=False)
+    # gap-based ordering key inside the user's list
+    position = models.BigIntegerField(default=0)
 
     created_date = models.DateTimeField(auto_now_add=True)
     updated_date = models.DateTimeField(auto_now=True)
 
+    objects = TaskManager()
+
     def __str__(self):
         return self.title
 
     def get_absolute_api_url(self):
         return reverse("todo:api-v1:task-detail", kwargs={"pk": self.pk})
 
+    def save(self, *args, **kwargs):
+        # new tasks go to the end of the list
+        if self._state.adding and not self.position:
+            self.position = Task.objects.next_position(self.user_id)
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        # no post_delete receiver, see todo.signals
+        result = super().delete(*args, **kwargs)
+        bump_tasks_version_on_commit(self.user_id)
+        return result
+
+    def move(self, after=None, before=None):
+        """
+        Put the task right after `after` or right before `before`
+        (to the top of the list when both are None). Only this row is
+        written, unless the gap is used up and the list is renumbered.
+        """
+        siblings = Task.objects.filter(user=self.user_id).exclude(pk=self.pk)
+        if before is not None:
+            upper = before.position
+            lower = siblings.filter(position__lt=upper).aggregate(
+                Max("position")
+            )["position__max"]
+            if lower is None:
+                lower = upper - 2 * POSITION_GAP
+        else:
+            if after is not None:
+                lower = after.position
+                siblings = siblings.filter(position__gt=lower)
+            upper = siblings.aggregate(Min("position"))["position__min"]
+            if after is None:
+                upper = POSITION_GAP if upper is None else upper
+                lower = upper - 2 * POSITION_GAP
+            elif upper is None:
+                upper = lower + 2 * POSITION_GAP
+
+        if upper - lower < 2:
+            Task.objects.rebalance(self.user_id)
+            if after is not None:
+                after.refresh_from_db(fields=["position"])
+            if before is not None:
+                before.refresh_from_db(fields=["position"])
+            return self.move(after=after, before=before)
+
+        self.position = (lower + upper) // 2
+        Task.objects.filter(pk=self.pk).update(position=self.position)
+        bump_tasks_version(self.user_id)
+
     class Meta:
-        order_with_respect_to = "user"
+        ordering = ("position", "id")
+        indexes = [
+            # default list order
+            models.Index(
+                fields=["user", "position"], name="todo_task_position_idx"
+            ),
+            # ?complete= filter in list order
+            models.Index(
+                fields=["user", "complete", "position"],
+                name="todo_task_complete_idx",
+            ),
+            # ?ordering=created_date and cursor pagination
+            models.Index(
+                fields=["user", "created_date", "id"],
+                name="todo_task_created_idx",
+            ),
+            # delete_completed_tasks walks completed tasks by id
+            models.Index(
+                fields=["id"],
+                condition=Q(complete=True),
+                name="todo_task_completed_id_idx",
+            ),
+        ]
@@ -0,0 +1,30 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from accounts.models import User, Profile
+from .models import Task
+from .cache import bump_tasks_version
+
+
+# queryset.update(), bulk_create() and bulk_update() do not send this,
+# code using them bumps the version itself. Deletes bump it explicitly
+# too (Task.delete(), the bulk and cleanup paths): a post_delete receiver
+# would disable fast deletes of task querysets.
+@receiver(post_save, sender=Task)
+def task_changed(sender, instance, **kwargs):
+    bump_tasks_version(instance.user_id)
+
+
+# the task payload shows the owner's email and profile image
+@receiver(post_save, sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    bump_tasks_version(instance.id)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and "email" not in update_fields):
+        return
+    bump_tasks_version(
+        *Profile.objects.filter(user=instance).values_list("id", flat=True)
+    )
@@ -1,8 +1,99 @@
+import logging
+import time
+
 from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 
+from core.locks import single_flight
+from .cache import bump_tasks_version_on_commit
 from .models import Task
+from .weather import refresh_popular_buckets, refresh_weather
+
+logger = logging.getLogger(__name__)
+
+# last deleted id of an unfinished cleanup sweep, the next run resumes there
+CLEANUP_CURSOR_KEY = "todo:cleanup:last_id"
+
+
+@shared_task
+@single_flight("delete_completed_tasks")
+def delete_completed_tasks(
+    batch_size=None, max_batches=None, time_budget=None
+):
+    """
+    Delete completed tasks in primary-key chunks, one short transaction
+    per chunk, so the hot table is never locked for long. A run stops at
+    its batch or time budget and the next run resumes from the saved id.
+    """
+    batch_size = batch_size or settings.TODO_CLEANUP_BATCH_SIZE
+    max_batches = max_batches or settings.TODO_CLEANUP_MAX_BATCHES
+    time_budget = time_budget or settings.TODO_CLEANUP_TIME_BUDGET
+
+    start = time.monotonic()
+    last_id = cache.get(CLEANUP_CURSOR_KEY, 0)
+    deleted = batches = 0
+    finished = False
+    while batches < max_batches and time.monotonic() - start < time_budget:
+        # walks the partial index on completed ids
+        rows = list(
+            Task.objects.filter(complete=True, id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "user_id")[:batch_size]
+        )
+        if not rows:
+            finished = True
+            break
+        ids = [task_id for task_id, _ in rows]
+        with transaction.atomic():
+            # complete=True again: a task may have been reopened meanwhile
+            count, _ = Task.objects.filter(id__in=ids, complete=True).delete()
+            bump_tasks_version_on_commit(*(user_id for _, user_id in rows))
+        deleted += count
+        batches += 1
+        last_id = ids[-1]
+
+    if finished:
+        # sweep done, the next run starts from the beginning
+        cache.delete(CLEANUP_CURSOR_KEY)
+    else:
+        cache.set(CLEANUP_CURSOR_KEY, last_id, None)
+
+    stats = {
+        "deleted": deleted,
+        "batches": batches,
+        "finished": finished,
+        "last_id": last_id,
+        "duration": round(time.monotonic() - start, 3),
+    }
+    logger.info(
+        "delete_completed_tasks: deleted %(deleted)s tasks in %(batches)s "
+        "batches, %(duration)ss, finished=%(finished)s, "
+        "last_id=%(last_id)s",
+        stats,
+    )
+    return stats
+
+
+@shared_task
+@single_flight("rebalance_task_positions", timeout=60 * 60)
+def rebalance_task_positions():
+    # renumber the lists where moves have used up the gaps
+    profiles = Task.objects.crowded_profiles()
+    for profile_id in profiles:
+        Task.objects.rebalance(profile_id)
+    return len(profiles)
+
+
+@shared_task
+def refresh_weather_bucket(latitude, longitude):
+    # enqueued by requests that hit a stale bucket
+    return refresh_weather((latitude, longitude))
 
 
 @shared_task
-def delete_completed_tasks():
-    return Task.objects.filter(complete=True).delete()
+@single_flight("refresh_popular_weather", timeout=60 * 5)
+def refresh_popular_weather():
+    # beat refreshes the popular buckets ahead of their expiry
+    return refresh_popular_buckets()
@@ -0,0 +1,140 @@
+import pytest
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.urls import reverse
+from accounts.models import User, Profile
+from todo.models import Task
+
+
+@pytest.fixture
+def common_user():
+    user = User.objects.create_user(
+        email="test333@test.com",
+        password="test/!1234",
+        is_verified=True,
+        is_active=True,
+    )
+    return user
+
+
+@pytest.fixture
+def api_client(common_user):
+    client = APIClient()
+    token = RefreshToken.for_user(common_user).access_token
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    return client
+
+
+@pytest.fixture
+def create_tasks(common_user):
+    user = Profile.objects.get(user=common_user)
+    tasks = [
+        Task.objects.create(user=user, title=f"task {i}", complete=i % 2)
+        for i in range(15)
+    ]
+    return tasks
+
+
+@pytest.mark.django_db
+class TestAsyncTaskApi:
+    def test_requires_jwt(self, common_user):
+        client = APIClient()
+        client.force_login(common_user)
+        response = client.get(reverse("todo:api-v1:async-task-list"))
+        assert response.status_code == 401
+
+    def test_rejects_invalid_token(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Bearer nope")
+        response = client.get(reverse("todo:api-v1:async-task-list"))
+        assert response.status_code == 401
+
+    def test_rejects_inactive_user(self, api_client, common_user):
+        common_user.is_active = False
+        common_user.save()
+        response = api_client.get(reverse("todo:api-v1:async-task-list"))
+        assert response.status_code == 401
+
+    def test_rejects_unverified_user(self, api_client, common_user):
+        common_user.is_verified = False
+        common_user.save()
+        response = api_client.get(reverse("todo:api-v1:async-task-list"))
+        assert response.status_code == 400
+
+    def test_list_pages_match_sync_api(self, api_client, create_tasks):
+        url = reverse("todo:api-v1:async-task-list")
+        sync_url = reverse("todo:api-v1:task-list") + "?pagination=cursor"
+        response = api_client.get(url)
+        assert response.status_code == 200
+        # same payload, links point at the async endpoints
+        results = response.json()["results"]
+        sync_results = api_client.get(sync_url).json()["results"]
+        for task, sync_task in zip(results, sync_results, strict=True):
+            assert task.pop("absolute_url").endswith(
+                f"/async/task/{task['id']}"
+            )
+            sync_task.pop("absolute_url")
+            assert task == sync_task
+
+        seen = []
+        while url:
+            data = api_client.get(url).json()
+            seen += [task["id"] for task in data["results"]]
+            url = data["links"]["next"]
+        assert seen == [task.id for task in reversed(create_tasks)]
+
+    def test_list_filters_complete(self, api_client, create_tasks):
+        url = reverse("todo:api-v1:async-task-list") + "?complete=true"
+        results = api_client.get(url).json()["results"]
+        assert len(results) == 7
+        assert all(task["complete"] for task in results)
+
+    def test_detail(self, api_client, create_tasks):
+        task = create_tasks[0]
+        url = reverse("todo:api-v1:async-task-detail", kwargs={"pk": task.pk})
+        sync_url = reverse("todo:api-v1:task-detail", kwargs={"pk": task.pk})
+        response = api_client.get(url)
+        assert response.status_code == 200
+        assert response.json() == api_client.get(sync_url).json()
+
+    def test_detail_of_other_user_is_404(self, api_client, create_tasks):
+        other = User.objects.create_user(
+            email="other@test.com", password="test/!1234", is_verified=True
+        )
+        task = Task.objects.create(
+            user=Profile.objects.get(user=other), title="other"
+        )
+        url = reverse("todo:api-v1:async-task-detail", kwargs={"pk": task.pk})
+        assert api_client.get(url).status_code == 404
+
+    def test_create(self, api_client, common_user):
+        url = reverse("todo:api-v1:async-task-list")
+        response = api_client.post(url, {"title": "async"}, format="json")
+        assert response.status_code == 201
+        assert response.json()["user"] == common_user.email
+        task = Task.objects.get(pk=response.json()["id"])
+        assert task.title == "async"
+        assert task.user.user == common_user
+
+    def test_create_validates(self, api_client):
+        url = reverse("todo:api-v1:async-task-list")
+        response = api_client.post(url, {"title": ""}, format="json")
+        assert response.status_code == 400
+        assert "title" in response.json()
+
+    def test_weather(self, api_client, common_user):
+        profile = Profile.objects.get(user=common_user)
+        profile.latitude, profile.longitude = 35.6892, 51.389
+        profile.save()
+        response = api_client.get(reverse("todo:api-v1:async-weather"))
+        assert response.status_code == 200
+        assert response.json()["weather"]["coord"] == {
+            "lat": 35.7,
+            "lon": 51.4,
+        }
+        # anonymous users get the default location
+        response = APIClient().get(reverse("todo:api-v1:async-weather"))
+        assert response.json()["weather"]["coord"] == {
+            "lat": 37.5,
+            "lon": 57.3,
+        }
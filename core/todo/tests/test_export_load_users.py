@@ -0,0 +1,50 @@
+import csv
+import io
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+
+
+@pytest.mark.django_db
+class TestExportLoadUsers:
+    def test_writes_active_users_with_tokens(self, tmp_path):
+        call_command(
+            "insert_data", users=3, tasks=6, workers=1, stdout=io.StringIO()
+        )
+        User.objects.create_superuser(
+            email="admin@x.com", password="a/@1234567"
+        )
+        output = tmp_path / "users.csv"
+        call_command(
+            "export_load_users", output=str(output), stdout=io.StringIO()
+        )
+        with open(output, newline="") as stream:
+            rows = list(csv.DictReader(stream))
+        assert len(rows) == 3
+        assert "admin@x.com" not in {row["email"] for row in rows}
+        user = User.objects.get(email=rows[0]["email"])
+        assert AccessToken(rows[0]["access"])["user_id"] == str(user.id)
+        assert rows[0]["password"] == "fake@1234"
+
+    def test_without_tokens(self, tmp_path):
+        call_command(
+            "insert_data", users=1, tasks=1, workers=1, stdout=io.StringIO()
+        )
+        output = tmp_path / "users.csv"
+        call_command(
+            "export_load_users",
+            output=str(output),
+            no_tokens=True,
+            stdout=io.StringIO(),
+        )
+        with open(output, newline="") as stream:
+            (row,) = csv.DictReader(stream)
+        assert row["access"] == row["refresh"] == ""
+
+    def test_requires_users(self):
+        with pytest.raises(CommandError):
+            call_command("export_load_users", output="-")
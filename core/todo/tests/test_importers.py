@@ -0,0 +1,182 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import User, Profile
+from todo.importers import TaskImporter, read_rows
+from todo.models import Task, POSITION_GAP
+
+
+@pytest.fixture
+def common_user():
+    user = User.objects.create_user(
+        email="test333@test.com", password="test/!1234", is_verified=True
+    )
+    return user
+
+
+@pytest.fixture
+def profile(common_user):
+    return Profile.objects.get(user=common_user)
+
+
+@pytest.fixture
+def api_client(common_user):
+    client = APIClient()
+    client.force_authenticate(common_user)
+    return client
+
+
+NDJSON = (
+    b'{"title": "one", "complete": true}\n'
+    b"\n"
+    b"not json\n"
+    b'{"title": ""}\n'
+    b'{"title": "two"}\n'
+)
+CSV = b"id,title,complete\n7,one,True\n8,,False\n9,two,\n"
+
+
+@pytest.mark.django_db
+class TestTaskImporter:
+    def test_imports_in_batches_with_row_errors(self, profile):
+        Task.objects.create(user=profile, title="existing")
+        importer = TaskImporter(profile, batch_size=2)
+        progress = []
+        stats = importer.run(
+            read_rows(io.BytesIO(NDJSON), "ndjson"),
+            lambda stats: progress.append(stats["rows"]),
+        )
+        assert progress == [2, 4]
+        assert stats["rows"] == 4
+        assert stats["imported"] == 2
+        assert [error["row"] for error in stats["errors"]] == [2, 3]
+        tasks = list(Task.objects.filter(user=profile))
+        assert [task.title for task in tasks] == ["existing", "one", "two"]
+        assert tasks[1].complete is True
+        # appended after the existing tasks, a gap apart
+        assert tasks[2].position - tasks[1].position == POSITION_GAP
+        assert tasks[1].position > tasks[0].position
+
+    def test_failed_import_shows_committed_batches(
+        self, api_client, profile, django_capture_on_commit_callbacks
+    ):
+        def rows():
+            yield from ({"title": f"task {i}"} for i in range(3))
+            raise OSError("upload interrupted")
+
+        url = reverse("todo:api-v1:task-list")
+        assert api_client.get(url).data["results"] == []
+        importer = TaskImporter(profile, batch_size=2)
+        with django_capture_on_commit_callbacks(execute=True):
+            with pytest.raises(OSError):
+                importer.run(rows())
+        # the first batch is committed and no cached page hides it
+        titles = [
+            task["title"] for task in api_client.get(url).data["results"]
+        ]
+        assert titles == ["task 0", "task 1"]
+
+    def test_tasks_created_during_an_import_keep_their_own_position(
+        self, profile
+    ):
+        rows = [{"title": f"task {i}"} for i in range(4)]
+
+        def progress(stats):
+            if stats["batches"] == 1:
+                Task.objects.create(user=profile, title="created meanwhile")
+
+        TaskImporter(profile, batch_size=2).run(rows, progress)
+        positions = list(
+            Task.objects.filter(user=profile).values_list(
+                "position", flat=True
+            )
+        )
+        assert len(positions) == len(set(positions)) == 5
+        titles = list(
+            Task.objects.filter(user=profile).values_list("title", flat=True)
+        )
+        assert titles[2] == "created meanwhile"
+
+    def test_csv_rows(self, profile):
+        stats = TaskImporter(profile).run(read_rows(io.BytesIO(CSV), "csv"))
+        assert stats["imported"] == 2
+        assert stats["errors"][0]["row"] == 2
+        assert "title" in stats["errors"][0]["errors"]
+
+    def test_error_report_is_capped(self, profile, settings):
+        settings.TASK_IMPORT_MAX_ERRORS = 1
+        stats = TaskImporter(profile).run(
+            read_rows(io.BytesIO(b"x\ny\nz\n"), "ndjson")
+        )
+        assert stats["failed"] == 3
+        assert len(stats["errors"]) == 1
+
+    def test_command(self, profile, tmp_path):
+        path = tmp_path / "tasks.csv"
+        path.write_bytes(CSV)
+        out, err = io.StringIO(), io.StringIO()
+        call_command(
+            "import_tasks",
+            str(path),
+            email=profile.user.email,
+            stdout=out,
+            stderr=err,
+        )
+        assert "imported 2 of 3 rows" in out.getvalue()
+        assert "row 2:" in err.getvalue()
+        assert Task.objects.filter(user=profile).count() == 2
+
+
+@pytest.mark.django_db
+class TestTaskImportApi:
+    def test_post_task_import_raw_body(self, api_client, profile):
+        url = reverse("todo:api-v1:task-import")
+        response = api_client.post(
+            url, NDJSON, content_type="application/x-ndjson"
+        )
+        assert response.status_code == 207
+        assert response.data["imported"] == 2
+        assert response.data["failed"] == 2
+        progress = api_client.get(url).data
+        assert progress["finished"] is True
+        assert progress["imported"] == 2
+        assert "errors" not in progress
+
+    def test_post_task_import_csv_upload(self, api_client, profile):
+        url = reverse("todo:api-v1:task-import")
+        upload = io.BytesIO(b"title,complete\none,true\ntwo,false\n")
+        upload.name = "tasks.csv"
+        response = api_client.post(
+            url + "?type=csv", {"file": upload}, format="multipart"
+        )
+        assert response.status_code == 201
+        assert Task.objects.filter(user=profile).count() == 2
+
+    def test_export_import_round_trip(self, api_client, profile):
+        for i in range(5):
+            Task.objects.create(user=profile, title=f"task {i}")
+        export = api_client.get(reverse("todo:api-v1:task-export"))
+        body = b"".join(export.streaming_content)
+        Task.objects.all().delete()
+        url = reverse("todo:api-v1:task-import")
+        response = api_client.post(
+            url, body, content_type="application/x-ndjson"
+        )
+        assert response.status_code == 201
+        titles = Task.objects.values_list("title", flat=True)
+        assert list(titles) == [f"task {i}" for i in range(5)]
+
+    def test_task_import_progress_404_before_any_import(self, api_client):
+        url = reverse("todo:api-v1:task-import")
+        assert api_client.get(url).status_code == 404
+
+    def test_post_task_import_400_status(self, api_client):
+        url = reverse("todo:api-v1:task-import")
+        response = api_client.post(
+            url + "?type=xml", b"x", content_type="text/plain"
+        )
+        assert response.status_code == 400
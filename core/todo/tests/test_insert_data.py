@@ -0,0 +1,68 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count
+
+from accounts.models import User, Profile
+from todo import generators
+from todo.generators import generate_tasks, task_counts
+from todo.models import Task, POSITION_GAP
+
+
+class TestGenerators:
+    def test_position_gap_matches_model(self):
+        assert generators.POSITION_GAP == POSITION_GAP
+
+    def test_task_counts(self):
+        assert task_counts(10, 3) == [4, 3, 3]
+        skewed = task_counts(1000, 10, skew=1.5)
+        assert sum(skewed) == 1000
+        assert skewed == sorted(skewed, reverse=True)
+        assert skewed[0] > 400
+        assert task_counts(10, 0) == []
+
+    def test_generate_tasks_is_deterministic(self):
+        job = (7, 100, 5, 42)
+        rows = generate_tasks(job)
+        assert rows == generate_tasks(job)
+        assert [row[3] for row in rows] == [
+            (100 + i + 1) * POSITION_GAP for i in range(5)
+        ]
+        assert {row[0] for row in rows} == {7}
+
+
+@pytest.mark.django_db
+class TestInsertData:
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_seeds_users_and_skewed_tasks(self, workers):
+        call_command(
+            "insert_data",
+            users=4,
+            tasks=300,
+            skew=1,
+            workers=workers,
+            batch_size=50,
+            stdout=io.StringIO(),
+        )
+        assert User.objects.count() == 4
+        assert Profile.objects.count() == 4
+        counts = sorted(
+            Profile.objects.annotate(tasks=Count("task")).values_list(
+                "tasks", flat=True
+            ),
+            reverse=True,
+        )
+        assert counts == task_counts(300, 4, skew=1)
+        # one hash shared by everybody, and it is a working one
+        assert User.objects.values("password").distinct().count() == 1
+        assert User.objects.first().check_password("fake@1234")
+        first = Task.objects.order_by("user", "position").first()
+        assert first.position == POSITION_GAP
+
+    @pytest.mark.parametrize("options", [{"users": 0}, {"tasks": -1}])
+    def test_rejects_empty_seed(self, options):
+        with pytest.raises(CommandError):
+            call_command("insert_data", stdout=io.StringIO(), **options)
+        assert not User.objects.exists()
@@ -0,0 +1,89 @@
+import random
+
+import pytest
+from django.db import connection
+from django.contrib.auth.hashers import make_password
+from django.db.models import Q
+
+from accounts.models import User, Profile
+from todo.models import Task, POSITION_GAP
+
+# enough rows for the planner to prefer an index over a full scan
+USERS = 50
+TASKS_PER_USER = 400
+COMPLETED_RATIO = 0.1
+
+
+@pytest.fixture
+def seeded_profile():
+    # one password hash for everybody, hashing is not what we measure
+    password = make_password("test/!1234")
+    users = User.objects.bulk_create(
+        User(email=f"plan{i}@test.com", password=password, is_verified=True)
+        for i in range(USERS)
+    )
+    profiles = Profile.objects.bulk_create(
+        Profile(user=user) for user in users
+    )
+    rng = random.Random(0)
+    tasks = [
+        Task(
+            user=profile,
+            title=f"task {n}",
+            complete=rng.random() < COMPLETED_RATIO,
+            position=n * POSITION_GAP,
+        )
+        for profile in profiles
+        for n in range(1, TASKS_PER_USER + 1)
+    ]
+    Task.objects.bulk_create(tasks, batch_size=2000)
+    with connection.cursor() as cursor:
+        # fresh statistics, like autovacuum would have on a live table
+        if connection.vendor == "postgresql":
+            cursor.execute("ANALYZE todo_task")
+        else:
+            cursor.execute("ANALYZE")
+    return profiles[USERS // 2]
+
+
+def assert_no_full_scan(queryset):
+    plan = queryset.explain()
+    if connection.vendor == "postgresql":
+        assert "Seq Scan on todo_task" not in plan, plan
+    else:
+        # sqlite: "SCAN todo_task" without an index is a full table scan
+        for line in plan.splitlines():
+            if "SCAN todo_task" in line:
+                assert "USING" in line, plan
+    return plan
+
+
+@pytest.mark.django_db
+class TestTaskQueryPlans:
+    def test_list_query_uses_index(self, seeded_profile):
+        assert_no_full_scan(Task.objects.filter(user=seeded_profile)[:10])
+
+    def test_complete_filter_uses_index(self, seeded_profile):
+        queryset = Task.objects.filter(user=seeded_profile, complete=False)
+        assert_no_full_scan(queryset[:10])
+
+    def test_created_date_ordering_uses_index(self, seeded_profile):
+        queryset = Task.objects.filter(user=seeded_profile).order_by(
+            "-created_date", "-id"
+        )
+        assert_no_full_scan(queryset[:10])
+
+    def test_cursor_page_uses_index(self, seeded_profile):
+        # the keyset condition of TaskCursorPagination
+        last = Task.objects.filter(user=seeded_profile).order_by("id")[200]
+        queryset = (
+            Task.objects.filter(user=seeded_profile)
+            .filter(created_date__lte=last.created_date)
+            .filter(Q(created_date__lt=last.created_date) | Q(id__lt=last.id))
+            .order_by("-created_date", "-id")
+        )
+        assert_no_full_scan(queryset[:11])
+
+    def test_cleanup_query_uses_index(self, seeded_profile):
+        queryset = Task.objects.filter(complete=True).order_by("id")
+        assert_no_full_scan(queryset.values_list("id", flat=True)[:1000])
@@ -1,7 +1,21 @@
+import csv
+import io
+import json
+import time
+from unittest import mock
+
 import pytest
+from asgiref.sync import async_to_sync
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.core.signals import request_started, request_finished
+from django.db import close_old_connections, connection
 from django.urls import reverse
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
 from accounts.models import User, Profile
+from core.asgi import application
+from todo import exports
 from todo.models import Task
 
 
@@ -30,6 +44,21 @@ def create_task(common_user):
     return task
 
 
+@pytest.fixture
+def create_tasks(common_user):
+    user = Profile.objects.get(user=common_user)
+    tasks = [
+        Task.objects.create(user=user, title=f"task {i}") for i in range(25)
+    ]
+    return tasks
+
+
+# query budgets: a list page or a detail must cost a constant number of
+# queries, whatever the page size (count + page / row, profile is cached)
+TASK_LIST_QUERY_BUDGET = 2
+TASK_DETAIL_QUERY_BUDGET = 1
+
+
 @pytest.mark.django_db
 class TestTaskApi:
     def test_get_task_list_response_401_status(self, api_client):
@@ -108,3 +137,479 @@ class TestTaskApi:
         api_client.force_authenticate(user)
         response = api_client.delete(url, follow=True)
         assert response.status_code == 204
+
+    def test_get_task_list_cursor_pagination(
+        self, api_client, common_user, create_tasks
+    ):
+        # keyset pagination walks every task once, newest first
+        url = reverse("todo:api-v1:task-list")
+        api_client.force_authenticate(common_user)
+        response = api_client.get(url, {"pagination": "cursor"})
+        assert response.status_code == 200
+        assert "total_objects" not in response.data
+        seen = [task["id"] for task in response.data["results"]]
+        next_link = response.data["links"]["next"]
+        while next_link:
+            response = api_client.get(next_link)
+            seen += [task["id"] for task in response.data["results"]]
+            next_link = response.data["links"]["next"]
+        assert seen == [task.id for task in reversed(create_tasks)]
+
+    def test_get_task_list_cursor_stable_after_changes(
+        self, api_client, common_user, create_tasks
+    ):
+        # inserting and deleting tasks does not shift the next page
+        url = reverse("todo:api-v1:task-list")
+        api_client.force_authenticate(common_user)
+        response = api_client.get(url, {"pagination": "cursor"})
+        next_link = response.data["links"]["next"]
+        expected = api_client.get(next_link).data["results"]
+        Task.objects.create(user=create_tasks[0].user, title="new")
+        Task.objects.filter(id=response.data["results"][0]["id"]).delete()
+        assert api_client.get(next_link).data["results"] == expected
+
+    def test_get_task_list_cursor_previous_link(
+        self, api_client, common_user, create_tasks
+    ):
+        # previous link returns the page we came from
+        url = reverse("todo:api-v1:task-list")
+        api_client.force_authenticate(common_user)
+        first = api_client.get(url, {"pagination": "cursor"})
+        second = api_client.get(first.data["links"]["next"])
+        back = api_client.get(second.data["links"]["previous"])
+        assert back.data["results"] == first.data["results"]
+
+    def test_get_task_list_invalid_cursor_404_status(
+        self, api_client, common_user
+    ):
+        url = reverse("todo:api-v1:task-list")
+        api_client.force_authenticate(common_user)
+        response = api_client.get(url, {"cursor": "not-a-cursor"})
+        assert response.status_code == 404
+
+    def test_get_task_list_query_budget(
+        self, api_client, common_user, create_tasks, settings
+    ):
+        # no N+1: 1 task or a full page of 10 costs the same
+        settings.TASK_RESPONSE_CACHE_TIMEOUT = 0
+        url = reverse("todo:api-v1:task-list")
+        api_client.force_authenticate(common_user)
+        Task.objects.exclude(id=create_tasks[0].id).delete()
+        api_client.get(url)
+        with CaptureQueriesContext(connection) as single:
+            api_client.get(url)
+        for i in range(15):
+            Task.objects.create(user=create_tasks[0].user, title=f"more {i}")
+        with CaptureQueriesContext(connection) as page:
+            response = api_client.get(url)
+        assert len(response.data["results"]) == 10
+        assert len(single) == len(page) <= TASK_LIST_QUERY_BUDGET
+
+    def test_post_task_create_query_budget(self, api_client, common_user):
+        # the owner profile comes with its user, the response needs no query
+        url = reverse("todo:api-v1:task-list")
+        api_client.force_authenticate(common_user)
+        api_client.post(url, data={"title": "warm"})
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.post(url, data={"title": "TestTask"})
+        assert response.status_code == 201
+        assert response.data["user"] == common_user.email
+        assert not any('"accounts_user"' in q["sql"] for q in queries)
+
+    def test_get_task_retrieve_query_budget(
+        self, api_client, common_user, create_task, settings
+    ):
+        settings.TASK_RESPONSE_CACHE_TIMEOUT = 0
+        url = reverse("todo:api-v1:task-detail", kwargs={"pk": create_task.id})
+        api_client.force_authenticate(common_user)
+        api_client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url)
+        assert response.status_code == 200
+        assert len(queries) <= TASK_DETAIL_QUERY_BUDGET
+
+    def test_post_task_bulk_create_201_status(self, api_client, common_user):
+        # the whole batch is written with one INSERT
+        url = reverse("todo:api-v1:task-bulk-create")
+        api_client.force_authenticate(common_user)
+        data = {"tasks": [{"title": f"bulk {i}"} for i in range(20)]}
+        response = api_client.post(url, data=data, format="json")
+        assert response.status_code == 201
+        assert response.data["created"] == 20
+        ids = [result["id"] for result in response.data["results"]]
+        titles = Task.objects.filter(id__in=ids).values_list(
+            "title", flat=True
+        )
+        assert sorted(titles) == sorted(
+            task["title"] for task in data["tasks"]
+        )
+
+    def test_post_task_bulk_create_reports_invalid_items(
+        self, api_client, common_user
+    ):
+        url = reverse("todo:api-v1:task-bulk-create")
+        api_client.force_authenticate(common_user)
+        data = {"tasks": [{"title": "ok"}, {"complete": True}]}
+        response = api_client.post(url, data=data, format="json")
+        assert response.status_code == 207
+        assert response.data["results"][0]["status"] == "created"
+        assert response.data["results"][1]["status"] == "invalid"
+        assert "title" in response.data["results"][1]["errors"]
+
+    def test_patch_task_bulk_update_200_status(
+        self, api_client, common_user, create_tasks
+    ):
+        url = reverse("todo:api-v1:task-bulk-update")
+        api_client.force_authenticate(common_user)
+        data = {
+            "tasks": [
+                {"id": create_tasks[0].id, "title": "renamed"},
+                {"id": create_tasks[1].id, "complete": True},
+            ]
+        }
+        response = api_client.patch(url, data=data, format="json")
+        assert response.status_code == 200
+        create_tasks[0].refresh_from_db()
+        create_tasks[1].refresh_from_db()
+        assert create_tasks[0].title == "renamed"
+        assert create_tasks[1].complete is True
+
+    def test_post_task_bulk_complete_and_delete_only_own_tasks(
+        self, api_client, common_user, create_tasks
+    ):
+        # tasks of another user are reported as not found and left alone
+        other = User.objects.create_user(
+            email="other@test.com", password="test/!1234", is_verified=True
+        )
+        foreign = Task.objects.create(
+            user=Profile.objects.get(user=other), title="foreign"
+        )
+        api_client.force_authenticate(common_user)
+        ids = [create_tasks[0].id, foreign.id]
+
+        url = reverse("todo:api-v1:task-bulk-complete")
+        response = api_client.post(url, data={"ids": ids}, format="json")
+        assert response.status_code == 207
+        assert [r["status"] for r in response.data["results"]] == [
+            "updated",
+            "not_found",
+        ]
+        assert Task.objects.get(id=create_tasks[0].id).complete is True
+        assert Task.objects.get(id=foreign.id).complete is False
+
+        url = reverse("todo:api-v1:task-bulk-delete")
+        response = api_client.post(url, data={"ids": ids}, format="json")
+        assert response.data["deleted"] == 1
+        assert not Task.objects.filter(id=create_tasks[0].id).exists()
+        assert Task.objects.filter(id=foreign.id).exists()
+
+    def test_post_task_move_200_status(
+        self, api_client, common_user, create_tasks
+    ):
+        # moving a task writes only that row
+        first, second, third = create_tasks[:3]
+        url = reverse("todo:api-v1:task-move", kwargs={"pk": third.id})
+        api_client.force_authenticate(common_user)
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.post(url, data={"after": first.id})
+        assert response.status_code == 200
+        assert len([q for q in queries if q["sql"].startswith("UPDATE")]) == 1
+        order = list(
+            Task.objects.filter(user=first.user).values_list("id", flat=True)
+        )
+        assert order[:3] == [first.id, third.id, second.id]
+
+        api_client.post(url, data={"after": None}, format="json")
+        assert Task.objects.filter(user=first.user).first() == third
+
+    def test_post_task_move_rebalances_full_gap(
+        self, api_client, common_user, create_tasks
+    ):
+        # once a gap is used up the list is renumbered and the move still lands
+        first, second, third = create_tasks[:3]
+        api_client.force_authenticate(common_user)
+        for _ in range(15):
+            url = reverse("todo:api-v1:task-move", kwargs={"pk": third.id})
+            api_client.post(url, data={"after": first.id})
+            third, second = second, third
+        order = list(
+            Task.objects.filter(user=first.user).values_list("id", flat=True)
+        )
+        assert order[:3] == [first.id, second.id, third.id]
+        assert Task.objects.crowded_profiles() == set()
+
+    def test_post_task_move_400_status(
+        self, api_client, common_user, create_task
+    ):
+        url = reverse("todo:api-v1:task-move", kwargs={"pk": create_task.id})
+        api_client.force_authenticate(common_user)
+        response = api_client.post(url, data={"after": create_task.id})
+        assert response.status_code == 400
+        response = api_client.post(url, data={})
+        assert response.status_code == 400
+        response = api_client.post(url, data={"before": None}, format="json")
+        assert response.status_code == 400
+        assert "before" in response.data
+
+    def test_get_task_list_search(self, api_client, common_user, create_task):
+        # ?search= goes through TaskQuerySet.search (icontains off postgres)
+        profile = create_task.user
+        Task.objects.create(user=profile, title="Buy fresh apples")
+        Task.objects.create(user=profile, title="Call the bank")
+        url = reverse("todo:api-v1:task-list")
+        api_client.force_authenticate(common_user)
+        response = api_client.get(url, {"search": "apple"})
+        assert response.status_code == 200
+        titles = [task["title"] for task in response.data["results"]]
+        assert titles == ["Buy fresh apples"]
+
+    @pytest.mark.skipif(
+        connection.vendor != "postgresql", reason="PostgreSQL search only"
+    )
+    def test_get_task_list_search_ranked_and_fuzzy(
+        self, api_client, common_user, create_task
+    ):
+        # stemmed word matches rank first, a typo still finds the task
+        profile = create_task.user
+        Task.objects.create(user=profile, title="pineapple juice")
+        Task.objects.create(user=profile, title="walk the dogs")
+        url = reverse("todo:api-v1:task-list")
+        api_client.force_authenticate(common_user)
+        response = api_client.get(url, {"search": "dog"})
+        assert response.data["results"][0]["title"] == "walk the dogs"
+        response = api_client.get(url, {"search": "pinaple"})
+        titles = [task["title"] for task in response.data["results"]]
+        assert "pineapple juice" in titles
+
+    def test_get_task_list_304_status_without_queries(
+        self, api_client, common_user, create_task
+    ):
+        # a matching If-None-Match is answered before touching the database
+        url = reverse("todo:api-v1:task-list")
+        api_client.force_authenticate(common_user)
+        response = api_client.get(url)
+        etag = response["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response["ETag"] == etag
+        assert len(queries) == 0
+
+    def test_get_task_list_if_modified_since_alone_is_not_304(
+        self, api_client, common_user, create_task
+    ):
+        # a write within the same second must not be answered with a 304
+        url = reverse("todo:api-v1:task-list")
+        api_client.force_authenticate(common_user)
+        response = api_client.get(url)
+        assert not response.has_header("Last-Modified")
+        create_task.title = "changed"
+        create_task.save()
+        response = api_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+        )
+        assert response.status_code == 200
+        assert response.data["results"][0]["title"] == "changed"
+
+    def test_get_task_etag_changes_after_writes(
+        self, api_client, common_user, create_task
+    ):
+        # saves, bulk paths and moves all give a new ETag
+        list_url = reverse("todo:api-v1:task-list")
+        detail_url = reverse(
+            "todo:api-v1:task-detail", kwargs={"pk": create_task.id}
+        )
+        api_client.force_authenticate(common_user)
+        etag = api_client.get(detail_url)["ETag"]
+        create_task.title = "changed"
+        create_task.save()
+        response = api_client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data["title"] == "changed"
+
+        etag = api_client.get(list_url)["ETag"]
+        api_client.post(
+            reverse("todo:api-v1:task-bulk-complete"),
+            data={"ids": [create_task.id]},
+            format="json",
+        )
+        response = api_client.get(list_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+    def test_get_task_etag_changes_after_deletes(
+        self,
+        api_client,
+        common_user,
+        create_task,
+        django_capture_on_commit_callbacks,
+    ):
+        # deletes bump the version once, when their transaction commits
+        other = Task.objects.create(user=create_task.user, title="other")
+        list_url = reverse("todo:api-v1:task-list")
+        api_client.force_authenticate(common_user)
+        etag = api_client.get(list_url)["ETag"]
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            api_client.post(
+                reverse("todo:api-v1:task-bulk-delete"),
+                data={"ids": [other.id]},
+                format="json",
+            )
+        assert len(callbacks) == 1
+        response = api_client.get(list_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+
+        etag = response["ETag"]
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            api_client.delete(create_task.get_absolute_api_url())
+        assert len(callbacks) == 1
+        response = api_client.get(list_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data["results"] == []
+
+    def test_get_task_list_served_from_response_cache(
+        self, api_client, common_user, create_task
+    ):
+        # repeated reads are cache hits, a write is seen right away
+        url = reverse("todo:api-v1:task-list")
+        api_client.force_authenticate(common_user)
+        assert api_client.get(url)["X-Cache"] == "MISS"
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url)
+        assert response["X-Cache"] == "HIT"
+        assert len(queries) == 0
+        detail_url = reverse(
+            "todo:api-v1:task-detail", kwargs={"pk": create_task.id}
+        )
+        api_client.patch(detail_url, data={"title": "fresh"})
+        response = api_client.get(url)
+        assert response["X-Cache"] == "MISS"
+        assert response.data["results"][0]["title"] == "fresh"
+
+    def test_get_task_export_ndjson(
+        self, api_client, common_user, create_tasks
+    ):
+        url = reverse("todo:api-v1:task-export")
+        api_client.force_authenticate(common_user)
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url)
+            # streamed: the tasks are only read while the body is consumed
+            assert not any('"todo_task"' in q["sql"] for q in queries)
+            lines = b"".join(response.streaming_content).splitlines()
+        assert any('"todo_task"' in q["sql"] for q in queries)
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in lines]
+        assert [row["id"] for row in rows] == [
+            task.id for task in create_tasks
+        ]
+        assert set(rows[0]) == {
+            "id",
+            "title",
+            "complete",
+            "position",
+            "created_date",
+            "updated_date",
+        }
+
+    def test_get_task_export_csv_filtered(
+        self, api_client, common_user, create_tasks
+    ):
+        create_tasks[3].complete = True
+        create_tasks[3].save()
+        url = reverse("todo:api-v1:task-export")
+        api_client.force_authenticate(common_user)
+        response = api_client.get(url, {"type": "csv", "complete": "true"})
+        assert response["Content-Type"] == "text/csv"
+        assert 'filename="tasks.csv"' in response["Content-Disposition"]
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.reader(io.StringIO(content)))
+        assert rows[0][:3] == ["id", "title", "complete"]
+        assert rows[1][:3] == [str(create_tasks[3].id), "task 3", "True"]
+        assert len(rows) == 2
+
+    def test_get_task_export_400_status(self, api_client, common_user):
+        url = reverse("todo:api-v1:task-export")
+        api_client.force_authenticate(common_user)
+        response = api_client.get(url, {"type": "xml"})
+        assert response.status_code == 400
+
+
+@pytest.fixture
+def asgi_get():
+    """
+    GET through core.asgi, returning the messages sent to the server.
+    The test database connection is kept open, like the test client does.
+    """
+    request_started.disconnect(close_old_connections)
+    request_finished.disconnect(close_old_connections)
+
+    def get(path, headers, on_send=None):
+        messages = []
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"testserver"), *headers],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+            if on_send is not None:
+                on_send(message)
+
+        async_to_sync(application)(scope, receive, send)
+        return messages
+
+    yield get
+    request_started.connect(close_old_connections)
+    request_finished.connect(close_old_connections)
+
+
+# committed rows: under ASGI the view runs in a thread of its own
+@pytest.mark.django_db(transaction=True)
+class TestTaskExportAsgi:
+    def test_export_is_streamed_under_asgi(
+        self, asgi_get, common_user, create_tasks, settings
+    ):
+        # the first chunk goes out before the last row is even formatted
+        settings.TASK_EXPORT_CHUNK_SIZE = 5
+        events = []
+        ndjson_line = exports.ndjson_line
+
+        def format_row(row):
+            events.append("row")
+            return ndjson_line(row)
+
+        def on_send(message):
+            if message["type"] == "http.response.body":
+                events.append("send")
+
+        common_user.is_active = True
+        common_user.save()
+        token = RefreshToken.for_user(common_user).access_token
+        with mock.patch.object(exports, "ndjson_line", format_row):
+            messages = asgi_get(
+                reverse("todo:api-v1:task-export"),
+                [(b"authorization", f"Bearer {token}".encode())],
+                on_send,
+            )
+        assert messages[0]["status"] == 200
+        last_row = len(events) - 1 - events[::-1].index("row")
+        assert events.index("send") < last_row
+        body = b"".join(m.get("body", b"") for m in messages[1:])
+        rows = [json.loads(line) for line in body.splitlines()]
+        assert [row["id"] for row in rows] == [
+            task.id for task in create_tasks
+        ]
@@ -0,0 +1,163 @@
+import time
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User, Profile
+from todo.cache import (
+    TASKS_VERSION_KEY,
+    bump_tasks_version,
+    get_tasks_version,
+)
+from todo.models import Task
+from todo.tasks import delete_completed_tasks
+from core.locks import (
+    LOCK_KEY,
+    RELEASE_SCRIPT,
+    acquire,
+    get_single_flight_stats,
+    single_flight,
+)
+
+
+@pytest.fixture
+def profile():
+    user = User.objects.create_user(
+        email="test333@test.com", password="test/!1234", is_verified=True
+    )
+    return Profile.objects.get(user=user)
+
+
+@pytest.fixture
+def create_tasks(profile):
+    tasks = [
+        Task(user=profile, title=f"task {i}", complete=i % 2 == 0)
+        for i in range(20)
+    ]
+    return Task.objects.bulk_create(tasks)
+
+
+@pytest.mark.django_db
+class TestDeleteCompletedTasks:
+    def test_deletes_only_completed_tasks(self, create_tasks):
+        stats = delete_completed_tasks(batch_size=3)
+        assert stats["deleted"] == 10
+        assert stats["batches"] == 4
+        assert stats["finished"] is True
+        assert not Task.objects.filter(complete=True).exists()
+        assert Task.objects.count() == 10
+
+    def test_deletes_set_based_and_bumps_once_per_batch(
+        self, profile, create_tasks, django_capture_on_commit_callbacks
+    ):
+        # no row-by-row delete: no full rows loaded, one bump per batch
+        with mock.patch("todo.cache._set_versions") as set_versions:
+            with CaptureQueriesContext(connection) as queries:
+                with django_capture_on_commit_callbacks(execute=True):
+                    stats = delete_completed_tasks(batch_size=3)
+        assert set_versions.call_count == stats["batches"]
+        assert all(len(call.args[0]) == 1 for call in set_versions.mock_calls)
+        assert not any('"todo_task"."title"' in q["sql"] for q in queries)
+
+    def test_bumps_version_after_commit(
+        self, profile, create_tasks, django_capture_on_commit_callbacks
+    ):
+        version = get_tasks_version(profile.id)
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            delete_completed_tasks()
+        assert callbacks
+        assert get_tasks_version(profile.id) != version
+
+    def test_run_budget_and_resume(self, create_tasks):
+        # a bounded run stops early and the next one picks up after it
+        stats = delete_completed_tasks(batch_size=2, max_batches=2)
+        assert stats["deleted"] == 4
+        assert stats["finished"] is False
+        assert Task.objects.filter(complete=True).count() == 6
+        stats = delete_completed_tasks(batch_size=2, max_batches=10)
+        assert stats["deleted"] == 6
+        assert stats["finished"] is True
+        assert not Task.objects.filter(complete=True).exists()
+
+
+@pytest.mark.django_db
+class TestSingleFlight:
+    def test_skips_while_another_run_holds_the_lock(self, create_tasks):
+        cache.set(LOCK_KEY.format("delete_completed_tasks"), "other", 60)
+        assert delete_completed_tasks() is None
+        assert Task.objects.filter(complete=True).count() == 10
+        stats = get_single_flight_stats("delete_completed_tasks")
+        assert stats["skipped"] == 1
+        assert stats["running"] is True
+
+    def test_records_run_and_releases_lock(self, create_tasks):
+        delete_completed_tasks()
+        stats = get_single_flight_stats("delete_completed_tasks")
+        assert stats["runs"] == 1
+        assert stats["running"] is False
+        assert stats["last_run"]["status"] == "ok"
+
+    def test_counts_overlapping_run(self):
+        @single_flight("slow_job")
+        def slow_job():
+            # the lock expires and another run takes it
+            cache.set(LOCK_KEY.format("slow_job"), "other", 60)
+
+        slow_job()
+        stats = get_single_flight_stats("slow_job")
+        assert stats["overlapping"] == 1
+        # the other run's lock is left alone
+        assert stats["running"] is True
+
+    def test_counts_failed_run(self):
+        @single_flight("broken_job")
+        def broken_job():
+            raise ValueError
+
+        with pytest.raises(ValueError):
+            broken_job()
+        stats = get_single_flight_stats("broken_job")
+        assert stats["failed"] == 1
+        assert stats["last_run"]["status"] == "failed"
+        assert stats["running"] is False
+
+    def test_release_after_expiry_keeps_the_new_owner(self):
+        release = acquire("expiring_job", timeout=1)
+        time.sleep(1.1)
+        other = acquire("expiring_job", timeout=60)
+        assert other is not None
+        assert release() is False
+        assert get_single_flight_stats("expiring_job")["running"] is True
+        assert other() is True
+
+    def test_redis_release_is_compare_and_delete(self):
+        release = acquire("redis_job", timeout=60)
+        key = LOCK_KEY.format("redis_job")
+        token = cache.get(key)
+        redis = mock.Mock()
+        # the script found another token: the lock was taken over
+        redis.eval.return_value = 0
+        with mock.patch("core.locks.get_redis_connection", return_value=redis):
+            assert release() is False
+        redis.eval.assert_called_once_with(
+            RELEASE_SCRIPT, 1, cache.make_key(key), token
+        )
+
+
+class TestTasksVersion:
+    def test_every_bump_is_a_new_version_on_a_frozen_clock(self):
+        version = get_tasks_version(1)
+        with mock.patch("todo.cache.time.time_ns", return_value=0):
+            bump_tasks_version(1)
+            bump_tasks_version(1)
+        assert get_tasks_version(1) == version + 2
+
+    def test_evicted_version_restarts_above_the_old_ones(self):
+        bump_tasks_version(1)
+        version = get_tasks_version(1)
+        cache.delete(TASKS_VERSION_KEY.format(1))
+        bump_tasks_version(1)
+        assert get_tasks_version(1) > version
@@ -0,0 +1,237 @@
+import json
+import time
+from unittest import mock
+
+import httpx
+import pytest
+import requests
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.urls import reverse
+from kombu.exceptions import OperationalError
+from rest_framework.test import APIClient
+
+from accounts.models import User, Profile
+from todo import weather
+from todo.tasks import refresh_weather_bucket
+from todo.weather import (
+    WEATHER_BUCKETS_KEY,
+    WEATHER_CACHE_KEY,
+    WEATHER_HITS_KEY,
+    WEATHER_LOCK_KEY,
+    get_bucket,
+    get_buckets,
+    get_weather,
+    hot_buckets,
+    record_hits,
+    refresh_popular_buckets,
+    register_bucket,
+)
+
+DEFAULT_KEY = "37.5:57.3"
+
+
+class FakeResponse:
+    def __init__(self, temp):
+        self.temp = temp
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {
+            "name": "Bojnurd",
+            "main": {
+                "temp": self.temp,
+                "feels_like": self.temp,
+                "temp_min": self.temp,
+                "temp_max": self.temp,
+            },
+        }
+
+
+@pytest.fixture
+def upstream(monkeypatch, settings):
+    settings.WEATHER_PROVIDER = "todo.weather.OpenWeatherProvider"
+    calls = []
+
+    def get(url, params=None, timeout=None):
+        calls.append((params["lat"], params["lon"], timeout))
+        return FakeResponse(300.15)
+
+    monkeypatch.setattr(weather.session, "get", get)
+    return calls
+
+
+@pytest.fixture
+def profile():
+    user = User.objects.create_user(
+        email="test333@test.com", password="test/!1234", is_verified=True
+    )
+    profile = Profile.objects.get(user=user)
+    profile.latitude, profile.longitude = 35.6892, 51.389
+    profile.save()
+    return profile
+
+
+def stale_entry(key, temp):
+    cache.set(
+        WEATHER_CACHE_KEY.format(key),
+        {"data": {"main": {"temp": temp}}, "fetched_at": time.time() - 3600},
+    )
+
+
+class TestWeatherCache:
+    def test_cold_miss_fetches_once(self, upstream):
+        data = get_weather()
+        assert data["main"]["temp"] == 27.0
+        assert get_weather() == data
+        assert len(upstream) == 1
+        # the fetch always runs with a connect/read timeout
+        assert upstream[0][2] is not None
+
+    def test_nearby_locations_share_a_bucket(self, upstream):
+        assert get_bucket(35.6892, 51.389) == (35.7, 51.4)
+        get_weather(35.6892, 51.389)
+        get_weather(35.71, 51.36)
+        get_weather(36.2, 51.4)
+        assert [call[:2] for call in upstream] == [(35.7, 51.4), (36.2, 51.4)]
+
+    def test_hot_bucket_served_from_process(self, upstream, settings):
+        get_weather()
+        cache.delete(WEATHER_CACHE_KEY.format(DEFAULT_KEY))
+        assert get_weather()["main"]["temp"] == 27.0
+        settings.WEATHER_LOCAL_TTL = 0
+        hot_buckets.clear()
+        get_weather()
+        assert len(upstream) == 2
+
+    def test_stale_entry_served_and_refreshed(self, upstream):
+        stale_entry(DEFAULT_KEY, 10)
+        # the stale value is returned while the (eager) task refreshes it
+        assert get_weather()["main"]["temp"] == 10
+        assert len(upstream) == 1
+        assert get_weather()["main"]["temp"] == 27.0
+        assert cache.get(WEATHER_LOCK_KEY.format(DEFAULT_KEY)) is None
+
+    def test_broker_down_serves_stale_entry(self, upstream, monkeypatch):
+        # the refresh can't be queued: stale data, lock free for a retry
+        def apply_async(*args, **kwargs):
+            raise OperationalError("broker down")
+
+        monkeypatch.setattr(refresh_weather_bucket, "apply_async", apply_async)
+        stale_entry(DEFAULT_KEY, 10)
+        assert get_weather()["main"]["temp"] == 10
+        assert async_to_sync(weather.aget_weather)()["main"]["temp"] == 10
+        assert upstream == []
+        assert cache.get(WEATHER_LOCK_KEY.format(DEFAULT_KEY)) is None
+
+    def test_concurrent_cold_miss_does_not_fetch(self, upstream, settings):
+        settings.WEATHER_COLD_WAIT = 0.1
+        cache.set(WEATHER_LOCK_KEY.format(DEFAULT_KEY), True)
+        assert get_weather() is None
+        assert upstream == []
+
+    def test_failed_refresh_keeps_stale_entry(self, monkeypatch, settings):
+        settings.WEATHER_PROVIDER = "todo.weather.OpenWeatherProvider"
+
+        def get(url, params=None, timeout=None):
+            raise requests.Timeout
+
+        monkeypatch.setattr(weather.session, "get", get)
+        stale_entry(DEFAULT_KEY, 10)
+        assert get_weather()["main"]["temp"] == 10
+        entry = cache.get(WEATHER_CACHE_KEY.format(DEFAULT_KEY))
+        assert entry["data"]["main"]["temp"] == 10
+        assert cache.get(WEATHER_LOCK_KEY.format(DEFAULT_KEY)) is None
+
+
+class TestRefreshPopularBuckets:
+    def test_refreshes_most_requested_buckets(self, settings):
+        settings.WEATHER_LOCAL_TTL = 0
+        for _ in range(3):
+            get_weather(35.7, 51.4)
+        for _ in range(2):
+            get_weather(36.2, 51.4)
+        get_weather(10, 10)
+        refreshed = refresh_popular_buckets(limit=2)
+        assert refreshed == ["35.7:51.4", "36.2:51.4"]
+        # counters of the refreshed buckets start over
+        assert cache.get(WEATHER_HITS_KEY.format("35.7:51.4")) is None
+        assert cache.get(WEATHER_HITS_KEY.format("10:10")) == 1
+
+    def test_forgets_expired_idle_buckets(self):
+        get_weather(36.2, 51.4)
+        cache.delete(WEATHER_HITS_KEY.format("36.2:51.4"))
+        cache.delete(WEATHER_CACHE_KEY.format("36.2:51.4"))
+        refresh_popular_buckets()
+        assert set(cache.get(WEATHER_BUCKETS_KEY)) == {DEFAULT_KEY}
+
+
+class TestRedisRegistry:
+    # the shared registry and counters as plain redis commands
+    @pytest.fixture
+    def redis(self):
+        redis = mock.MagicMock()
+        with mock.patch("todo.weather.get_redis", return_value=redis):
+            yield redis
+
+    def test_hits_are_one_pipelined_round_trip(self, redis, settings):
+        record_hits("35.7:51.4", 3)
+        hits_key = cache.make_key(WEATHER_HITS_KEY.format("35.7:51.4"))
+        pipe = redis.pipeline.return_value.__enter__.return_value
+        pipe.incrby.assert_called_once_with(hits_key, 3)
+        pipe.expire.assert_called_once_with(
+            hits_key, settings.WEATHER_STALE_TTL
+        )
+        pipe.execute.assert_called_once_with()
+        assert redis.method_calls == [mock.call.pipeline()]
+
+    def test_buckets_are_hash_fields(self, redis):
+        buckets_key = cache.make_key(WEATHER_BUCKETS_KEY)
+        register_bucket("35.7:51.4", (35.7, 51.4))
+        redis.hsetnx.assert_called_once_with(
+            buckets_key, "35.7:51.4", json.dumps((35.7, 51.4))
+        )
+        redis.hgetall.return_value = {b"35.7:51.4": b"[35.7, 51.4]"}
+        assert get_buckets() == {"35.7:51.4": (35.7, 51.4)}
+
+
+@pytest.mark.django_db
+class TestWeatherApi:
+    def test_anonymous_gets_default_location(self):
+        response = APIClient().get(reverse("todo:api-v1:weather"))
+        assert response.status_code == 200
+        assert response.data["weather"]["coord"] == {"lat": 37.5, "lon": 57.3}
+
+    def test_user_gets_profile_location(self, profile):
+        client = APIClient()
+        client.force_authenticate(user=profile.user)
+        response = client.get(reverse("todo:api-v1:weather"))
+        assert response.data["weather"]["coord"] == {"lat": 35.7, "lon": 51.4}
+
+    def test_unavailable_weather_response(self, settings):
+        settings.WEATHER_COLD_WAIT = 0
+        cache.set(WEATHER_LOCK_KEY.format(DEFAULT_KEY), True)
+        response = APIClient().get(reverse("todo:api-v1:weather"))
+        assert response.status_code == 503
+
+
+class TestAsyncWeather:
+    def test_cold_miss_fetches_with_async_client(self, monkeypatch, settings):
+        settings.WEATHER_PROVIDER = "todo.weather.OpenWeatherProvider"
+        calls = []
+
+        def handler(request):
+            calls.append(request.url.params["lat"])
+            return httpx.Response(200, json=FakeResponse(300.15).json())
+
+        monkeypatch.setattr(
+            weather,
+            "get_async_client",
+            lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        )
+        data = async_to_sync(weather.aget_weather)(35.6892, 51.389)
+        assert data["main"]["temp"] == 27.0
+        assert get_weather(35.6892, 51.389) == data
+        assert calls == ["35.7"]
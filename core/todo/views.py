@@ -8,16 +8,11 @@ from django.views.generic import (
 )
 from django.contrib.auth.mixins import LoginRequiredMixin
 
-# weather
-import requests
-from django.core.cache import cache
-from decouple import config
-
 from django.urls import reverse_lazy
 from .models import Task
 from .forms import CreateTaskForm, UpdateTaskForm
-from accounts.models import Profile
-from core.celery import delete_completed_tasks
+from .weather import get_weather
+from accounts.utils import get_request_profile
 
 # Create your views here.
 
@@ -27,10 +22,9 @@ class TaskList(LoginRequiredMixin, ListView):
     model = Task
     template_name = "todo/task_list.html"
     context_object_name = "tasks"
-    delete_completed_tasks.delay()
 
     def get_queryset(self):
-        profile = Profile.objects.get(user=self.request.user)
+        profile = get_request_profile(self.request)
         return self.model.objects.filter(user=profile)
 
     paginate_by = 7
@@ -91,7 +85,7 @@ class TaskCreate(LoginRequiredMixin, CreateView):
 
     # automatically detect author
     def form_valid(self, form):
-        profile = Profile.objects.get(user=self.request.user)
+        profile = get_request_profile(self.request)
         form.instance.user = profile
         return super().form_valid(form)
 
@@ -105,7 +99,7 @@ class TaskUpdate(LoginRequiredMixin, UpdateView):
 
     # automatically detect author
     def form_valid(self, form):
-        profile = Profile.objects.get(user=self.request.user)
+        profile = get_request_profile(self.request)
         form.instance.user = profile
         return super().form_valid(form)
 
@@ -120,7 +114,7 @@ class TaskDelete(LoginRequiredMixin, DeleteView):
         return self.post(request, *args, **kwargs)
 
     def get_queryset(self):
-        profile = Profile.objects.get(user=self.request.user)
+        profile = get_request_profile(self.request)
         return self.model.objects.filter(user=profile)
 
 
@@ -144,25 +138,5 @@ class Weather(LoginRequiredMixin, ListView):
     template_name = "todo/weather.html"
 
     def get_queryset(self, *args, **kwargs):
-        if cache.get("weather") is None:
-            api_key = config(
-                "openweather_apikey",
-                default="18f933ce846bc85b1007e70e217290fe",
-            )
-            response = requests.get(
-                f"https://api.openweathermap.org/data/2.5/weather?lat=37.474806&lon=57.315210&appid={api_key}"
-            )
-            data = response.json()
-            # convert from kelvin to celsius with 0.01 rounding
-            data["main"]["temp"] = round(data["main"]["temp"] - 273.15, 2)
-            data["main"]["feels_like"] = round(
-                data["main"]["feels_like"] - 273.15, 2
-            )
-            data["main"]["temp_min"] = round(
-                data["main"]["temp_min"] - 273.15, 2
-            )
-            data["main"]["temp_max"] = round(
-                data["main"]["temp_max"] - 273.15, 2
-            )
-            cache.set("weather", data)
-        return cache.get("weather")
+        profile = get_request_profile(self.request)
+        return get_weather(profile.latitude, profile.longitude)
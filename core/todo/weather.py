@@ -0,0 +1,437 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+from kombu.exceptions import OperationalError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+# shared entries and refresh locks are per location bucket
+WEATHER_CACHE_KEY = "todo:weather:{}"
+WEATHER_LOCK_KEY = "todo:weather:lock:{}"
+WEATHER_HITS_KEY = "todo:weather:hits:{}"
+WEATHER_BUCKETS_KEY = "todo:weather:buckets"
+KELVIN_FIELDS = ("temp", "feels_like", "temp_min", "temp_max")
+
+
+def build_session():
+    # one keep-alive pool per process instead of a new connection per call
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.WEATHER_POOL_SIZE,
+        max_retries=Retry(
+            total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504)
+        ),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+session = build_session()
+# async views share one pooled client per event loop
+async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = async_clients.get(loop)
+    if client is None:
+        client = async_clients[loop] = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=settings.WEATHER_POOL_SIZE),
+            timeout=httpx.Timeout(
+                settings.WEATHER_READ_TIMEOUT,
+                connect=settings.WEATHER_CONNECT_TIMEOUT,
+            ),
+            transport=httpx.AsyncHTTPTransport(retries=2),
+        )
+    return client
+
+
+class OpenWeatherProvider:
+    def fetch(self, latitude, longitude):
+        response = session.get(
+            WEATHER_URL,
+            params=self.get_params(latitude, longitude),
+            timeout=(
+                settings.WEATHER_CONNECT_TIMEOUT,
+                settings.WEATHER_READ_TIMEOUT,
+            ),
+        )
+        response.raise_for_status()
+        return self.parse(response.json())
+
+    async def afetch(self, latitude, longitude):
+        response = await get_async_client().get(
+            WEATHER_URL, params=self.get_params(latitude, longitude)
+        )
+        response.raise_for_status()
+        return self.parse(response.json())
+
+    def get_params(self, latitude, longitude):
+        return {
+            "lat": latitude,
+            "lon": longitude,
+            "appid": settings.OPENWEATHER_API_KEY,
+        }
+
+    def parse(self, data):
+        # convert from kelvin to celsius with 0.01 rounding
+        for field in KELVIN_FIELDS:
+            data["main"][field] = round(data["main"][field] - 273.15, 2)
+        return data
+
+
+class StubWeatherProvider:
+    """
+    Local provider for tests, benchmarks and offline development. Returns
+    the OpenWeather response shape, derived from the coordinates only.
+    """
+
+    def fetch(self, latitude, longitude):
+        temp = round(30 - abs(latitude) / 3, 2)
+        return {
+            "name": "Stub",
+            "coord": {"lat": latitude, "lon": longitude},
+            "sys": {"country": "--"},
+            "weather": [{"main": "Clear", "description": "clear sky"}],
+            "main": {
+                "temp": temp,
+                "feels_like": temp,
+                "temp_min": round(temp - 2, 2),
+                "temp_max": round(temp + 2, 2),
+            },
+        }
+
+    async def afetch(self, latitude, longitude):
+        return self.fetch(latitude, longitude)
+
+
+def get_provider():
+    return import_string(settings.WEATHER_PROVIDER)()
+
+
+class HotBuckets:
+    """
+    Per-process LRU of the most requested buckets, so hot locations skip
+    the redis round trip for WEATHER_LOCAL_TTL. It also counts the hits it
+    serves; they are flushed to the shared counters on the next miss.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        # returns (data or None, hits not yet flushed)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None, 1
+            data, expires, hits = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None, hits + 1
+            entry[2] += 1
+            self.entries.move_to_end(key)
+            return data, 0
+
+    def set(self, key, data, ttl):
+        if not ttl or not self.maxsize:
+            return
+        with self.lock:
+            self.entries[key] = [data, time.monotonic() + ttl, 0]
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+hot_buckets = HotBuckets(settings.WEATHER_HOT_BUCKETS)
+
+
+def get_bucket(latitude=None, longitude=None):
+    """
+    Round the coordinates to WEATHER_BUCKET_PRECISION decimals (1 is about
+    11km), so nearby users share one cache entry and one upstream call.
+    Missing coordinates fall back to the default location.
+    """
+    if latitude is None or longitude is None:
+        latitude = settings.WEATHER_LATITUDE
+        longitude = settings.WEATHER_LONGITUDE
+    precision = settings.WEATHER_BUCKET_PRECISION
+    return round(latitude, precision), round(longitude, precision)
+
+
+def bucket_key(bucket):
+    return "{:g}:{:g}".format(*bucket)
+
+
+def refresh_weather(bucket):
+    """
+    Fetch the weather of a bucket and store it with its fetch time. A
+    failed fetch keeps whatever entry is cached, so readers keep getting
+    stale data.
+    """
+    key = bucket_key(bucket)
+    try:
+        data = get_provider().fetch(*bucket)
+    except (requests.RequestException, KeyError, ValueError):
+        logger.warning("weather refresh of %s failed", key, exc_info=True)
+        return None
+    finally:
+        cache.delete(WEATHER_LOCK_KEY.format(key))
+    cache.set(
+        WEATHER_CACHE_KEY.format(key),
+        {"data": data, "fetched_at": time.time()},
+        settings.WEATHER_STALE_TTL,
+    )
+    register_bucket(key, bucket)
+    return data
+
+
+async def arefresh_weather(bucket):
+    # refresh_weather() without blocking the event loop on the fetch
+    key = bucket_key(bucket)
+    try:
+        data = await get_provider().afetch(*bucket)
+    except (httpx.HTTPError, KeyError, ValueError):
+        logger.warning("weather refresh of %s failed", key, exc_info=True)
+        return None
+    finally:
+        await cache.adelete(WEATHER_LOCK_KEY.format(key))
+    await cache.aset(
+        WEATHER_CACHE_KEY.format(key),
+        {"data": data, "fetched_at": time.time()},
+        settings.WEATHER_STALE_TTL,
+    )
+    await sync_to_async(register_bucket, thread_sensitive=False)(key, bucket)
+    return data
+
+
+def get_redis():
+    # the raw client behind the default cache, None when it isn't redis
+    try:
+        return get_redis_connection()
+    except NotImplementedError:
+        return None
+
+
+def register_bucket(key, bucket):
+    # the buckets refresh_popular_buckets() walks
+    redis = get_redis()
+    if redis is not None:
+        # a hash field each: refreshes of other buckets can't drop it
+        redis.hsetnx(
+            cache.make_key(WEATHER_BUCKETS_KEY), key, json.dumps(bucket)
+        )
+        return
+    buckets = cache.get(WEATHER_BUCKETS_KEY) or {}
+    if key not in buckets:
+        buckets[key] = bucket
+        cache.set(WEATHER_BUCKETS_KEY, buckets, None)
+
+
+def get_buckets():
+    redis = get_redis()
+    if redis is None:
+        return cache.get(WEATHER_BUCKETS_KEY) or {}
+    fields = redis.hgetall(cache.make_key(WEATHER_BUCKETS_KEY))
+    return {
+        key.decode(): tuple(json.loads(bucket))
+        for key, bucket in fields.items()
+    }
+
+
+def forget_buckets(keys):
+    if not keys:
+        return
+    redis = get_redis()
+    if redis is not None:
+        redis.hdel(cache.make_key(WEATHER_BUCKETS_KEY), *keys)
+        return
+    buckets = cache.get(WEATHER_BUCKETS_KEY) or {}
+    for key in keys:
+        buckets.pop(key, None)
+    cache.set(WEATHER_BUCKETS_KEY, buckets, None)
+
+
+def claim_refresh(bucket):
+    # only one caller per bucket and lock period gets to refresh
+    return cache.add(
+        WEATHER_LOCK_KEY.format(bucket_key(bucket)),
+        True,
+        settings.WEATHER_LOCK_TIMEOUT,
+    )
+
+
+async def aclaim_refresh(bucket):
+    return await cache.aadd(
+        WEATHER_LOCK_KEY.format(bucket_key(bucket)),
+        True,
+        settings.WEATHER_LOCK_TIMEOUT,
+    )
+
+
+def schedule_refresh(bucket):
+    """
+    Queue the background refresh of a claimed bucket. A broker that is
+    down or slow must not turn a stale but usable entry into an error:
+    the publish is not retried, and on failure the lock is released so a
+    later request tries again.
+    """
+    from .tasks import refresh_weather_bucket
+
+    try:
+        refresh_weather_bucket.apply_async(bucket, retry=False)
+    except OperationalError:
+        key = bucket_key(bucket)
+        logger.warning("weather refresh of %s not queued", key, exc_info=True)
+        cache.delete(WEATHER_LOCK_KEY.format(key))
+
+
+async def aschedule_refresh(bucket):
+    # publishing blocks on the broker connection
+    await sync_to_async(schedule_refresh, thread_sensitive=False)(bucket)
+
+
+def record_hits(key, hits):
+    hits_key = WEATHER_HITS_KEY.format(key)
+    redis = get_redis()
+    if redis is None:
+        cache.add(hits_key, 0, settings.WEATHER_STALE_TTL)
+        cache.incr(hits_key, hits)
+        return
+    # one round trip per local miss; django_redis reads the plain int back
+    hits_key = cache.make_key(hits_key)
+    with redis.pipeline() as pipe:
+        pipe.incrby(hits_key, hits)
+        pipe.expire(hits_key, settings.WEATHER_STALE_TTL)
+        pipe.execute()
+
+
+async def arecord_hits(key, hits):
+    await sync_to_async(record_hits, thread_sensitive=False)(key, hits)
+
+
+def get_weather(latitude=None, longitude=None):
+    """
+    Serve the shared weather entry of the location's bucket,
+    stale-while-revalidate. A stale entry is returned as is and refreshed
+    in the background; only a cold bucket fetches inline, and concurrent
+    cold misses wait for that one fetch.
+    """
+    bucket = get_bucket(latitude, longitude)
+    key = bucket_key(bucket)
+    data, hits = hot_buckets.get(key)
+    if data is not None:
+        return data
+    record_hits(key, hits)
+
+    entry = cache.get(WEATHER_CACHE_KEY.format(key))
+    if entry is not None:
+        age = time.time() - entry["fetched_at"]
+        if age > settings.WEATHER_FRESH_TTL:
+            if claim_refresh(bucket):
+                schedule_refresh(bucket)
+        else:
+            hot_buckets.set(key, entry["data"], settings.WEATHER_LOCAL_TTL)
+        return entry["data"]
+
+    if claim_refresh(bucket):
+        return refresh_weather(bucket)
+
+    deadline = time.monotonic() + settings.WEATHER_COLD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(WEATHER_CACHE_KEY.format(key))
+        if entry is not None:
+            return entry["data"]
+    return None
+
+
+async def aget_weather(latitude=None, longitude=None):
+    # get_weather() for the async views, the cold fetch is awaited
+    bucket = get_bucket(latitude, longitude)
+    key = bucket_key(bucket)
+    data, hits = hot_buckets.get(key)
+    if data is not None:
+        return data
+    await arecord_hits(key, hits)
+
+    entry = await cache.aget(WEATHER_CACHE_KEY.format(key))
+    if entry is not None:
+        age = time.time() - entry["fetched_at"]
+        if age > settings.WEATHER_FRESH_TTL:
+            if await aclaim_refresh(bucket):
+                await aschedule_refresh(bucket)
+        else:
+            hot_buckets.set(key, entry["data"], settings.WEATHER_LOCAL_TTL)
+        return entry["data"]
+
+    if await aclaim_refresh(bucket):
+        return await arefresh_weather(bucket)
+
+    deadline = time.monotonic() + settings.WEATHER_COLD_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        entry = await cache.aget(WEATHER_CACHE_KEY.format(key))
+        if entry is not None:
+            return entry["data"]
+    return None
+
+
+def refresh_popular_buckets(limit=None):
+    """
+    Refresh the most requested buckets since the last pass, up to
+    WEATHER_REFRESH_BUCKETS of them, and forget buckets that nobody asked
+    for once their entry has expired. Returns the refreshed bucket keys.
+    """
+    limit = limit or settings.WEATHER_REFRESH_BUCKETS
+    buckets = get_buckets()
+    default = get_bucket()
+    buckets.setdefault(bucket_key(default), default)
+
+    hits_keys = {key: WEATHER_HITS_KEY.format(key) for key in buckets}
+    hits = cache.get_many(list(hits_keys.values()))
+    entries = cache.get_many(
+        [WEATHER_CACHE_KEY.format(key) for key in buckets]
+    )
+    ranked = sorted(
+        buckets, key=lambda key: hits.get(hits_keys[key], 0), reverse=True
+    )
+
+    refreshed = []
+    forgotten = []
+    for key in ranked:
+        idle = not hits.get(hits_keys[key])
+        if idle and key != bucket_key(default):
+            if WEATHER_CACHE_KEY.format(key) not in entries:
+                forgotten.append(key)
+            continue
+        if len(refreshed) < limit and claim_refresh(buckets[key]):
+            refresh_weather(tuple(buckets[key]))
+            refreshed.append(key)
+    forget_buckets(forgotten)
+    # popularity is counted per pass
+    cache.delete_many([hits_keys[key] for key in refreshed])
+    return refreshed